@@ -0,0 +1,199 @@
+import os
+import hmac
+import json
+import time
+import base64
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from firebase_admin import auth
+
+logger = logging.getLogger(__name__)
+
+
+class TokenCache:
+    """LRU cache of verified ID tokens, keyed by the token's SHA-256 hash.
+
+    Entries live until the token's own ``exp`` claim (capped by ``max_ttl``),
+    so a cached token is never accepted after Firebase would reject it for
+    expiry. Verification itself runs on a small thread pool, and concurrent
+    requests carrying the same uncached token share one verification.
+    """
+
+    def __init__(
+        self,
+        verify: Callable[[str], Dict[str, Any]],
+        max_size: int = 10000,
+        max_ttl: float = 3600.0,
+        expiry_leeway: float = 5.0,
+        max_workers: int = 4,
+        prefetch: Optional[Callable[[], None]] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self._verify = verify
+        self._prefetch = prefetch
+        self._clock = clock
+        self.max_size = max_size
+        self.max_ttl = max_ttl
+        self.expiry_leeway = expiry_leeway
+
+        self._entries = OrderedDict()  # token hash -> (claims, expires_at)
+        self._inflight = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="token-verify")
+        self._refresh_task = None
+
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "failures": 0}
+
+    async def verify(self, token: str) -> Dict[str, Any]:
+        key = hashlib.sha256(token.encode()).hexdigest()
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            claims, expires_at = entry
+            if self._clock() < expires_at:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return claims
+            del self._entries[key]
+            self._stats["expired"] += 1
+
+        self._stats["misses"] += 1
+
+        future = self._inflight.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._executor, self._verify, token)
+            self._inflight[key] = future
+            try:
+                claims = await asyncio.shield(future)
+            except Exception:
+                self._stats["failures"] += 1
+                raise
+            finally:
+                self._inflight.pop(key, None)
+            self._store(key, claims)
+            return claims
+
+        return await asyncio.shield(future)
+
+    def invalidate(self, token: Optional[str] = None):
+        if token is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(hashlib.sha256(token.encode()).hexdigest(), None)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+            **self._stats,
+        }
+
+    def start_cert_refresh(self, interval: float = 1800.0):
+        """Fetch signing certificates now and keep refreshing them in the background"""
+        if self._prefetch is None or self._refresh_task is not None:
+            return
+        self._refresh_task = asyncio.get_running_loop().create_task(self._refresh_certs(interval))
+
+    async def stop(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+        self._executor.shutdown(wait=False)
+
+    def _store(self, key: str, claims: Dict[str, Any]):
+        now = self._clock()
+        expires_at = now + self.max_ttl
+        if "exp" in claims:
+            expires_at = min(expires_at, float(claims["exp"]) - self.expiry_leeway)
+        if expires_at <= now:
+            return
+
+        self._entries[key] = (claims, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    async def _refresh_certs(self, interval: float):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await loop.run_in_executor(self._executor, self._prefetch)
+            except Exception as e:
+                logger.warning(f"Signing certificate prefetch failed: {e}")
+            await asyncio.sleep(interval)
+
+
+def verify_with_firebase(token: str) -> Dict[str, Any]:
+    return auth.verify_id_token(token)
+
+
+def prefetch_firebase_certs():
+    """Warm firebase_admin's certificate cache so verify_id_token never fetches inline"""
+    from firebase_admin import _token_gen
+
+    token_verifier = auth._get_client(None)._token_verifier
+    token_verifier.request(url=_token_gen.ID_TOKEN_CERT_URI, method="GET")
+
+
+class LocalTokenVerifier:
+    """Offline stand-in for Firebase that issues and checks HMAC-signed JWTs"""
+
+    def __init__(self, secret: str):
+        self._secret = secret.encode()
+
+    def issue(self, uid: str, ttl: int = 3600, **claims) -> str:
+        now = int(time.time())
+        payload = {"uid": uid, "user_id": uid, "sub": uid, "iat": now, "exp": now + ttl, **claims}
+        signing_input = ".".join([
+            _b64encode(json.dumps({"alg": "HS256", "typ": "JWT"}).encode()),
+            _b64encode(json.dumps(payload, separators=(",", ":")).encode()),
+        ])
+        return f"{signing_input}.{_b64encode(self._sign(signing_input))}"
+
+    def __call__(self, token: str) -> Dict[str, Any]:
+        try:
+            header, payload, signature = token.split(".")
+        except ValueError:
+            raise ValueError("Malformed token")
+
+        if not hmac.compare_digest(_b64decode(signature), self._sign(f"{header}.{payload}")):
+            raise ValueError("Invalid token signature")
+
+        claims = json.loads(_b64decode(payload))
+        if claims.get("exp", 0) <= time.time():
+            raise ValueError("Token expired")
+        return claims
+
+    def _sign(self, signing_input: str) -> bytes:
+        return hmac.new(self._secret, signing_input.encode(), hashlib.sha256).digest()
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def create_token_cache() -> TokenCache:
+    """Build the app's token cache; AUTH_VERIFIER=local swaps Firebase for LocalTokenVerifier"""
+    max_size = int(os.getenv("TOKEN_CACHE_MAX_SIZE", "10000"))
+
+    if os.getenv("AUTH_VERIFIER", "firebase") == "local":
+        verifier = LocalTokenVerifier(os.getenv("LOCAL_AUTH_SECRET", "local-dev-secret"))
+        return TokenCache(verifier, max_size=max_size)
+
+    return TokenCache(verify_with_firebase, max_size=max_size, prefetch=prefetch_firebase_certs)
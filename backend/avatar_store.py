@@ -0,0 +1,243 @@
+import os
+import asyncio
+import logging
+import secrets
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional
+
+from database import AsyncConnection
+from image_processing import AVATAR_SIZES, AVATAR_CONTENT_TYPE, Avatar, InvalidImage, render_upload
+
+logger = logging.getLogger(__name__)
+
+ENSURE_AVATAR_TABLE = """
+    IF OBJECT_ID('user_avatars', 'U') IS NULL
+        CREATE TABLE user_avatars (
+            user_id INT NOT NULL,
+            size INT NOT NULL,
+            content_type VARCHAR(50) NOT NULL,
+            etag VARCHAR(32) NOT NULL,
+            data VARBINARY(MAX) NOT NULL,
+            updated_at DATETIME NOT NULL CONSTRAINT DF_user_avatars_updated_at DEFAULT GETDATE(),
+            CONSTRAINT PK_user_avatars PRIMARY KEY (user_id, size)
+        )
+"""
+
+# The smallest stored variant that is at least as large as requested, else the largest one
+SELECT_AVATAR = """
+    SELECT TOP 1 size, content_type, etag, data
+    FROM user_avatars
+    WHERE user_id = ?
+    ORDER BY CASE WHEN size >= ? THEN 0 ELSE 1 END,
+             CASE WHEN size >= ? THEN size ELSE -size END
+"""
+
+
+class ImageBusy(Exception):
+    """Raised when the image pool's queue is full or a render takes too long"""
+
+
+class ImageProcessor:
+    """Bounded process pool for avatar rendering.
+
+    At most ``max_workers + max_queue`` renders are admitted at once; further
+    uploads fail fast with ``ImageBusy`` instead of piling up. A render that
+    exceeds ``timeout`` is abandoned by the caller, but keeps its slot until
+    the worker actually finishes so the bound stays honest.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_queue: int = 16, timeout: float = 10.0):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._in_flight = 0
+        self._rendered = 0
+        self._rejected = 0
+        self._timeouts = 0
+        self._failed = 0
+
+    async def render(self, data: str) -> Avatar:
+        """Render a base64 upload off the event loop"""
+        if self._in_flight >= self.max_workers + self.max_queue:
+            self._rejected += 1
+            raise ImageBusy("Image processing queue is full")
+
+        self._in_flight += 1
+        future = asyncio.wrap_future(self._pool().submit(render_upload, data))
+        future.add_done_callback(self._finished)
+        try:
+            avatar = await asyncio.wait_for(asyncio.shield(future), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self._timeouts += 1
+            raise ImageBusy(f"Image processing took longer than {self.timeout}s")
+        except InvalidImage:
+            self._failed += 1
+            raise
+        self._rendered += 1
+        return avatar
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.max_workers,
+            "in_flight": self._in_flight,
+            "rendered": self._rendered,
+            "rejected": self._rejected,
+            "timeouts": self._timeouts,
+            "invalid": self._failed,
+        }
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Forking a process that runs DB worker threads isn't safe; start clean interpreters
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def _finished(self, future):
+        self._in_flight -= 1
+        if not future.cancelled():
+            # Retrieve abandoned results so timed-out failures aren't reported as never retrieved
+            future.exception()
+
+
+def avatar_url(base_url: str, user_id: int, version: Optional[str]) -> Optional[str]:
+    if not version:
+        return None
+    return f"{base_url.rstrip('/')}/users/{user_id}/avatar?v={version}"
+
+
+async def save_avatar(conn: AsyncConnection, user_id: int, avatar: Avatar) -> str:
+    """Replace a user's stored variants and return their URL version; the caller commits.
+
+    The version is random rather than the image hash, so it can't be guessed
+    from a picture, and the same picture uploaded by two users gets two URLs.
+    """
+    version = secrets.token_hex(8)
+    await conn.execute("DELETE FROM user_avatars WHERE user_id = ?", user_id)
+    await conn.executemany(
+        "INSERT INTO user_avatars (user_id, size, content_type, etag, data) VALUES (?, ?, ?, ?, ?)",
+        [
+            (user_id, size, AVATAR_CONTENT_TYPE, f"{version}-{size}", data)
+            for size, data in avatar.variants.items()
+        ]
+    )
+    return version
+
+
+async def delete_avatar(conn: AsyncConnection, user_id: int):
+    await conn.execute("DELETE FROM user_avatars WHERE user_id = ?", user_id)
+
+
+async def load_avatar(conn: AsyncConnection, user_id: int, size: int):
+    return await conn.fetchone(SELECT_AVATAR, user_id, size, size)
+
+
+async def ensure_avatar_schema(database):
+    conn = await database.acquire()
+    try:
+        await conn.execute(ENSURE_AVATAR_TABLE)
+        await conn.commit()
+    finally:
+        await conn.release()
+
+
+# Keyset batches, so pictures left behind by a busy image pool don't hold up the rest
+SELECT_LEGACY_AVATARS = """
+    SELECT TOP (?) id, CAST(profile_picture_data AS NVARCHAR(MAX)) AS profile_picture_data
+    FROM users
+    WHERE profile_picture_data IS NOT NULL AND id > ?
+    ORDER BY id
+"""
+
+
+async def render_legacy(data: str, retries: int, retry_delay: float) -> Optional[Avatar]:
+    """Render one legacy picture, backing off while the image pool is busy; None if unreadable"""
+    for attempt in range(retries + 1):
+        try:
+            return await image_processor.render(data)
+        except InvalidImage:
+            return None
+        except ImageBusy:
+            if attempt == retries:
+                raise
+            await asyncio.sleep(retry_delay * 2 ** attempt)
+
+
+async def migrate_legacy_avatars(database, batch_size: int = 50, retries: int = 3,
+                                 retry_delay: float = 1.0) -> int:
+    """Move base64 pictures out of users.profile_picture_data into user_avatars.
+
+    A batch is read and written on short-lived connections; none is held
+    while its pictures render. Pictures that stay busy after ``retries`` are
+    left in place for the next startup.
+    """
+    migrated, skipped, after_id = 0, 0, 0
+    while True:
+        conn = await database.acquire()
+        try:
+            rows = await conn.fetchall(SELECT_LEGACY_AVATARS, batch_size, after_id)
+        finally:
+            await conn.release()
+        if not rows:
+            break
+        after_id = rows[-1].id
+
+        rendered = []
+        for row in rows:
+            try:
+                avatar = await render_legacy(row.profile_picture_data, retries, retry_delay)
+            except ImageBusy as e:
+                logger.warning(f"Leaving legacy avatar of user {row.id} for the next run: {e}")
+                skipped += 1
+                continue
+            if avatar is None:
+                logger.warning(f"Dropping unreadable legacy avatar of user {row.id}")
+            rendered.append((row.id, avatar))
+        if not rendered:
+            continue
+
+        conn = await database.acquire()
+        try:
+            for user_id, avatar in rendered:
+                if avatar is not None:
+                    await save_avatar(conn, user_id, avatar)
+                await conn.execute("UPDATE users SET profile_picture_data = NULL WHERE id = ?", user_id)
+            await conn.commit()
+        except Exception:
+            await conn.rollback()
+            raise
+        finally:
+            await conn.release()
+        migrated += len(rendered)
+
+    if skipped:
+        logger.warning(f"{skipped} legacy avatars were skipped while the image pool was busy")
+    return migrated
+
+
+async def migrate_in_background(database):
+    try:
+        migrated = await migrate_legacy_avatars(
+            database, batch_size=int(os.getenv("AVATAR_MIGRATION_BATCH", "50"))
+        )
+        if migrated:
+            logger.info(f"Migrated {migrated} legacy profile pictures to user_avatars")
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.error(f"Avatar store preparation failed: {e}")
+
+
+image_processor = ImageProcessor(
+    max_workers=int(os.getenv("IMAGE_WORKERS", "0")) or None,
+    max_queue=int(os.getenv("IMAGE_QUEUE_LIMIT", "16")),
+    timeout=float(os.getenv("IMAGE_TIMEOUT_SECONDS", "10")),
+)
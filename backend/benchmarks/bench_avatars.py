@@ -0,0 +1,94 @@
+"""Measure avatar uploads per second per core, before and after draft-mode rendering.
+
+"before" is the original inline process_profile_image (full decode, RGB
+convert, LANCZOS thumbnail to 400px, base64 re-encode). "after" is
+image_processing.render_upload, which decodes JPEGs at a reduced scale and
+renders every stored size; it is timed in-process and through a process pool:
+
+    python benchmarks/bench_avatars.py --uploads 40 --workers 4
+"""
+import io
+import os
+import sys
+import time
+import base64
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageFilter
+
+from image_processing import render_upload
+
+# (label, size, format) of the synthetic uploads; phones mostly send large JPEGs
+SAMPLES = [
+    ("12MP phone JPEG", (4032, 3024), "JPEG"),
+    ("1080p JPEG", (1920, 1080), "JPEG"),
+    ("1024px PNG with alpha", (1024, 1024), "PNG"),
+]
+
+
+def synthetic_upload(size, fmt) -> str:
+    """A photo-like image (smooth gradient plus sensor noise), base64 encoded like the app sends it"""
+    width, height = size
+    gradient = Image.linear_gradient("L").resize(size)
+    noise = Image.effect_noise(size, 40).filter(ImageFilter.GaussianBlur(1))
+    image = Image.merge("RGB", (gradient, noise, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+    if fmt == "PNG":
+        image.putalpha(gradient)
+    output_buffer = io.BytesIO()
+    image.save(output_buffer, format=fmt, quality=90)
+    return base64.b64encode(output_buffer.getvalue()).decode("utf-8")
+
+
+def original_process_profile_image(base64_image_data: str) -> str:
+    image_data = base64.b64decode(base64_image_data)
+    image = Image.open(io.BytesIO(image_data))
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    image.thumbnail((400, 400), Image.Resampling.LANCZOS)
+    output_buffer = io.BytesIO()
+    image.save(output_buffer, format='JPEG', quality=85, optimize=True)
+    return base64.b64encode(output_buffer.getvalue()).decode('utf-8')
+
+
+def serial_rate(fn, upload: str, count: int) -> float:
+    fn(upload)  # warm up codecs
+    started = time.perf_counter()
+    for _ in range(count):
+        fn(upload)
+    return count / (time.perf_counter() - started)
+
+
+def pool_rate(upload: str, count: int, workers: int) -> float:
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        list(pool.map(render_upload, [upload] * workers))  # start and warm up every worker
+        started = time.perf_counter()
+        list(pool.map(render_upload, [upload] * count))
+        return count / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--uploads", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    args = parser.parse_args()
+
+    cores = min(args.workers, os.cpu_count() or 1)
+    print(f"{args.uploads} uploads per case, pool of {args.workers} workers on {os.cpu_count()} cores")
+    for label, size, fmt in SAMPLES:
+        upload = synthetic_upload(size, fmt)
+        before = serial_rate(original_process_profile_image, upload, args.uploads)
+        after = serial_rate(render_upload, upload, args.uploads)
+        pooled = pool_rate(upload, args.uploads * args.workers, args.workers)
+        print(f"{label} ({len(upload) * 3 // 4 // 1024} KB):")
+        print(f"    before, 1 core:          {before:7.1f} uploads/s")
+        print(f"    after,  1 core:          {after:7.1f} uploads/s ({after / before:.1f}x)")
+        print(f"    after,  {args.workers} worker pool:   {pooled:7.1f} uploads/s "
+              f"({pooled / cores:.1f} per core)")
+
+
+if __name__ == "__main__":
+    main()
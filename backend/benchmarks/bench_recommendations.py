@@ -0,0 +1,105 @@
+"""Build co-enrollment recommendations from synthetic enrollments and time serving them.
+
+Users pick most of their courses from one or two topic clusters, with
+Zipf-distributed course popularity inside each cluster. Reports the build
+time and peak memory, the size of the kept neighbour table, per-user
+recommendation latency, and hit rate on one held-out enrollment per user
+compared with recommending the most popular courses:
+
+    python benchmarks/bench_recommendations.py --users 500000 --courses 5000 --per-user 6
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+import tracemalloc
+from array import array
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from recommendations import CourseRecommender
+
+
+def synthetic_enrollments(users: int, courses: int, per_user: int, clusters: int, seed: int = 42):
+    """(user_id, course_id, completed_lessons) arrays plus one held-out course per user"""
+    rng = np.random.default_rng(seed)
+    cluster_size = courses // clusters
+    ranks = np.arange(1, cluster_size + 1)
+    popularity = (1.0 / ranks) / (1.0 / ranks).sum()
+
+    counts = np.maximum(2, rng.poisson(per_user, size=users))
+    user_ids = np.repeat(np.arange(1, users + 1), counts)
+    home, away = rng.integers(clusters, size=(2, users))
+    cluster = np.where(rng.random(len(user_ids)) < 0.8, home[user_ids - 1], away[user_ids - 1])
+    course_ids = cluster * cluster_size + rng.choice(cluster_size, size=len(user_ids), p=popularity) + 1
+
+    # Drop repeated picks, then hold out each user's last course (users left with one keep it)
+    pairs = np.unique(user_ids.astype(np.int64) * (courses + 1) + course_ids)
+    user_ids, course_ids = pairs // (courses + 1), pairs % (courses + 1)
+    last = np.r_[user_ids[1:] != user_ids[:-1], True]
+    first = np.r_[True, user_ids[1:] != user_ids[:-1]]
+    held = last & ~first
+    held_out = dict(zip(user_ids[held].tolist(), course_ids[held].tolist()))
+    kept = ~held
+    completed = rng.integers(0, 12, size=int(kept.sum()))
+    return (array("i", user_ids[kept].tolist()), array("i", course_ids[kept].tolist()),
+            array("i", completed.tolist()), held_out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200000)
+    parser.add_argument("--courses", type=int, default=5000)
+    parser.add_argument("--per-user", type=int, default=6)
+    parser.add_argument("--clusters", type=int, default=50)
+    parser.add_argument("--neighbors", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"Generating enrollments for {args.users} users over {args.courses} courses...")
+    user_ids, course_ids, completed, held_out = synthetic_enrollments(
+        args.users, args.courses, args.per_user, args.clusters
+    )
+    print(f"{len(user_ids)} enrollments")
+
+    recommender = CourseRecommender(neighbors=args.neighbors)
+    tracemalloc.start()
+    recommender.build(user_ids, course_ids, completed)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stats = recommender.stats()
+    print(f"Build: {stats['build_seconds']:.2f}s, peak {peak / 2**20:.0f} MiB, "
+          f"neighbour table {stats['memory_bytes'] / 2**20:.1f} MiB")
+
+    enrolled = {}
+    for user_id, course_id in zip(user_ids, course_ids):
+        enrolled.setdefault(user_id, []).append(course_id)
+
+    rng = random.Random(7)
+    sample = rng.sample(sorted(enrolled), min(args.queries, len(enrolled)))
+    samples, hits = [], 0
+    for user_id in sample:
+        started = time.perf_counter()
+        ranked = recommender.recommend(enrolled[user_id], args.limit)
+        samples.append((time.perf_counter() - started) * 1000)
+        hits += held_out.get(user_id) in {course_id for course_id, _ in ranked}
+    samples.sort()
+    print(f"recommend: mean {statistics.mean(samples):.3f} ms, p50 {samples[len(samples) // 2]:.3f} ms, "
+          f"p95 {samples[int(len(samples) * 0.95) - 1]:.3f} ms")
+    # The popular list the endpoint falls back to, minus the user's own courses
+    popular = np.argsort(-np.bincount(np.asarray(course_ids)))[:args.limit + args.per_user * 4].tolist()
+    baseline = sum(
+        held_out.get(user_id) in [c for c in popular if c not in set(enrolled[user_id])][:args.limit]
+        for user_id in sample
+    )
+    print(f"Held-out hit rate @{args.limit}: {hits / len(sample):.1%} "
+          f"(popular courses: {baseline / len(sample):.1%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Compare the course search index against the LIKE '%term%' query it replaces.
+
+Builds a synthetic catalog in an in-memory SQLite database (standing in for the
+courses table), then times both paths over the same query mix:
+
+    python benchmarks/bench_search.py --courses 100000 --queries 200
+"""
+import os
+import sys
+import time
+import heapq
+import random
+import sqlite3
+import argparse
+import statistics
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_index import CourseSearchIndex
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "ra", "su", "te", "vi", "zo", "qu", "an", "el", "or", "ix", "um", "pre"]
+FILLER = [
+    "complete", "guide", "beginners", "advanced", "projects", "masterclass", "bootcamp",
+    "practical", "hands", "build", "real", "world", "applications", "scratch",
+    "fundamentals", "professional", "certification", "course", "tutorial", "essentials",
+]
+LEVELS = ["Beginner", "Intermediate", "Advanced"]
+
+Row = namedtuple("Row", [
+    "id", "title", "description", "instructor_name", "category_id", "level",
+    "is_free", "rating", "total_ratings", "total_enrollments", "created_at",
+])
+
+
+def pseudo_words(rng, count):
+    words = set()
+    while len(words) < count:
+        words.add("".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))))
+    return sorted(words)
+
+
+def vocabulary(seed: int = 42):
+    """Topic words for titles, a Zipf-weighted description vocabulary and instructor names"""
+    rng = random.Random(seed)
+    topics = pseudo_words(rng, 2000)
+    words = pseudo_words(rng, 8000)
+    weights = [1.0 / rank for rank in range(1, len(words) + 1)]
+    instructors = [f"{first.title()} {last.title()}" for first, last in
+                   zip(pseudo_words(rng, 500), reversed(pseudo_words(rng, 500)))]
+    return topics, words, weights, instructors
+
+
+def synthetic_courses(count: int, seed: int = 42):
+    topics, words, weights, instructors = vocabulary(seed)
+    rng = random.Random(seed)
+    start = datetime(2020, 1, 1)
+    for course_id in range(1, count + 1):
+        title = " ".join([w.title() for w in rng.sample(topics, 2)] + rng.sample(FILLER, 3))
+        description = " ".join(rng.choices(words, weights=weights, k=60))
+        yield Row(
+            course_id, title, description, rng.choice(instructors), rng.randint(1, 12),
+            rng.choice(LEVELS), rng.random() < 0.3, round(rng.uniform(1, 5), 1),
+            rng.randint(0, 5000), rng.randint(0, 300000),
+            start + timedelta(minutes=course_id),
+        )
+
+
+def query_mix(count: int, seed: int = 7):
+    """Topic words, topic + instructor pairs, prefixes and one-typo terms"""
+    topics, _, _, instructors = vocabulary()
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        kind = rng.random()
+        topic = rng.choice(topics)
+        if kind < 0.4:
+            queries.append(topic)
+        elif kind < 0.6:
+            queries.append(f"{topic} {rng.choice(instructors).split()[1]}")
+        elif kind < 0.8:
+            queries.append(topic[:4])
+        else:
+            queries.append(topic[:-1] + ("x" if topic[-1] != "x" else "y"))
+    return queries
+
+
+def timed(fn, queries):
+    samples = []
+    for query in queries:
+        started = time.perf_counter()
+        fn(query)
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "mean_ms": statistics.mean(samples),
+        "p50_ms": samples[len(samples) // 2],
+        "p95_ms": samples[int(len(samples) * 0.95) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--courses", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"Generating {args.courses} synthetic courses...")
+    courses = list(synthetic_courses(args.courses))
+
+    conn = sqlite3.connect(":memory:")
+    conn.execute("""
+        CREATE TABLE courses (
+            id INTEGER PRIMARY KEY, title TEXT, description TEXT, instructor_name TEXT,
+            category_id INTEGER, level TEXT, is_free INTEGER, rating REAL,
+            total_ratings INTEGER, total_enrollments INTEGER, created_at TEXT, is_active INTEGER
+        )
+    """)
+    conn.executemany(
+        "INSERT INTO courses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1)",
+        [tuple(c[:-1]) + (c.created_at.isoformat(),) for c in courses],
+    )
+    conn.execute("CREATE INDEX ix_courses_created ON courses (created_at)")
+
+    index = CourseSearchIndex()
+    index.build(courses)
+
+    queries = query_mix(args.queries)
+
+    def like_search(query):
+        term = f"%{query}%"
+        conn.execute("""
+            SELECT * FROM courses
+            WHERE is_active = 1 AND (title LIKE ? OR description LIKE ? OR instructor_name LIKE ?)
+            ORDER BY created_at DESC LIMIT ?
+        """, (term, term, term, args.limit + 1)).fetchall()
+
+    def index_search(query):
+        hits = index.search(query)
+        heapq.nlargest(args.limit + 1, hits, key=lambda hit: (hit.score, hit.course_id))
+
+    stats = index.stats()
+    print(f"Index build: {stats['build_seconds']:.2f}s, {stats['terms']} terms")
+    for name, fn in (("LIKE scan", like_search), ("search index", index_search)):
+        result = timed(fn, queries)
+        print(f"{name:>14}: mean {result['mean_ms']:.2f} ms, "
+              f"p50 {result['p50_ms']:.2f} ms, p95 {result['p95_ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Per-row cost of turning course rows into a JSON response body.
+
+"before" is the original path: a hand-mapped CourseResponse per row, then
+FastAPI's response_model validation, JSON-mode dump and json.dumps. "after"
+is serializers.RowMapper plus FastJSONResponse, which encodes mapped rows
+once (with orjson when installed):
+
+    python benchmarks/bench_serialization.py --rows 10000
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+from decimal import Decimal
+from datetime import datetime, timedelta
+from collections import namedtuple
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydantic import BaseModel, TypeAdapter
+
+import serializers
+from serializers import RowMapper, FastJSONResponse, as_bool, as_float, as_float_or_zero
+
+
+# Same shape as main.CourseResponse (main.py needs Firebase and SQL Server to import)
+class CourseResponse(BaseModel):
+    id: int
+    title: str
+    description: Optional[str]
+    thumbnail_url: Optional[str]
+    category_id: Optional[int]
+    category_name: Optional[str]
+    instructor_name: Optional[str]
+    duration_minutes: Optional[int]
+    level: Optional[str]
+    price: Optional[float]
+    is_free: bool
+    rating: Optional[float]
+    total_ratings: int
+    total_enrollments: int
+    is_enrolled: bool = False
+    progress_percentage: float = 0.0
+    course_url: Optional[str] = None
+
+
+FIELDS = list(CourseResponse.model_fields)
+Row = namedtuple("Row", FIELDS + ["created_at"])
+
+COURSE_MAPPER = RowMapper({
+    **{name: name for name in FIELDS},
+    "price": ("price", as_float_or_zero),
+    "is_free": ("is_free", as_bool),
+    "rating": ("rating", as_float_or_zero),
+    "is_enrolled": ("is_enrolled", as_bool),
+    "progress_percentage": ("progress_percentage", as_float),
+})
+
+
+def synthetic_rows(count: int, seed: int = 42) -> list:
+    """Rows typed the way pyodbc returns them: Decimal money/ratings, int bits"""
+    rng = random.Random(seed)
+    start = datetime(2020, 1, 1)
+    return [Row(
+        id=i, title=f"Course {i} complete guide", description="Learn things " * 20,
+        thumbnail_url=f"https://cdn.example.com/courses/{i}.jpg", category_id=rng.randint(1, 12),
+        category_name="Development", instructor_name="Jane Doe", duration_minutes=rng.randint(30, 3000),
+        level=rng.choice(["Beginner", "Intermediate", "Advanced"]),
+        price=Decimal(f"{rng.randint(0, 200)}.99"), is_free=rng.randint(0, 1),
+        rating=Decimal(f"{rng.uniform(1, 5):.1f}"), total_ratings=rng.randint(0, 5000),
+        total_enrollments=rng.randint(0, 300000), is_enrolled=rng.randint(0, 1),
+        progress_percentage=rng.uniform(0, 100), course_url=None,
+        created_at=start + timedelta(minutes=i),
+    ) for i in range(1, count + 1)]
+
+
+response_field = TypeAdapter(List[CourseResponse])
+
+
+def before(rows) -> bytes:
+    models = [CourseResponse(
+        id=row.id, title=row.title, description=row.description, thumbnail_url=row.thumbnail_url,
+        category_id=row.category_id, category_name=row.category_name, instructor_name=row.instructor_name,
+        duration_minutes=row.duration_minutes, level=row.level,
+        price=float(row.price) if row.price else 0.0, is_free=bool(row.is_free),
+        rating=float(row.rating) if row.rating else 0.0, total_ratings=row.total_ratings,
+        total_enrollments=row.total_enrollments, is_enrolled=bool(row.is_enrolled),
+        progress_percentage=float(row.progress_percentage), course_url=row.course_url,
+    ) for row in rows]
+    # What FastAPI does with a response_model: validate, dump in JSON mode, json.dumps
+    validated = response_field.validate_python(models, from_attributes=True)
+    content = response_field.dump_python(validated, mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def after(rows) -> bytes:
+    return FastJSONResponse(content=COURSE_MAPPER.many(rows)).body
+
+
+def per_row_us(fn, rows, repeat: int) -> float:
+    fn(rows)
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(rows)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) / len(rows) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=7)
+    args = parser.parse_args()
+
+    rows = synthetic_rows(args.rows)
+    assert json.loads(before(rows)) == json.loads(after(rows)), "paths must produce the same JSON"
+
+    encoder = "orjson" if serializers.orjson is not None else "json (orjson not installed)"
+    print(f"{args.rows} course rows, median of {args.repeat} runs, encoder: {encoder}")
+    slow = per_row_us(before, rows, args.repeat)
+    fast = per_row_us(after, rows, args.repeat)
+    print(f"  before (CourseResponse + response_model): {slow:6.2f} us/row, {slow * args.rows / 1000:7.1f} ms total")
+    print(f"  after  (RowMapper + FastJSONResponse):    {fast:6.2f} us/row, {fast * args.rows / 1000:7.1f} ms total")
+    print(f"  speedup: {slow / fast:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
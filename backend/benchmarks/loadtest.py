@@ -0,0 +1,438 @@
+"""Load test the API in-process against local stand-ins for SQL Server and Firebase.
+
+Seeds an SQLite stand-in database (see standins.py) with a synthetic catalog,
+users, lessons and quizzes, boots main.app with DB_CONNECT=standins:connect
+and AUTH_VERIFIER=local, and drives a weighted mix of workloads from
+concurrent virtual users over an in-process ASGI transport:
+
+    browse     categories, course pages (plus the next page), featured,
+               popular, recommended, a course detail and the user's enrollments
+    search     /courses?search= over the bench_search query mix
+    heartbeat  a course's lessons, then progress heartbeats, sometimes a completion
+    quiz       a course's quizzes, one quiz's questions and a submission
+
+Reports throughput, p50/p95/p99 latency and DB round trips per endpoint,
+saves them as JSON and compares them against an earlier run:
+
+    python benchmarks/loadtest.py --duration 30 --concurrency 16
+    python benchmarks/loadtest.py --compare benchmarks/results/baseline.json --fail-on-regression
+
+With ``--replicas N`` reads are routed to N snapshots of the seeded
+database; writes never reach them, so reads after the read-your-writes
+window see seed data.
+
+Latencies exclude network and server framing, and SQLite serializes writers,
+so absolute numbers don't carry over to SQL Server; compare runs with each
+other. Round trips per request are the same as against SQL Server.
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import asyncio
+import logging
+import argparse
+import platform
+import tempfile
+import importlib
+import subprocess
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import httpx
+
+import standins
+from bench_search import query_mix
+
+DEFAULT_MIX = "browse=45,search=20,heartbeat=25,quiz=10"
+LOCAL_AUTH_SECRET = "loadtest-secret"
+
+
+class Recorder:
+    """Latency samples and failures per endpoint label while measuring"""
+
+    def __init__(self):
+        self.recording = False
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    def record(self, label: str, elapsed: float, status_code: int):
+        if not self.recording:
+            return
+        self.latencies[label].append(elapsed)
+        self.statuses[label][status_code] += 1
+        if status_code >= 400:
+            self.errors[label] += 1
+
+
+class VirtualUser:
+    """One simulated student; every request is labelled with its endpoint for round-trip accounting"""
+
+    def __init__(self, http: httpx.AsyncClient, recorder: Recorder, world: "World", rng: random.Random):
+        self.http = http
+        self.recorder = recorder
+        self.world = world
+        self.rng = rng
+        self.user_id = 0
+        self.headers: Dict[str, str] = {}
+
+    def sign_in(self):
+        self.user_id = self.rng.randint(1, self.world.scale.users)
+        self.headers = {"Authorization": f"Bearer {self.world.token(self.user_id)}"}
+
+    async def call(self, label: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        context = standins.current_endpoint.set(label)
+        started = time.perf_counter()
+        response = None
+        try:
+            response = await self.http.request(method, url, headers=self.headers, **kwargs)
+            status_code = response.status_code
+        except Exception as e:
+            logging.getLogger(__name__).error(f"{label} raised {e!r}")
+            status_code = 599
+        finally:
+            standins.current_endpoint.reset(context)
+        self.recorder.record(label, time.perf_counter() - started, status_code)
+        return response if status_code < 400 else None
+
+    async def browse(self):
+        await self.call("GET /categories", "GET", "/categories")
+        params = {"limit": 20, "sort_by": self.rng.choice(["newest", "popular", "rating"])}
+        page = await self.call("GET /courses", "GET", "/courses", params=params)
+        next_cursor = page.headers.get("x-next-cursor") if page is not None else None
+        if next_cursor and self.rng.random() < 0.5:
+            await self.call("GET /courses (next page)", "GET", "/courses", params={**params, "cursor": next_cursor})
+        await self.call("GET /courses/featured", "GET", "/courses/featured")
+        await self.call("GET /courses/popular", "GET", "/courses/popular")
+        await self.call("GET /courses/recommended", "GET", "/courses/recommended")
+        course_id = self.rng.randint(1, self.world.scale.courses)
+        await self.call("GET /courses/{id}", "GET", f"/courses/{course_id}")
+        await self.call("GET /user/enrollments", "GET", "/user/enrollments", params={"limit": 20})
+
+    async def search(self):
+        query = self.rng.choice(self.world.queries)
+        await self.call("GET /courses?search", "GET", "/courses", params={"search": query, "limit": 20})
+
+    async def heartbeat(self):
+        course_id = self.rng.choice(self.world.enrollments[self.user_id])
+        lessons = await self.call("GET /courses/{id}/lessons", "GET", f"/courses/{course_id}/lessons")
+        if lessons is None or not lessons.json():
+            return
+        lesson = self.rng.choice(lessons.json())
+        watched = lesson["watched_duration"]
+        beats = self.rng.randint(3, 8)
+        for beat in range(beats):
+            watched += 10
+            completed = beat == beats - 1 and self.rng.random() < 0.2
+            await self.call("POST /lessons/progress", "POST", "/lessons/progress", json={
+                "lesson_id": lesson["id"], "watched_duration_seconds": watched, "is_completed": completed
+            })
+
+    async def quiz(self):
+        course_id = self.rng.choice(self.world.enrollments[self.user_id])
+        quizzes = await self.call("GET /courses/{id}/quizzes", "GET", f"/courses/{course_id}/quizzes")
+        if quizzes is None or not quizzes.json():
+            return
+        quiz_id = self.rng.choice(quizzes.json())["id"]
+        questions = await self.call("GET /quizzes/{id}/questions", "GET", f"/quizzes/{quiz_id}/questions")
+        if questions is None:
+            return
+        answers = [{
+            "question_id": question["id"],
+            "selected_option_id": self.rng.choice(question["options"])["id"] if question["options"] else None,
+        } for question in questions.json()]
+        await self.call("POST /quizzes/submit", "POST", "/quizzes/submit", json={
+            "quiz_id": quiz_id, "answers": answers, "time_taken_seconds": self.rng.randint(60, 1200)
+        })
+
+    async def run_until(self, deadline: float):
+        scenarios = [getattr(self, name) for name in self.world.mix]
+        weights = list(self.world.mix.values())
+        while time.monotonic() < deadline:
+            self.sign_in()
+            await self.rng.choices(scenarios, weights)[0]()
+
+
+class World:
+    """What the workloads know about the seeded data"""
+
+    def __init__(self, scale: standins.Scale, seeded: Dict[str, Any], mix: Dict[str, int], seed: int):
+        from auth_cache import LocalTokenVerifier
+
+        self.scale = scale
+        self.enrollments = seeded["enrollments"]
+        self.mix = mix
+        self.queries = query_mix(500, seed)
+        self._verifier = LocalTokenVerifier(LOCAL_AUTH_SECRET)
+        self._tokens: Dict[int, str] = {}
+
+    def token(self, user_id: int) -> str:
+        token = self._tokens.get(user_id)
+        if token is None:
+            uid = standins.user_uid(user_id)
+            token = self._tokens[user_id] = self._verifier.issue(uid, ttl=24 * 3600, email=f"{uid}@example.com")
+        return token
+
+
+def parse_mix(value: str) -> Dict[str, int]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ("browse", "search", "heartbeat", "quiz"):
+            raise argparse.ArgumentTypeError(f"Unknown workload {name!r}")
+        mix[name] = int(weight or 1)
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("The workload mix needs a positive weight")
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of already sorted samples"""
+    return samples[max(0, math.ceil(pct / 100 * len(samples)) - 1)]
+
+
+def summarize(recorder: Recorder, round_trips: Dict[str, int], elapsed: float) -> Dict[str, Any]:
+    endpoints = {}
+    for label in sorted(recorder.latencies):
+        samples = sorted(recorder.latencies[label])
+        endpoints[label] = {
+            "requests": len(samples),
+            "errors": recorder.errors.get(label, 0),
+            "statuses": {str(code): count for code, count in sorted(recorder.statuses[label].items())},
+            "throughput_rps": round(len(samples) / elapsed, 2),
+            "mean_ms": round(sum(samples) / len(samples) * 1000, 3),
+            "p50_ms": round(percentile(samples, 50) * 1000, 3),
+            "p95_ms": round(percentile(samples, 95) * 1000, 3),
+            "p99_ms": round(percentile(samples, 99) * 1000, 3),
+            "round_trips_per_request": round(round_trips.get(label, 0) / len(samples), 3),
+        }
+    requests = sum(endpoint["requests"] for endpoint in endpoints.values())
+    return {
+        "totals": {
+            "elapsed_seconds": round(elapsed, 3),
+            "requests": requests,
+            "errors": sum(endpoint["errors"] for endpoint in endpoints.values()),
+            "throughput_rps": round(requests / elapsed, 2),
+            "round_trips": sum(round_trips.values()),
+            "background_round_trips": round_trips.get("background", 0),
+        },
+        "endpoints": endpoints,
+    }
+
+
+async def wait_for_search_index(search_index, timeout: float = 120.0):
+    deadline = time.monotonic() + timeout
+    while not search_index.ready:
+        if time.monotonic() > deadline:
+            raise RuntimeError("Search index did not build in time")
+        await asyncio.sleep(0.05)
+
+
+async def drive(args, world: World) -> Dict[str, Any]:
+    main = importlib.import_module("main")
+    from database import db
+    from search_index import search_index
+
+    # Carry the endpoint label from the request into the DB worker threads
+    db.executor.shutdown(wait=False)
+    db.executor = standins.ContextThreadPoolExecutor(max_workers=db.max_workers, thread_name_prefix="db")
+    pool_workers = db.pool_executor._max_workers
+    db.pool_executor.shutdown(wait=False)
+    db.pool_executor = standins.ContextThreadPoolExecutor(max_workers=pool_workers, thread_name_prefix="db-pool")
+
+    recorder = Recorder()
+    async with main.app.router.lifespan_context(main.app):
+        await wait_for_search_index(search_index)
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=60) as http:
+            users = [VirtualUser(http, recorder, world, random.Random(args.seed + i)) for i in range(args.concurrency)]
+
+            if args.warmup > 0:
+                deadline = time.monotonic() + args.warmup
+                await asyncio.gather(*(user.run_until(deadline) for user in users))
+
+            standins.round_trips.reset()
+            recorder.recording = True
+            started = time.monotonic()
+            await asyncio.gather(*(user.run_until(started + args.duration) for user in users))
+            elapsed = time.monotonic() - started
+            recorder.recording = False
+            round_trips = standins.round_trips.snapshot()
+
+            health = (await http.get("/health")).json()
+
+    report = summarize(recorder, round_trips, elapsed)
+    report["health"] = health
+    return report
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def print_report(report: Dict[str, Any]):
+    totals = report["totals"]
+    print(f"\n{totals['requests']} requests in {totals['elapsed_seconds']:.1f}s, "
+          f"{totals['throughput_rps']:.1f} req/s, {totals['errors']} errors, "
+          f"{totals['background_round_trips']} background round trips")
+    print(f"{'endpoint':32} {'reqs':>7} {'err':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'rt/req':>7}")
+    for label, endpoint in report["endpoints"].items():
+        print(f"{label:32} {endpoint['requests']:7d} {endpoint['errors']:5d} {endpoint['throughput_rps']:8.1f} "
+              f"{endpoint['p50_ms']:8.2f} {endpoint['p95_ms']:8.2f} {endpoint['p99_ms']:8.2f} "
+              f"{endpoint['round_trips_per_request']:7.2f}")
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Print the change against ``baseline`` per endpoint and return the regressions"""
+    regressions = []
+    print(f"\nCompared with {baseline['meta'].get('label')} ({baseline['meta'].get('git_commit')}, "
+          f"{baseline['meta'].get('timestamp')}), threshold {threshold:.0%}:")
+    for key in ("scale", "mix", "concurrency", "replicas"):
+        if baseline["meta"].get(key, 0) != report["meta"][key]:
+            print(f"  note: {key} differs ({baseline['meta'].get(key)} -> {report['meta'][key]}), "
+                  f"per-endpoint throughput is not comparable")
+    print(f"{'endpoint':32} {'req/s':>16} {'p95 ms':>18} {'rt/req':>14}")
+    for label, endpoint in report["endpoints"].items():
+        before = baseline["endpoints"].get(label)
+        if before is None:
+            print(f"{label:32} (new)")
+            continue
+        throughput = endpoint["throughput_rps"] / before["throughput_rps"] - 1 if before["throughput_rps"] else 0.0
+        p95 = endpoint["p95_ms"] / before["p95_ms"] - 1 if before["p95_ms"] else 0.0
+        trips = endpoint["round_trips_per_request"] - before["round_trips_per_request"]
+        flags = []
+        if throughput < -threshold:
+            flags.append("throughput")
+        if p95 > threshold:
+            flags.append("p95")
+        # Round trips only vary with cache misses, so a smaller change than latency already counts
+        if trips > max(0.05, before["round_trips_per_request"] * threshold / 2):
+            flags.append("round trips")
+        if endpoint["errors"] > before["errors"]:
+            flags.append("errors")
+        if flags:
+            regressions.append(f"{label}: {', '.join(flags)}")
+        print(f"{label:32} {endpoint['throughput_rps']:8.1f} {throughput:+7.1%} {endpoint['p95_ms']:9.2f} {p95:+7.1%} "
+              f"{endpoint['round_trips_per_request']:7.2f} {trips:+6.2f}  {'REGRESSED: ' + ', '.join(flags) if flags else ''}")
+    for label in baseline["endpoints"]:
+        if label not in report["endpoints"]:
+            print(f"{label:32} (not exercised in this run)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--courses", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--lessons-per-course", type=int, default=12)
+    parser.add_argument("--quizzes-per-course", type=int, default=2)
+    parser.add_argument("--questions-per-quiz", type=int, default=10)
+    parser.add_argument("--enrollments-per-user", type=int, default=5)
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"Workload weights (default {DEFAULT_MIX})")
+    parser.add_argument("--concurrency", type=int, default=16, help="Virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="Unmeasured seconds that warm the caches first")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", help="Stand-in database file (default: a temporary file)")
+    parser.add_argument("--replicas", type=int, default=0, help="Read replicas, snapshots of the seeded database")
+    parser.add_argument("--label", default="loadtest", help="Name stored with the results")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/<label>-<timestamp>.json)")
+    parser.add_argument("--compare", help="Earlier results file to compare with")
+    parser.add_argument("--threshold", type=float, default=0.20, help="Relative change that counts as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    scale = standins.Scale(
+        courses=args.courses, users=args.users, lessons_per_course=args.lessons_per_course,
+        quizzes_per_course=args.quizzes_per_course, questions_per_quiz=args.questions_per_quiz,
+        enrollments_per_user=args.enrollments_per_user,
+    )
+    workdir = None
+    if args.db:
+        db_path = args.db
+    else:
+        workdir = tempfile.TemporaryDirectory(prefix="loadtest-")
+        db_path = os.path.join(workdir.name, "standin.db")
+
+    print(f"Seeding {db_path}: {scale.as_dict()}")
+    started = time.perf_counter()
+    seeded = standins.seed(db_path, scale, args.seed)
+    print(f"Seeded in {time.perf_counter() - started:.1f}s")
+    replicas = {}
+    for i in range(1, args.replicas + 1):
+        replica_path = f"{os.path.splitext(db_path)[0]}-replica{i}.db"
+        standins.copy_database(db_path, replica_path)
+        replicas[f"DB_REPLICA_{i}_CONNECTION_STRING"] = replica_path
+
+    # Read by main and its modules at import time
+    os.environ.update({
+        "DB_CONNECT": "standins:connect",
+        "STANDIN_DB": db_path,
+        "AUTH_VERIFIER": "local",
+        "LOCAL_AUTH_SECRET": LOCAL_AUTH_SECRET,
+        **replicas,
+    })
+    logging.basicConfig(level=args.log_level)
+    logging.getLogger().setLevel(args.log_level)
+
+    world = World(scale, seeded, args.mix, args.seed)
+    print(f"Driving {args.concurrency} virtual users for {args.warmup:g}s warmup + {args.duration:g}s, mix {args.mix}")
+    report = asyncio.run(drive(args, world))
+
+    report["meta"] = {
+        "label": args.label,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "sqlite": standins.sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "scale": scale.as_dict(),
+        "mix": args.mix,
+        "concurrency": args.concurrency,
+        "replicas": args.replicas,
+        "duration": args.duration,
+        "warmup": args.warmup,
+        "seed": args.seed,
+    }
+    print_report(report)
+
+    output = args.output or os.path.join(
+        BENCHMARKS_DIR, "results", f"{args.label}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"\nSaved results to {output}")
+
+    if workdir is not None:
+        workdir.cleanup()
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            print("\nRegressions:\n  " + "\n  ".join(regressions))
+            if args.fail_on_regression:
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
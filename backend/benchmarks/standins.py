@@ -0,0 +1,670 @@
+"""Local stand-ins for SQL Server and Firebase used by the load-test harness.
+
+``connect`` returns a DB-API connection to an SQLite file (``STANDIN_DB``)
+that accepts the T-SQL this app sends: expression-level differences (TOP,
+OUTPUT INSERTED, ISNULL, GETDATE, NVARCHAR(MAX), lock hints) are rewritten,
+and the few statements with no SQLite equivalent (the progress MERGE, the
+reconciliation UPDATE ... FROM, the schema checks) are swapped for
+equivalents. Every statement, batch, commit and rollback counts as one round
+trip, attributed to the endpoint in ``current_endpoint``.
+
+Boot the API against it with:
+
+    DB_CONNECT=standins:connect STANDIN_DB=/tmp/bench.db AUTH_VERIFIER=local \\
+        PYTHONPATH=benchmarks uvicorn main:app
+
+Read replicas are further files made with ``copy_database``, passed as
+``DB_REPLICA_1_CONNECTION_STRING=/tmp/bench-replica.db`` and so on.
+"""
+import os
+import re
+import sys
+import types
+import random
+import sqlite3
+import threading
+import contextvars
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import pyodbc
+except ImportError:
+    # No ODBC driver manager on this machine; the app only needs pyodbc's exception types
+    pyodbc = types.ModuleType("pyodbc")
+    pyodbc.Error = type("Error", (Exception,), {})
+    pyodbc.DatabaseError = type("DatabaseError", (pyodbc.Error,), {})
+    pyodbc.InterfaceError = type("InterfaceError", (pyodbc.Error,), {})
+    for _name in ("IntegrityError", "DataError", "OperationalError", "ProgrammingError"):
+        setattr(pyodbc, _name, type(_name, (pyodbc.DatabaseError,), {}))
+
+    def _no_odbc(*args, **kwargs):
+        raise pyodbc.Error("pyodbc is unavailable, use DB_CONNECT=standins:connect")
+
+    pyodbc.connect = _no_odbc
+    sys.modules["pyodbc"] = pyodbc
+
+from bench_search import synthetic_courses
+
+sqlite3.register_adapter(Decimal, float)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+sqlite3.register_converter("DATETIME", lambda value: datetime.fromisoformat(value.decode()))
+sqlite3.register_converter("DECIMAL", lambda value: Decimal(value.decode()))
+
+# Endpoint label of the work in progress; background tasks keep the default
+current_endpoint: contextvars.ContextVar[str] = contextvars.ContextVar("current_endpoint", default="background")
+
+SCHEMA = """
+    CREATE TABLE categories (
+        id INTEGER PRIMARY KEY, name TEXT NOT NULL, description TEXT, icon_url TEXT, color TEXT,
+        is_active BIT NOT NULL DEFAULT 1
+    );
+    CREATE TABLE courses (
+        id INTEGER PRIMARY KEY, title TEXT NOT NULL, description TEXT, thumbnail_url TEXT,
+        category_id INTEGER REFERENCES categories (id), instructor_name TEXT, duration_minutes INTEGER,
+        level TEXT, price DECIMAL(10, 2), is_free BIT NOT NULL DEFAULT 0, rating DECIMAL(3, 2),
+        total_ratings INTEGER NOT NULL DEFAULT 0, total_enrollments INTEGER NOT NULL DEFAULT 0,
+        course_url TEXT, is_active BIT NOT NULL DEFAULT 1,
+        created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE INDEX ix_courses_created ON courses (created_at);
+    CREATE TABLE users (
+        id INTEGER PRIMARY KEY, firebase_uid TEXT NOT NULL UNIQUE, email TEXT NOT NULL, display_name TEXT,
+        profile_picture_data TEXT, created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE user_enrollments (
+        id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL REFERENCES users (id),
+        course_id INTEGER NOT NULL REFERENCES courses (id),
+        enrolled_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP, progress_percentage DECIMAL(5, 2) DEFAULT 0,
+        is_active BIT NOT NULL DEFAULT 1, completed_lessons INTEGER NOT NULL DEFAULT 0,
+        UNIQUE (user_id, course_id)
+    );
+    CREATE TABLE course_lessons (
+        id INTEGER PRIMARY KEY, course_id INTEGER NOT NULL REFERENCES courses (id), title TEXT NOT NULL,
+        description TEXT, video_url TEXT, duration_seconds INTEGER, order_index INTEGER NOT NULL,
+        is_preview BIT NOT NULL DEFAULT 0, is_active BIT NOT NULL DEFAULT 1
+    );
+    CREATE INDEX ix_course_lessons_course ON course_lessons (course_id, order_index);
+    CREATE TABLE user_lesson_progress (
+        id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL REFERENCES users (id),
+        lesson_id INTEGER NOT NULL REFERENCES course_lessons (id),
+        watched_duration_seconds INTEGER NOT NULL DEFAULT 0, is_completed BIT NOT NULL DEFAULT 0,
+        completed_at DATETIME, last_watched_at DATETIME,
+        UNIQUE (user_id, lesson_id)
+    );
+    CREATE TABLE quizzes (
+        id INTEGER PRIMARY KEY, course_id INTEGER NOT NULL REFERENCES courses (id),
+        lesson_id INTEGER REFERENCES course_lessons (id), title TEXT NOT NULL, description TEXT,
+        total_questions INTEGER NOT NULL, time_limit_minutes INTEGER,
+        passing_score_percentage DECIMAL(5, 2) NOT NULL, attempts_allowed INTEGER NOT NULL,
+        created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP, is_active BIT NOT NULL DEFAULT 1
+    );
+    CREATE INDEX ix_quizzes_course ON quizzes (course_id);
+    CREATE TABLE quiz_questions (
+        id INTEGER PRIMARY KEY, quiz_id INTEGER NOT NULL REFERENCES quizzes (id), question_text TEXT NOT NULL,
+        question_type TEXT NOT NULL, points INTEGER NOT NULL DEFAULT 1, order_index INTEGER NOT NULL,
+        is_active BIT NOT NULL DEFAULT 1
+    );
+    CREATE INDEX ix_quiz_questions_quiz ON quiz_questions (quiz_id);
+    CREATE TABLE quiz_answer_options (
+        id INTEGER PRIMARY KEY, question_id INTEGER NOT NULL REFERENCES quiz_questions (id),
+        option_text TEXT NOT NULL, order_index INTEGER NOT NULL, is_correct BIT NOT NULL DEFAULT 0
+    );
+    CREATE INDEX ix_quiz_answer_options_question ON quiz_answer_options (question_id);
+    CREATE TABLE user_quiz_attempts (
+        id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL REFERENCES users (id),
+        quiz_id INTEGER NOT NULL REFERENCES quizzes (id), attempt_number INTEGER NOT NULL,
+        total_questions INTEGER, time_taken_seconds INTEGER, score_percentage DECIMAL(5, 2),
+        correct_answers INTEGER, started_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        completed_at DATETIME, is_passed BIT NOT NULL DEFAULT 0
+    );
+    CREATE INDEX ix_user_quiz_attempts_user ON user_quiz_attempts (user_id, quiz_id);
+    CREATE TABLE user_quiz_summaries (
+        user_id INTEGER NOT NULL, quiz_id INTEGER NOT NULL, attempts INTEGER NOT NULL,
+        best_score DECIMAL(5, 2), is_passed BIT NOT NULL DEFAULT 0, last_attempt_at DATETIME,
+        PRIMARY KEY (user_id, quiz_id)
+    );
+    CREATE TABLE catalog_imports (
+        id TEXT PRIMARY KEY, format TEXT NOT NULL, status TEXT NOT NULL,
+        records_committed INTEGER NOT NULL DEFAULT 0, courses_imported INTEGER NOT NULL DEFAULT 0,
+        invalid_records INTEGER NOT NULL DEFAULT 0, error TEXT,
+        started_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP, updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE user_quiz_answers (
+        id INTEGER PRIMARY KEY, attempt_id INTEGER NOT NULL REFERENCES user_quiz_attempts (id),
+        question_id INTEGER NOT NULL, selected_option_id INTEGER, answer_text TEXT,
+        is_correct BIT NOT NULL DEFAULT 0, points_earned INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE user_avatars (
+        user_id INTEGER NOT NULL, size INTEGER NOT NULL, content_type TEXT NOT NULL, etag TEXT NOT NULL,
+        data BLOB NOT NULL, updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (user_id, size)
+    );
+"""
+
+GETDATE = "strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')"
+
+# (pattern, replacement) applied to every statement
+EXPRESSION_REWRITES = [
+    (re.compile(r"\bWITH\s*\(\s*UPDLOCK\s*,\s*HOLDLOCK\s*\)", re.I), ""),
+    (re.compile(r"\bAS\s+NVARCHAR\s*\(\s*MAX\s*\)", re.I), "AS TEXT"),
+    (re.compile(r"\bAS\s+BIT\b", re.I), "AS INTEGER"),
+    (re.compile(r"\bISNULL\s*\(", re.I), "IFNULL("),
+    (re.compile(r"\bGETDATE\s*\(\s*\)", re.I), GETDATE),
+]
+TOP_PARAM = re.compile(r"^(\s*SELECT\s+)TOP\s*\(\s*\?\s*\)", re.I)
+TOP_LITERAL = re.compile(r"^(\s*SELECT\s+)TOP\s*\(?\s*(\d+)\s*\)?", re.I)
+OUTPUT_INSERTED = re.compile(r"\bOUTPUT\s+(INSERTED\.\w+(?:\s*,\s*INSERTED\.\w+)*)", re.I)
+
+# Set-based repair written with UPDATE ... FROM over a CTE instead of T-SQL's aliased UPDATE
+SQLITE_RECONCILE_PROGRESS = """
+    WITH totals AS (
+        SELECT course_id, COUNT(*) AS lessons FROM course_lessons WHERE is_active = 1 GROUP BY course_id
+    ), done AS (
+        SELECT ulp.user_id, cl.course_id, COUNT(*) AS completed
+        FROM user_lesson_progress ulp
+        JOIN course_lessons cl ON cl.id = ulp.lesson_id AND cl.is_active = 1
+        WHERE ulp.is_completed = 1
+        GROUP BY ulp.user_id, cl.course_id
+    ), drifted AS (
+        SELECT ue.id, IFNULL(done.completed, 0) AS completed, totals.lessons
+        FROM user_enrollments ue
+        LEFT JOIN totals ON totals.course_id = ue.course_id
+        LEFT JOIN done ON done.user_id = ue.user_id AND done.course_id = ue.course_id
+        WHERE ue.completed_lessons <> IFNULL(done.completed, 0)
+           OR (totals.lessons > 0 AND ABS(IFNULL(ue.progress_percentage, 0)
+               - CAST(IFNULL(done.completed, 0) AS REAL) / totals.lessons * 100) > 0.001)
+    )
+    UPDATE user_enrollments
+    SET completed_lessons = drifted.completed,
+        progress_percentage = CASE
+            WHEN drifted.lessons > 0 THEN CAST(drifted.completed AS REAL) / drifted.lessons * 100
+            ELSE progress_percentage
+        END
+    FROM drifted
+    WHERE drifted.id = user_enrollments.id
+"""
+
+UPSERT_PROGRESS = """
+    INSERT INTO user_lesson_progress
+        (user_id, lesson_id, watched_duration_seconds, is_completed, completed_at, last_watched_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (user_id, lesson_id) DO UPDATE SET
+        watched_duration_seconds = excluded.watched_duration_seconds,
+        is_completed = excluded.is_completed,
+        completed_at = excluded.completed_at,
+        last_watched_at = excluded.last_watched_at
+"""
+
+
+def _merge_progress(conn: sqlite3.Connection, params: List[Any]) -> Tuple[List[str], List[tuple]]:
+    """progress_buffer.MERGE_PROGRESS: upsert each row and report is_completed flips"""
+    now = datetime.now()
+    changes = []
+    for i in range(0, len(params), 5):
+        user_id, lesson_id, watched, is_completed, age_ms = params[i:i + 5]
+        seen_at = now - timedelta(milliseconds=age_ms)
+        previous = conn.execute(
+            "SELECT is_completed FROM user_lesson_progress WHERE user_id = ? AND lesson_id = ?",
+            (user_id, lesson_id)
+        ).fetchone()
+        conn.execute(UPSERT_PROGRESS, (
+            user_id, lesson_id, watched, int(bool(is_completed)), seen_at if is_completed else None, seen_at
+        ))
+        delta = int(bool(is_completed)) - (previous[0] if previous else 0)
+        if delta:
+            changes.append((user_id, lesson_id, delta))
+    return ["user_id", "lesson_id", "delta"], changes
+
+
+SQLITE_QUIZ_SUMMARY_COUNTS = """
+    SELECT user_id, quiz_id, COUNT(*) AS attempts, MAX(score_percentage) AS best_score,
+           MAX(is_passed) AS is_passed, MAX(started_at) AS last_attempt_at
+    FROM user_quiz_attempts
+    WHERE quiz_id BETWEEN ? AND ?
+    GROUP BY user_id, quiz_id
+"""
+
+
+def _reconcile_quiz_summaries(conn: sqlite3.Connection, params: List[Any]) -> Tuple[List[str], List[tuple]]:
+    """quiz_engine.RECONCILE_QUIZ_SUMMARIES: fix, add and drop summaries of one quiz range"""
+    first, last = params[:2]
+    repaired = conn.execute(f"""
+        INSERT INTO user_quiz_summaries (user_id, quiz_id, attempts, best_score, is_passed, last_attempt_at)
+        SELECT * FROM ({SQLITE_QUIZ_SUMMARY_COUNTS}) AS source WHERE true
+        ON CONFLICT (user_id, quiz_id) DO UPDATE SET
+            attempts = excluded.attempts, best_score = excluded.best_score,
+            is_passed = excluded.is_passed, last_attempt_at = excluded.last_attempt_at
+        WHERE attempts <> excluded.attempts
+           OR IFNULL(best_score, -1) <> IFNULL(excluded.best_score, -1)
+           OR is_passed <> excluded.is_passed
+    """, (first, last)).rowcount
+    repaired += conn.execute("""
+        DELETE FROM user_quiz_summaries
+        WHERE quiz_id BETWEEN ? AND ?
+          AND NOT EXISTS (SELECT 1 FROM user_quiz_attempts a
+                          WHERE a.user_id = user_quiz_summaries.user_id AND a.quiz_id = user_quiz_summaries.quiz_id)
+    """, (first, last)).rowcount
+    return ["repaired"], [(repaired,)]
+
+
+def _insert_returning(table: str, columns: List[str]):
+    """catalog_io.INSERT_RETURNING: insert row by row and report (row_key, id)"""
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+    width = len(columns) + 1
+
+    def handler(conn: sqlite3.Connection, params: List[Any]) -> Tuple[List[str], List[tuple]]:
+        ids = []
+        for i in range(0, len(params), width):
+            row_key, *values = params[i:i + width]
+            ids.append((row_key, conn.execute(sql, values).lastrowid))
+        return ["row_key", "id"], ids
+    return handler
+
+
+def _statement_overrides() -> Tuple[Dict[str, Optional[str]], List[Tuple[str, Any]]]:
+    """Exact-text replacements (None means no-op) and prefix handlers, keyed by the app's own SQL"""
+    from avatar_store import ENSURE_AVATAR_TABLE
+    from progress_buffer import MERGE_PROGRESS
+    from progress_counters import ENSURE_COMPLETED_LESSONS_COLUMN, RECONCILE_PROGRESS
+    from quiz_engine import ENSURE_QUIZ_SUMMARY_TABLE, RECONCILE_QUIZ_SUMMARIES
+    from catalog_io import ENSURE_CATALOG_IMPORT_TABLE, IMPORT_COLUMNS, INSERT_RETURNING
+
+    replacements = {
+        # The stand-in schema already has the column and the table
+        ENSURE_COMPLETED_LESSONS_COLUMN: None,
+        ENSURE_AVATAR_TABLE: None,
+        ENSURE_QUIZ_SUMMARY_TABLE: None,
+        ENSURE_CATALOG_IMPORT_TABLE: None,
+        RECONCILE_PROGRESS: SQLITE_RECONCILE_PROGRESS,
+    }
+    handlers = [
+        (MERGE_PROGRESS.split("{values}")[0], _merge_progress),
+        (RECONCILE_QUIZ_SUMMARIES, _reconcile_quiz_summaries),
+    ]
+    handlers += [
+        (INSERT_RETURNING[table].split("{values}")[0], _insert_returning(table, [name for name, _ in columns]))
+        for table, columns in IMPORT_COLUMNS.items()
+    ]
+    return replacements, handlers
+
+
+class RoundTrips:
+    """Round trips per endpoint label, counted from every connection"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = defaultdict(int)
+
+    def add(self):
+        label = current_endpoint.get()
+        with self._lock:
+            self._counts[label] += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+round_trips = RoundTrips()
+
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """Runs each job in the submitter's context, so round trips land on the right endpoint"""
+
+    def submit(self, fn, *args, **kwargs):
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+class Translator:
+    """Rewrites T-SQL statements into SQLite, caching the result per statement text"""
+
+    def __init__(self):
+        self._cache: Dict[str, Tuple[Optional[str], Optional[int]]] = {}
+        self._lock = threading.Lock()
+        self._replacements = None
+        self._handlers = None
+
+    def handler_for(self, sql: str):
+        self._load()
+        for prefix, handler in self._handlers:
+            if sql.startswith(prefix):
+                return handler
+        return None
+
+    def translate(self, sql: str) -> Tuple[Optional[str], Optional[int]]:
+        """SQLite text (None for a no-op) and the index of a TOP (?) parameter to move to LIMIT"""
+        cached = self._cache.get(sql)
+        if cached is not None:
+            return cached
+        self._load()
+        if sql in self._replacements:
+            result = (self._replacements[sql], None)
+        else:
+            result = self._rewrite(sql)
+        with self._lock:
+            self._cache[sql] = result
+        return result
+
+    def _load(self):
+        if self._replacements is None:
+            self._replacements, self._handlers = _statement_overrides()
+
+    @staticmethod
+    def _rewrite(sql: str) -> Tuple[str, Optional[int]]:
+        for pattern, replacement in EXPRESSION_REWRITES:
+            sql = pattern.sub(replacement, sql)
+
+        top_index = None
+        match = TOP_PARAM.match(sql)
+        if match:
+            top_index = sql[:match.start()].count("?")
+            sql = match.group(1) + sql[match.end():].rstrip().rstrip(";") + "\nLIMIT ?"
+        else:
+            match = TOP_LITERAL.match(sql)
+            if match:
+                sql = match.group(1) + sql[match.end():].rstrip().rstrip(";") + f"\nLIMIT {match.group(2)}"
+
+        match = OUTPUT_INSERTED.search(sql)
+        if match:
+            columns = ", ".join(column.split(".", 1)[1] for column in re.split(r"\s*,\s*", match.group(1)))
+            sql = sql[:match.start()] + sql[match.end():].rstrip().rstrip(";") + f"\nRETURNING {columns}"
+        return sql, top_index
+
+
+translator = Translator()
+
+_row_types: Dict[Tuple[str, ...], type] = {}
+
+
+def _row_type(description) -> type:
+    names = tuple(column[0] for column in description)
+    row_type = _row_types.get(names)
+    if row_type is None:
+        # Attribute access like pyodbc.Row
+        row_type = _row_types[names] = namedtuple("Row", names, rename=True)
+    return row_type
+
+
+def _translate_error(e: sqlite3.Error) -> Exception:
+    for sqlite_error, odbc_error in (
+        (sqlite3.IntegrityError, pyodbc.IntegrityError),
+        (sqlite3.DataError, pyodbc.DataError),
+        (sqlite3.OperationalError, pyodbc.OperationalError),
+    ):
+        if isinstance(e, sqlite_error):
+            return odbc_error(str(e))
+    return pyodbc.Error(str(e))
+
+
+class StandInCursor:
+    """The subset of pyodbc.Cursor the app uses"""
+
+    def __init__(self, connection: "StandInConnection"):
+        self._connection = connection
+        self._cursor = connection.raw.cursor()
+        self._rows: Optional[List[tuple]] = None
+        self.description = None
+        self.rowcount = -1
+        self.fast_executemany = False
+
+    def execute(self, sql: str, *params):
+        round_trips.add()
+        params = list(params[0]) if len(params) == 1 and isinstance(params[0], (list, tuple)) else list(params)
+        self._rows = None
+        try:
+            handler = translator.handler_for(sql)
+            if handler is not None:
+                columns, rows = handler(self._connection.raw, params)
+                row_type = namedtuple("Row", columns)
+                self.description = [(name,) for name in columns]
+                self._rows = [row_type(*row) for row in rows]
+                self.rowcount = len(rows)
+                return self
+
+            translated, top_index = translator.translate(sql)
+            if translated is None:
+                self.description, self.rowcount = None, 0
+                return self
+            if top_index is not None:
+                params.append(params.pop(top_index))
+            self._cursor.execute(translated, params)
+            self.description = self._cursor.description
+            self.rowcount = self._cursor.rowcount
+            if self.description is not None and "RETURNING" in translated:
+                # SQLite applies the insert while the returned rows are read
+                self._rows = [_row_type(self.description)(*row) for row in self._cursor.fetchall()]
+        except sqlite3.Error as e:
+            raise _translate_error(e) from e
+        return self
+
+    def executemany(self, sql: str, rows):
+        round_trips.add()
+        translated, _ = translator.translate(sql)
+        try:
+            self._cursor.executemany(translated, [list(row) for row in rows])
+        except sqlite3.Error as e:
+            raise _translate_error(e) from e
+        self.rowcount = self._cursor.rowcount
+
+    def fetchone(self):
+        if self._rows is not None:
+            return self._rows.pop(0) if self._rows else None
+        row = self._cursor.fetchone()
+        return _row_type(self._cursor.description)(*row) if row is not None else None
+
+    def fetchall(self) -> list:
+        if self._rows is not None:
+            rows, self._rows = self._rows, []
+            return rows
+        if self._cursor.description is None:
+            return []
+        row_type = _row_type(self._cursor.description)
+        return [row_type(*row) for row in self._cursor.fetchall()]
+
+    def fetchmany(self, size: int) -> list:
+        if self._rows is not None:
+            rows, self._rows = self._rows[:size], self._rows[size:]
+            return rows
+        if self._cursor.description is None:
+            return []
+        row_type = _row_type(self._cursor.description)
+        return [row_type(*row) for row in self._cursor.fetchmany(size)]
+
+    def cancel(self):
+        self._connection.raw.interrupt()
+
+    def close(self):
+        self._cursor.close()
+
+
+class StandInConnection:
+    """The subset of pyodbc.Connection the app uses, over one SQLite connection"""
+
+    def __init__(self, raw: sqlite3.Connection):
+        self.raw = raw
+        self.timeout = 0
+
+    def cursor(self) -> StandInCursor:
+        return StandInCursor(self)
+
+    def commit(self):
+        round_trips.add()
+        try:
+            self.raw.commit()
+        except sqlite3.Error as e:
+            raise _translate_error(e) from e
+
+    def rollback(self):
+        round_trips.add()
+        try:
+            self.raw.rollback()
+        except sqlite3.Error as e:
+            raise _translate_error(e) from e
+
+    def close(self):
+        self.raw.close()
+
+
+def open_sqlite(path: str) -> sqlite3.Connection:
+    raw = sqlite3.connect(path, timeout=30, check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES)
+    raw.execute("PRAGMA journal_mode = WAL")
+    raw.execute("PRAGMA synchronous = NORMAL")
+    raw.execute("PRAGMA foreign_keys = ON")
+    return raw
+
+
+def connect(path: Optional[str] = None) -> StandInConnection:
+    """DB_CONNECT entry point: a connection to the seeded database at STANDIN_DB.
+
+    Replicas pass their DB_REPLICA_<n>_CONNECTION_STRING, here another database file.
+    """
+    path = path or os.getenv("STANDIN_DB")
+    if not path or not os.path.exists(path):
+        raise pyodbc.OperationalError(f"Stand-in database {path!r} does not exist, seed it first")
+    return StandInConnection(open_sqlite(path))
+
+
+CATEGORY_NAMES = [
+    "Development", "Business", "Design", "Marketing", "IT & Software", "Personal Development",
+    "Photography", "Music", "Health & Fitness", "Teaching", "Finance", "Data Science",
+]
+
+
+class Scale:
+    """How much synthetic data to seed"""
+
+    def __init__(self, courses: int = 2000, users: int = 1000, lessons_per_course: int = 12,
+                 quizzes_per_course: int = 2, questions_per_quiz: int = 10, enrollments_per_user: int = 5):
+        self.courses = courses
+        self.users = users
+        self.lessons_per_course = lessons_per_course
+        self.quizzes_per_course = quizzes_per_course
+        self.questions_per_quiz = questions_per_quiz
+        self.enrollments_per_user = enrollments_per_user
+
+    def as_dict(self) -> Dict[str, int]:
+        return dict(vars(self))
+
+
+def user_uid(index: int) -> str:
+    return f"bench-user-{index}"
+
+
+def seed(path: str, scale: Scale, seed_value: int = 42) -> Dict[str, Any]:
+    """Create a fresh database at ``path``; returns what the workloads need to know about it"""
+    if os.path.exists(path):
+        os.remove(path)
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+    rng = random.Random(seed_value)
+    raw = open_sqlite(path)
+    raw.executescript(SCHEMA)
+    start = datetime(2020, 1, 1)
+
+    raw.executemany(
+        "INSERT INTO categories (id, name, description, icon_url, color) VALUES (?, ?, ?, ?, ?)",
+        [(i, name, f"{name} courses", f"https://cdn.example.com/icons/{i}.png", "#4A90E2")
+         for i, name in enumerate(CATEGORY_NAMES, 1)]
+    )
+
+    # Enrollments are heavy-tailed, so featured/popular hold a few dozen courses rather than half the catalog
+    raw.executemany("""
+        INSERT INTO courses (id, title, description, thumbnail_url, category_id, instructor_name,
+                             duration_minutes, level, price, is_free, rating, total_ratings,
+                             total_enrollments, course_url, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, [(
+        course.id, course.title, course.description, f"https://cdn.example.com/courses/{course.id}.jpg",
+        course.category_id, course.instructor_name, rng.randint(30, 3000), course.level,
+        0 if course.is_free else rng.randint(10, 200) - 0.01, course.is_free, course.rating,
+        course.total_ratings, int(300000 * rng.random() ** 20),
+        f"https://videos.example.com/courses/{course.id}", course.created_at,
+    ) for course in synthetic_courses(scale.courses, seed_value)])
+
+    lessons, quizzes, questions, options = [], [], [], []
+    lesson_id = quiz_id = question_id = option_id = 0
+    for course_id in range(1, scale.courses + 1):
+        for order in range(1, scale.lessons_per_course + 1):
+            lesson_id += 1
+            lessons.append((lesson_id, course_id, f"Lesson {order}", f"Lesson {order} of course {course_id}",
+                            f"https://videos.example.com/lessons/{lesson_id}.mp4", rng.randint(120, 1800),
+                            order, int(order == 1)))
+        for number in range(1, scale.quizzes_per_course + 1):
+            quiz_id += 1
+            # Generous attempt limits so repeated submissions keep measuring grading, not the 400
+            quizzes.append((quiz_id, course_id, f"Quiz {number}", f"Checkpoint {number}",
+                            scale.questions_per_quiz, 20, 70, 1000000, start + timedelta(minutes=quiz_id)))
+            for order in range(1, scale.questions_per_quiz + 1):
+                question_id += 1
+                questions.append((question_id, quiz_id, f"Question {order} of quiz {quiz_id}?",
+                                  "multiple_choice", rng.randint(1, 3), order))
+                correct = rng.randint(1, 4)
+                for choice in range(1, 5):
+                    option_id += 1
+                    options.append((option_id, question_id, f"Option {choice}", choice, int(choice == correct)))
+
+    raw.executemany("""
+        INSERT INTO course_lessons (id, course_id, title, description, video_url, duration_seconds,
+                                    order_index, is_preview)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, lessons)
+    raw.executemany("""
+        INSERT INTO quizzes (id, course_id, title, description, total_questions, time_limit_minutes,
+                             passing_score_percentage, attempts_allowed, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, quizzes)
+    raw.executemany("""
+        INSERT INTO quiz_questions (id, quiz_id, question_text, question_type, points, order_index)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, questions)
+    raw.executemany("""
+        INSERT INTO quiz_answer_options (id, question_id, option_text, order_index, is_correct)
+        VALUES (?, ?, ?, ?, ?)
+    """, options)
+
+    raw.executemany(
+        "INSERT INTO users (id, firebase_uid, email, display_name) VALUES (?, ?, ?, ?)",
+        [(i, user_uid(i), f"{user_uid(i)}@example.com", f"Bench User {i}") for i in range(1, scale.users + 1)]
+    )
+    enrollments = {}
+    per_user = min(scale.enrollments_per_user, scale.courses)
+    for user_id in range(1, scale.users + 1):
+        enrollments[user_id] = rng.sample(range(1, scale.courses + 1), per_user)
+    raw.executemany(
+        "INSERT INTO user_enrollments (user_id, course_id, enrolled_at) VALUES (?, ?, ?)",
+        [(user_id, course_id, start + timedelta(days=1, seconds=user_id * 100 + n))
+         for user_id, courses in enrollments.items() for n, course_id in enumerate(courses)]
+    )
+    raw.commit()
+    raw.close()
+
+    return {
+        "enrollments": enrollments,
+        "lessons_per_course": scale.lessons_per_course,
+        "quizzes_per_course": scale.quizzes_per_course,
+    }
+
+
+def copy_database(source: str, target: str):
+    """Snapshot a seeded database to serve as a read replica. Nothing replicates
+    afterwards, so writes only show up on the primary, like unbounded lag."""
+    for path in (target, target + "-wal", target + "-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+    src, dst = sqlite3.connect(source), sqlite3.connect(target)
+    try:
+        src.backup(dst)
+    finally:
+        src.close()
+        dst.close()
+
@@ -0,0 +1,83 @@
+import os
+import time
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogCache:
+    """Process-wide TTL cache for catalog data that is identical for every user.
+
+    Concurrent misses on the same key share one load. ``invalidate`` drops
+    entries immediately and bumps ``version`` so dependants can tell the
+    catalog changed.
+    """
+
+    def __init__(self, ttl: float = 60.0, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: Dict[str, Any] = {}  # key -> (value, expires_at)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._hits = defaultdict(int)
+        self._misses = defaultdict(int)
+        self.version = 1
+
+    async def get(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None and self._clock() < entry[1]:
+            self._hits[key] += 1
+            return entry[0]
+
+        self._misses[key] += 1
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            await asyncio.wait([pending])
+            if not pending.cancelled():
+                return pending.result()
+            return await self.get(key, loader)
+
+        pending = asyncio.get_running_loop().create_future()
+        self._inflight[key] = pending
+        version = self.version
+        try:
+            value = await loader()
+            # Don't store a result that raced with an invalidation
+            if version == self.version:
+                self._entries[key] = (value, self._clock() + self.ttl)
+            pending.set_result(value)
+            return value
+        finally:
+            if not pending.done():
+                pending.cancel()
+            del self._inflight[key]
+
+    def invalidate(self, *keys: str):
+        """Drop the given keys, or everything when called without arguments"""
+        if keys:
+            for key in keys:
+                self._entries.pop(key, None)
+        else:
+            self._entries.clear()
+        self.version += 1
+        logger.info(f"Catalog cache invalidated: {', '.join(keys) or 'all'}")
+
+    def stats(self) -> Dict[str, Any]:
+        hits, misses = sum(self._hits.values()), sum(self._misses.values())
+        return {
+            "version": self.version,
+            "entries": len(self._entries),
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            "keys": {
+                key: {"hits": self._hits[key], "misses": self._misses[key]}
+                for key in sorted(set(self._hits) | set(self._misses))
+            },
+        }
+
+
+catalog_cache = CatalogCache(ttl=float(os.getenv("CATALOG_CACHE_TTL", "60")))
@@ -0,0 +1,624 @@
+import io
+import os
+import csv
+import json
+import time
+import codecs
+import logging
+from collections import OrderedDict, defaultdict
+from typing import Any, AsyncIterable, AsyncIterator, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, ValidationError, model_validator
+
+from database import AsyncConnection, db
+from serializers import dumps
+from search_index import search_index, index_courses
+from progress_counters import lesson_counts
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("jsonl", "csv")
+
+# SQL Server accepts at most 2100 parameters per statement
+MAX_STATEMENT_PARAMS = 2000
+
+# A single JSONL line or CSV record larger than this is rejected instead of buffered
+MAX_RECORD_CHARS = 10 * 1024 * 1024
+
+# Courses per export page (and per IN list for their lessons and quizzes)
+EXPORT_PAGE = 200
+
+# Errors kept per import for the status report; the rest are only counted
+MAX_REPORTED_ERRORS = 50
+
+
+# Import records: the writable fields of CourseResponse, LessonResponse,
+# QuizResponse and QuestionResponse, nested the way a course is exported.
+# ``id`` is the source system's id, only used to resolve quiz -> lesson links.
+class OptionRecord(BaseModel):
+    option_text: str
+    order_index: int
+    is_correct: bool = False
+
+class QuestionRecord(BaseModel):
+    question_text: str
+    question_type: str = "multiple_choice"
+    points: int = 1
+    order_index: int
+    options: List[OptionRecord] = []
+
+class QuizRecord(BaseModel):
+    lesson_id: Optional[int] = None
+    title: str
+    description: Optional[str] = None
+    total_questions: Optional[int] = None  # defaults to len(questions)
+    time_limit_minutes: Optional[int] = None
+    passing_score_percentage: float
+    attempts_allowed: int
+    questions: List[QuestionRecord] = []
+
+class LessonRecord(BaseModel):
+    id: Optional[int] = None
+    title: str
+    description: Optional[str] = None
+    video_url: Optional[str] = None
+    duration_seconds: Optional[int] = None
+    order_index: int
+    is_preview: bool = False
+
+class CourseRecord(BaseModel):
+    id: Optional[int] = None
+    title: str
+    description: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+    category_id: Optional[int] = None
+    instructor_name: Optional[str] = None
+    duration_minutes: Optional[int] = None
+    level: Optional[str] = None
+    price: Optional[float] = None
+    is_free: bool = False
+    rating: Optional[float] = None
+    total_ratings: int = 0
+    total_enrollments: int = 0
+    course_url: Optional[str] = None
+    lessons: List[LessonRecord] = []
+    quizzes: List[QuizRecord] = []
+
+    @model_validator(mode="after")
+    def check_lesson_links(self):
+        lesson_ids = {lesson.id for lesson in self.lessons if lesson.id is not None}
+        for quiz in self.quizzes:
+            if quiz.lesson_id is not None and quiz.lesson_id not in lesson_ids:
+                raise ValueError(f"quiz {quiz.title!r} links to lesson {quiz.lesson_id}, which is not in this course")
+        return self
+
+
+# Columns written per table with the type their parameters are cast to
+IMPORT_COLUMNS: Dict[str, List[Tuple[str, str]]] = {
+    "courses": [
+        ("title", "NVARCHAR(MAX)"), ("description", "NVARCHAR(MAX)"), ("thumbnail_url", "NVARCHAR(MAX)"),
+        ("category_id", "INT"), ("instructor_name", "NVARCHAR(MAX)"), ("duration_minutes", "INT"),
+        ("level", "NVARCHAR(MAX)"), ("price", "DECIMAL(10, 2)"), ("is_free", "BIT"),
+        ("rating", "DECIMAL(3, 2)"), ("total_ratings", "INT"), ("total_enrollments", "INT"),
+        ("course_url", "NVARCHAR(MAX)"),
+    ],
+    "course_lessons": [
+        ("course_id", "INT"), ("title", "NVARCHAR(MAX)"), ("description", "NVARCHAR(MAX)"),
+        ("video_url", "NVARCHAR(MAX)"), ("duration_seconds", "INT"), ("order_index", "INT"), ("is_preview", "BIT"),
+    ],
+    "quizzes": [
+        ("course_id", "INT"), ("lesson_id", "INT"), ("title", "NVARCHAR(MAX)"), ("description", "NVARCHAR(MAX)"),
+        ("total_questions", "INT"), ("time_limit_minutes", "INT"), ("passing_score_percentage", "DECIMAL(5, 2)"),
+        ("attempts_allowed", "INT"),
+    ],
+    "quiz_questions": [
+        ("quiz_id", "INT"), ("question_text", "NVARCHAR(MAX)"), ("question_type", "NVARCHAR(MAX)"),
+        ("points", "INT"), ("order_index", "INT"),
+    ],
+}
+
+def _insert_returning(table: str, columns: List[Tuple[str, str]]) -> str:
+    """Multi-row insert that reports the new id of every source row by its row_key.
+
+    INSERT ... OUTPUT can't refer to the source rows, MERGE can.
+    """
+    names = ", ".join(name for name, _ in columns)
+    return f"""
+    MERGE {table} AS target
+    USING (VALUES {{values}}) AS source (row_key, {names})
+    ON 1 = 0
+    WHEN NOT MATCHED THEN
+        INSERT ({names})
+        VALUES ({", ".join(f"source.{name}" for name, _ in columns)})
+    OUTPUT source.row_key, inserted.id;
+"""
+
+INSERT_RETURNING = {table: _insert_returning(table, columns) for table, columns in IMPORT_COLUMNS.items()}
+VALUES_ROWS = {
+    table: "(CAST(? AS INT), " + ", ".join(f"CAST(? AS {sql_type})" for _, sql_type in columns) + ")"
+    for table, columns in IMPORT_COLUMNS.items()
+}
+
+# Options need no ids back, so they go in one array-bound batch
+INSERT_OPTIONS = """
+    INSERT INTO quiz_answer_options (question_id, option_text, order_index, is_correct)
+    VALUES (?, ?, ?, ?)
+"""
+
+# One row per import_id: how far it got, so a re-sent file resumes after the last committed chunk
+ENSURE_CATALOG_IMPORT_TABLE = """
+    IF OBJECT_ID('catalog_imports', 'U') IS NULL
+        CREATE TABLE catalog_imports (
+            id NVARCHAR(100) NOT NULL CONSTRAINT PK_catalog_imports PRIMARY KEY,
+            format NVARCHAR(10) NOT NULL,
+            status NVARCHAR(20) NOT NULL,
+            records_committed INT NOT NULL CONSTRAINT DF_catalog_imports_records DEFAULT 0,
+            courses_imported INT NOT NULL CONSTRAINT DF_catalog_imports_courses DEFAULT 0,
+            invalid_records INT NOT NULL CONSTRAINT DF_catalog_imports_invalid DEFAULT 0,
+            error NVARCHAR(MAX) NULL,
+            started_at DATETIME NOT NULL CONSTRAINT DF_catalog_imports_started DEFAULT GETDATE(),
+            updated_at DATETIME NOT NULL CONSTRAINT DF_catalog_imports_updated DEFAULT GETDATE()
+        )
+"""
+
+IMPORT_STATE_QUERY = """
+    SELECT id, format, status, records_committed, courses_imported, invalid_records, error,
+           started_at, updated_at
+    FROM catalog_imports
+    WHERE id = ?
+"""
+START_IMPORT = "INSERT INTO catalog_imports (id, format, status) VALUES (?, ?, 'running')"
+RESUME_IMPORT = "UPDATE catalog_imports SET status = 'running', error = NULL, updated_at = GETDATE() WHERE id = ?"
+CHECKPOINT_IMPORT = """
+    UPDATE catalog_imports
+    SET records_committed = ?, courses_imported = courses_imported + ?,
+        invalid_records = invalid_records + ?, updated_at = GETDATE()
+    WHERE id = ?
+"""
+FINISH_IMPORT = "UPDATE catalog_imports SET status = ?, error = ?, updated_at = GETDATE() WHERE id = ?"
+
+# Flat course columns, the whole record in CSV
+CSV_FIELDS = [name for name, _ in IMPORT_COLUMNS["courses"]]
+
+EXPORT_COURSES_QUERY = """
+    SELECT TOP (?) id, title, CAST(description AS NVARCHAR(MAX)) AS description, thumbnail_url, category_id,
+           instructor_name, duration_minutes, level, price, is_free, rating, total_ratings,
+           total_enrollments, course_url
+    FROM courses
+    WHERE is_active = 1 AND id > ?
+    ORDER BY id
+"""
+EXPORT_LESSONS_QUERY = """
+    SELECT id, course_id, title, CAST(description AS NVARCHAR(MAX)) AS description, video_url,
+           duration_seconds, order_index, is_preview
+    FROM course_lessons
+    WHERE is_active = 1 AND course_id IN ({ids})
+    ORDER BY course_id, order_index
+"""
+EXPORT_QUIZZES_QUERY = """
+    SELECT id, course_id, lesson_id, title, CAST(description AS NVARCHAR(MAX)) AS description,
+           total_questions, time_limit_minutes, passing_score_percentage, attempts_allowed
+    FROM quizzes
+    WHERE is_active = 1 AND course_id IN ({ids})
+    ORDER BY course_id, created_at, id
+"""
+EXPORT_QUESTIONS_QUERY = """
+    SELECT qq.id, qq.quiz_id, CAST(qq.question_text AS NVARCHAR(MAX)) AS question_text,
+           qq.question_type, qq.points, qq.order_index,
+           CAST(qao.option_text AS NVARCHAR(MAX)) AS option_text,
+           qao.order_index AS option_order, qao.is_correct
+    FROM quiz_questions qq
+    JOIN quizzes q ON q.id = qq.quiz_id
+    LEFT JOIN quiz_answer_options qao ON qao.question_id = qq.id
+    WHERE q.is_active = 1 AND qq.is_active = 1 AND q.course_id IN ({ids})
+    ORDER BY qq.quiz_id, qq.order_index, qq.id, qao.order_index
+"""
+
+EXPORT_COURSE_FIELDS = ["id"] + CSV_FIELDS
+EXPORT_LESSON_FIELDS = ["id", "title", "description", "video_url", "duration_seconds", "order_index", "is_preview"]
+EXPORT_QUIZ_FIELDS = [
+    "lesson_id", "title", "description", "total_questions", "time_limit_minutes",
+    "passing_score_percentage", "attempts_allowed",
+]
+
+
+class ImportInProgress(Exception):
+    pass
+
+
+async def read_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """Split a byte stream into lines without holding more than one partial line"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        if "\n" not in pending:
+            if len(pending) > MAX_RECORD_CHARS:
+                raise ValueError(f"Line longer than {MAX_RECORD_CHARS} characters")
+            continue
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending.strip():
+        yield pending.rstrip("\r")
+
+
+async def read_records(lines: AsyncIterable[str], fmt: str) -> AsyncIterator[Tuple[int, Any]]:
+    """Number and decode each record; undecodable ones come through as a ValueError.
+
+    JSONL records are whole courses. CSV records are flat courses under a
+    header row and may span lines inside quoted fields.
+    """
+    number = 0
+    if fmt == "jsonl":
+        async for line in lines:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                yield number, json.loads(line)
+            except ValueError as e:
+                yield number, ValueError(f"Invalid JSON: {e}")
+        return
+
+    header = None
+    pending: List[str] = []
+    async for line in lines:
+        pending.append(line)
+        # A record is complete once its quotes are balanced (escaped quotes come in pairs)
+        if sum(part.count('"') for part in pending) % 2:
+            if sum(len(part) for part in pending) > MAX_RECORD_CHARS:
+                raise ValueError(f"CSV record longer than {MAX_RECORD_CHARS} characters")
+            continue
+        text, pending = "\n".join(pending), []
+        if not text.strip():
+            continue
+        fields = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip() for name in fields]
+            continue
+        number += 1
+        if len(fields) != len(header):
+            yield number, ValueError(f"Expected {len(header)} fields, got {len(fields)}")
+            continue
+        yield number, {name: value if value != "" else None for name, value in zip(header, fields)}
+    if pending:
+        yield number + 1, ValueError("Unterminated quoted field at end of input")
+
+
+class ImportJob:
+    """Progress of one import run; records before ``resumed_from`` were committed by an earlier run"""
+
+    def __init__(self, import_id: str, fmt: str, resumed_from: int = 0):
+        self.id = import_id
+        self.format = fmt
+        self.status = "running"
+        self.resumed_from = resumed_from
+        self.records_read = 0
+        self.records_committed = resumed_from
+        self.invalid_records = 0
+        self.inserted = defaultdict(int)
+        self.errors: List[Dict[str, Any]] = []
+        self.error: Optional[str] = None
+        self.chunks = 0
+        self.started = time.monotonic()
+        self.seconds = 0.0
+
+    def reject(self, number: int, message: str):
+        self.invalid_records += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"record": number, "error": message})
+
+    def progress(self) -> Dict[str, Any]:
+        seconds = self.seconds if self.status != "running" else time.monotonic() - self.started
+        processed = self.records_committed - self.resumed_from
+        return {
+            "import_id": self.id,
+            "format": self.format,
+            "status": self.status,
+            "resumed_from": self.resumed_from,
+            "records_read": self.records_read,
+            "records_committed": self.records_committed,
+            "invalid_records": self.invalid_records,
+            "inserted": dict(self.inserted),
+            "chunks": self.chunks,
+            "seconds": round(seconds, 3),
+            "records_per_second": round(processed / seconds, 1) if seconds > 0 else 0.0,
+            "errors": self.errors,
+            "error": self.error,
+        }
+
+
+async def insert_returning(conn: AsyncConnection, table: str, rows: List[tuple]) -> List[int]:
+    """Insert ``rows`` into ``table`` in as few statements as the parameter limit allows; new ids in row order"""
+    ids: List[Optional[int]] = [None] * len(rows)
+    per_statement = max(1, MAX_STATEMENT_PARAMS // (len(IMPORT_COLUMNS[table]) + 1))
+    for start in range(0, len(rows), per_statement):
+        chunk = rows[start:start + per_statement]
+        sql = INSERT_RETURNING[table].format(values=", ".join(VALUES_ROWS[table] for _ in chunk))
+        params = [value for key, row in enumerate(chunk, start) for value in (key, *row)]
+        for row in await conn.fetchall(sql, *params):
+            ids[row.row_key] = row.id
+    return ids
+
+
+async def write_courses(conn: AsyncConnection, courses: List[CourseRecord]) -> Tuple[Dict[str, int], List[int]]:
+    """Insert courses with their lessons, quizzes, questions and options, one batch per table.
+
+    Returns the row count per table and the new course ids.
+    """
+    course_ids = await insert_returning(conn, "courses", [
+        (c.title, c.description, c.thumbnail_url, c.category_id, c.instructor_name, c.duration_minutes,
+         c.level, c.price, c.is_free, c.rating, c.total_ratings, c.total_enrollments, c.course_url)
+        for c in courses
+    ])
+
+    lesson_refs, lesson_rows = [], []
+    for course, course_id in zip(courses, course_ids):
+        for lesson in course.lessons:
+            lesson_refs.append((course_id, lesson.id))
+            lesson_rows.append((course_id, lesson.title, lesson.description, lesson.video_url,
+                                lesson.duration_seconds, lesson.order_index, lesson.is_preview))
+    lesson_ids = await insert_returning(conn, "course_lessons", lesson_rows)
+    # (new course id, source lesson id) -> new lesson id
+    lessons = {ref: lesson_id for ref, lesson_id in zip(lesson_refs, lesson_ids) if ref[1] is not None}
+
+    quiz_records, quiz_rows = [], []
+    for course, course_id in zip(courses, course_ids):
+        for quiz in course.quizzes:
+            quiz_records.append(quiz)
+            lesson_id = lessons[(course_id, quiz.lesson_id)] if quiz.lesson_id is not None else None
+            total = quiz.total_questions if quiz.total_questions is not None else len(quiz.questions)
+            quiz_rows.append((course_id, lesson_id, quiz.title, quiz.description, total,
+                              quiz.time_limit_minutes, quiz.passing_score_percentage, quiz.attempts_allowed))
+    quiz_ids = await insert_returning(conn, "quizzes", quiz_rows)
+
+    question_records, question_rows = [], []
+    for quiz, quiz_id in zip(quiz_records, quiz_ids):
+        for question in quiz.questions:
+            question_records.append(question)
+            question_rows.append((quiz_id, question.question_text, question.question_type,
+                                  question.points, question.order_index))
+    question_ids = await insert_returning(conn, "quiz_questions", question_rows)
+
+    option_rows = [
+        (question_id, option.option_text, option.order_index, option.is_correct)
+        for question, question_id in zip(question_records, question_ids)
+        for option in question.options
+    ]
+    if option_rows:
+        await conn.executemany(INSERT_OPTIONS, option_rows)
+
+    return {
+        "courses": len(course_ids), "lessons": len(lesson_ids), "quizzes": len(quiz_ids),
+        "questions": len(question_ids), "options": len(option_rows),
+    }, course_ids
+
+
+class CatalogImporter:
+    """Streams catalog records into the database in chunked transactions.
+
+    Every ``chunk_size`` valid courses are written with one batched insert
+    per table and committed together with the import's checkpoint, so a
+    failed import re-sent under the same ``import_id`` skips what was
+    already committed. Invalid records are skipped and reported.
+    """
+
+    def __init__(self, database, chunk_size: int = 100, history: int = 20):
+        self._database = database
+        self.chunk_size = chunk_size
+        self._running: Dict[str, ImportJob] = {}
+        self._finished: "OrderedDict[str, ImportJob]" = OrderedDict()
+        self._history = history
+        self._completed = 0
+        self._failed = 0
+
+    async def run(self, import_id: str, fmt: str, chunks: AsyncIterable[bytes]) -> ImportJob:
+        if import_id in self._running:
+            raise ImportInProgress(f"Import {import_id!r} is already running")
+        job = ImportJob(import_id, fmt)
+        self._running[import_id] = job
+        try:
+            conn = await self._database.acquire()
+            try:
+                state = await conn.fetchone(IMPORT_STATE_QUERY, import_id)
+                if state is not None and state.status == "completed":
+                    job.status = "completed"
+                    job.resumed_from = job.records_committed = state.records_committed
+                    return job
+                if state is None:
+                    await conn.execute(START_IMPORT, import_id, fmt)
+                else:
+                    await conn.execute(RESUME_IMPORT, import_id)
+                    job.resumed_from = job.records_committed = state.records_committed
+                await conn.commit()
+
+                try:
+                    await self._import(conn, job, chunks)
+                except Exception as e:
+                    await conn.rollback()
+                    job.status, job.error = "failed", str(e)
+                    self._failed += 1
+                    await self._finish(conn, job)
+                    raise
+                job.status = "completed"
+                self._completed += 1
+                await self._finish(conn, job)
+            finally:
+                await conn.release()
+        finally:
+            job.seconds = time.monotonic() - job.started
+            del self._running[import_id]
+            self._finished[import_id] = job
+            self._finished.move_to_end(import_id)
+            while len(self._finished) > self._history:
+                self._finished.popitem(last=False)
+            logger.info(f"Catalog import {import_id} {job.status}: {job.progress()}")
+        return job
+
+    async def _import(self, conn: AsyncConnection, job: ImportJob, chunks: AsyncIterable[bytes]):
+        batch: List[CourseRecord] = []
+        invalid = 0
+        last = job.records_committed
+        async for number, record in read_records(read_lines(chunks), job.format):
+            job.records_read = number
+            if number <= job.resumed_from:
+                continue
+            last = number
+            try:
+                if isinstance(record, Exception):
+                    raise record
+                batch.append(CourseRecord.model_validate(record))
+            except (ValueError, ValidationError) as e:
+                job.reject(number, str(e))
+                invalid += 1
+                continue
+            if len(batch) >= self.chunk_size:
+                await self._commit_chunk(conn, job, batch, last, invalid)
+                batch, invalid = [], 0
+        if last > job.records_committed:
+            await self._commit_chunk(conn, job, batch, last, invalid)
+
+    async def _finish(self, conn: AsyncConnection, job: ImportJob):
+        try:
+            await conn.execute(FINISH_IMPORT, job.status, job.error, job.id)
+            await conn.commit()
+        except Exception as e:
+            # The checkpoint is already committed; only the status is stale
+            logger.error(f"Failed to record the outcome of catalog import {job.id}: {e}")
+
+    async def _commit_chunk(self, conn: AsyncConnection, job: ImportJob, batch: List[CourseRecord],
+                            last: int, invalid: int):
+        inserted, course_ids = await write_courses(conn, batch) if batch else ({}, [])
+        await conn.execute(CHECKPOINT_IMPORT, last, len(batch), invalid, job.id)
+        await conn.commit()
+        # Progress counters must see the new lessons instead of a cached count
+        lesson_counts.invalidate_courses(course_ids)
+        try:
+            # Searchable right away instead of after the next index rebuild
+            await index_courses(search_index, conn, course_ids)
+        except Exception as e:
+            logger.error(f"Failed to index courses of catalog import {job.id}, next rebuild picks them up: {e}")
+        job.records_committed = last
+        job.chunks += 1
+        for table, count in inserted.items():
+            job.inserted[table] += count
+        logger.info(
+            f"Catalog import {job.id}: {job.records_committed} records committed, "
+            f"{job.inserted['courses']} courses, {job.invalid_records} invalid"
+        )
+
+    async def status(self, import_id: str) -> Optional[Dict[str, Any]]:
+        """Live progress of a running or recent import, else its checkpoint row"""
+        job = self._running.get(import_id) or self._finished.get(import_id)
+        if job is not None:
+            return job.progress()
+        conn = await self._database.acquire(read_only=True)
+        try:
+            state = await conn.fetchone(IMPORT_STATE_QUERY, import_id)
+        finally:
+            await conn.release()
+        if state is None:
+            return None
+        return {
+            "import_id": state.id,
+            "format": state.format,
+            "status": state.status,
+            "records_committed": state.records_committed,
+            "courses_imported": state.courses_imported,
+            "invalid_records": state.invalid_records,
+            "error": state.error,
+            "started_at": state.started_at,
+            "updated_at": state.updated_at,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": len(self._running),
+            "completed": self._completed,
+            "failed": self._failed,
+            "chunk_size": self.chunk_size,
+        }
+
+
+def _pick(row, fields: List[str]) -> Dict[str, Any]:
+    return {name: getattr(row, name) for name in fields}
+
+
+async def _export_page(conn: AsyncConnection, courses: list) -> List[Dict[str, Any]]:
+    """Nest lessons, quizzes, questions and options under one page of course rows"""
+    ids = [row.id for row in courses]
+    placeholders = ", ".join("?" for _ in ids)
+    lessons, quizzes = defaultdict(list), defaultdict(list)
+    for row in await conn.fetchall(EXPORT_LESSONS_QUERY.format(ids=placeholders), *ids):
+        lessons[row.course_id].append({**_pick(row, EXPORT_LESSON_FIELDS), "is_preview": bool(row.is_preview)})
+    quiz_by_id = {}
+    for row in await conn.fetchall(EXPORT_QUIZZES_QUERY.format(ids=placeholders), *ids):
+        quiz = {**_pick(row, EXPORT_QUIZ_FIELDS), "questions": []}
+        quiz_by_id[row.id] = quiz
+        quizzes[row.course_id].append(quiz)
+
+    question, question_id = None, None
+    for row in await conn.fetchall(EXPORT_QUESTIONS_QUERY.format(ids=placeholders), *ids):
+        if row.id != question_id:
+            question_id = row.id
+            question = {"question_text": row.question_text, "question_type": row.question_type,
+                        "points": row.points, "order_index": row.order_index, "options": []}
+            quiz_by_id[row.quiz_id]["questions"].append(question)
+        if row.option_text is not None:
+            question["options"].append({"option_text": row.option_text, "order_index": row.option_order,
+                                        "is_correct": bool(row.is_correct)})
+
+    records = []
+    for row in courses:
+        course_lessons = lessons[row.id]
+        exported = {lesson["id"] for lesson in course_lessons}
+        for quiz in quizzes[row.id]:
+            # A quiz may point at a lesson that is no longer active, which isn't exported
+            if quiz["lesson_id"] not in exported:
+                quiz["lesson_id"] = None
+        records.append({
+            **_pick(row, EXPORT_COURSE_FIELDS), "is_free": bool(row.is_free),
+            "lessons": course_lessons, "quizzes": quizzes[row.id],
+        })
+    return records
+
+
+async def export_catalog(database, fmt: str) -> AsyncIterator[bytes]:
+    """Stream active courses in id order, one page per query; CSV carries the course rows only"""
+    conn = await database.acquire(read_only=True)
+    try:
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer, lineterminator="\n")
+            writer.writerow(CSV_FIELDS)
+            yield buffer.getvalue().encode("utf-8")
+        after = 0
+        while True:
+            rows = await conn.fetchall(EXPORT_COURSES_QUERY, EXPORT_PAGE, after)
+            if not rows:
+                break
+            after = rows[-1].id
+            if fmt == "csv":
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerows([[getattr(row, name) for name in CSV_FIELDS] for row in rows])
+                yield buffer.getvalue().encode("utf-8")
+            else:
+                yield b"".join(dumps(record) + b"\n" for record in await _export_page(conn, rows))
+    finally:
+        await conn.release()
+
+
+async def ensure_catalog_import_schema(database):
+    """Create the import checkpoint table on first start"""
+    conn = await database.acquire()
+    try:
+        await conn.execute(ENSURE_CATALOG_IMPORT_TABLE)
+        await conn.commit()
+    finally:
+        await conn.release()
+
+
+catalog_importer = CatalogImporter(db, chunk_size=int(os.getenv("CATALOG_IMPORT_CHUNK_COURSES", "100")))
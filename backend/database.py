@@ -0,0 +1,706 @@
+import os
+import time
+import asyncio
+import importlib
+import threading
+import logging
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+import pyodbc
+
+from metrics import record_query, record_acquire
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_CONNECTION_STRING = (
+    "DRIVER={ODBC Driver 17 for SQL Server};"
+    "SERVER=DESKTOP-8BL3MIG\\SQLEXPRESS;"
+    "DATABASE=learning_app;"
+    "Trusted_Connection=yes;"
+)
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out within the acquire timeout"""
+
+
+class ConnectionPool:
+    """Bounded pool of reusable DB-API connections.
+
+    Connections are health-checked on checkout when they have been idle for
+    longer than ``health_check_after`` seconds, and idle connections above
+    ``min_size`` are closed once they exceed ``max_idle_seconds``.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        min_size: int = 1,
+        max_size: int = 10,
+        acquire_timeout: float = 5.0,
+        max_idle_seconds: float = 300.0,
+        health_check_after: float = 30.0,
+        ping_query: str = "SELECT 1",
+    ):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Invalid pool size bounds")
+
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.max_idle_seconds = max_idle_seconds
+        self.health_check_after = health_check_after
+        self.ping_query = ping_query
+
+        self._lock = threading.Condition()
+        self._idle = deque()  # (connection, last_used_monotonic)
+        self._size = 0
+        self._closed = False
+
+        self._stats = {
+            "acquired": 0,
+            "created": 0,
+            "closed": 0,
+            "health_check_failures": 0,
+            "timeouts": 0,
+            "waits": 0,
+        }
+
+    def open(self):
+        """Pre-open ``min_size`` connections so the first requests skip the login handshake"""
+        with self._lock:
+            self._closed = False
+            missing = self.min_size - self._size
+            self._size += max(missing, 0)
+
+        opened = []
+        try:
+            for _ in range(max(missing, 0)):
+                opened.append(self._new_connection())
+        except Exception:
+            with self._lock:
+                self._size -= missing - len(opened)
+                self._lock.notify_all()
+            raise
+        finally:
+            now = time.monotonic()
+            with self._lock:
+                self._idle.extend((conn, now) for conn in opened)
+                self._lock.notify_all()
+
+    def close(self):
+        """Close every idle connection; checked-out connections are closed on release"""
+        with self._lock:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._lock.notify_all()
+
+        for conn, _ in idle:
+            self._close_connection(conn)
+
+    def acquire(self, timeout: Optional[float] = None):
+        timeout = self.acquire_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        while True:
+            conn, last_used, create = None, 0.0, False
+
+            with self._lock:
+                waited = False
+                while True:
+                    if self._closed:
+                        raise PoolTimeout("Connection pool is closed")
+                    if self._idle:
+                        # Most recently used first, so surplus connections age out
+                        conn, last_used = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        create = True
+                        break
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeout(
+                            f"Timed out after {timeout:.1f}s waiting for a database connection"
+                        )
+                    if not waited:
+                        self._stats["waits"] += 1
+                        waited = True
+                    self._lock.wait(remaining)
+
+            if create:
+                try:
+                    conn = self._new_connection()
+                except Exception:
+                    with self._lock:
+                        self._size -= 1
+                        self._lock.notify()
+                    raise
+            elif time.monotonic() - last_used > self.health_check_after and not self._is_healthy(conn):
+                with self._lock:
+                    self._stats["health_check_failures"] += 1
+                self._discard(conn)
+                continue
+
+            with self._lock:
+                self._stats["acquired"] += 1
+            return conn
+
+    def release(self, conn, discard: bool = False, rollback: bool = True):
+        """Return ``conn`` to the pool; pass ``rollback=False`` only if it ran no statement since its last commit or rollback"""
+        if rollback and not discard:
+            try:
+                # Never hand an open transaction to the next borrower
+                conn.rollback()
+            except Exception as e:
+                logger.warning(f"Discarding pooled connection after failed rollback: {e}")
+                discard = True
+
+        with self._lock:
+            if discard or self._closed:
+                self._size -= 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+                conn = None
+            self._lock.notify()
+
+        if conn is not None:
+            self._close_connection(conn)
+        self.evict_idle()
+
+    def evict_idle(self):
+        """Close idle connections that exceeded ``max_idle_seconds``, keeping ``min_size`` open"""
+        cutoff = time.monotonic() - self.max_idle_seconds
+        expired = []
+
+        with self._lock:
+            # The left end of the deque holds the least recently used connections
+            while self._idle and self._size > self.min_size and self._idle[0][1] < cutoff:
+                expired.append(self._idle.popleft()[0])
+                self._size -= 1
+
+        for conn in expired:
+            self._close_connection(conn)
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        conn = self.acquire(timeout)
+        discard = False
+        try:
+            yield conn
+        except pyodbc.Error:
+            # The connection may be broken; let the pool open a fresh one next time
+            discard = not self._is_healthy(conn)
+            raise
+        finally:
+            self.release(conn, discard=discard)
+
+    def count(self, stat: str):
+        """Record a wait or timeout that happened in front of the pool"""
+        with self._lock:
+            self._stats[stat] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                **self._stats,
+            }
+
+    def _new_connection(self):
+        conn = self._connect()
+        with self._lock:
+            self._stats["created"] += 1
+        return conn
+
+    def _is_healthy(self, conn) -> bool:
+        try:
+            cursor = conn.cursor()
+            cursor.execute(self.ping_query)
+            cursor.fetchall()
+            cursor.close()
+            # Borrowers that run nothing skip the rollback on release, so don't leave the probe's transaction open
+            conn.rollback()
+            return True
+        except Exception as e:
+            logger.warning(f"Pooled connection failed health check: {e}")
+            return False
+
+    def _discard(self, conn):
+        with self._lock:
+            self._size -= 1
+            self._lock.notify()
+        self._close_connection(conn)
+
+    def _close_connection(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._stats["closed"] += 1
+
+
+def is_connection_error(e: Exception) -> bool:
+    """Lost or refused connection (SQLSTATE class 08), as opposed to a failing statement"""
+    if isinstance(e, pyodbc.InterfaceError):
+        return True
+    return bool(e.args) and str(e.args[0]).startswith("08")
+
+
+class ReplicaSet:
+    """Read-only replica pools, tried round-robin.
+
+    A replica that fails to hand out a connection, or whose connection breaks
+    mid-query, sits out ``retry_after`` seconds; reads go to the others or to
+    the primary meanwhile.
+    """
+
+    def __init__(self, pools: List[ConnectionPool], retry_after: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.pools = list(pools)
+        self.retry_after = retry_after
+        self._clock = clock
+        self._next = 0
+        self._down_until: Dict[int, float] = {}  # index in pools -> monotonic time
+        self._failures = 0
+
+    def __bool__(self) -> bool:
+        return bool(self.pools)
+
+    def candidates(self) -> List[ConnectionPool]:
+        """Replicas that are up, starting from the next one in rotation"""
+        now = self._clock()
+        count = len(self.pools)
+        start, self._next = self._next, (self._next + 1) % max(count, 1)
+        order = [(start + i) % count for i in range(count)]
+        return [self.pools[i] for i in order if self._down_until.get(i, 0.0) <= now]
+
+    def mark_down(self, pool: ConnectionPool):
+        index = self.pools.index(pool)
+        if self._down_until.get(index, 0.0) <= self._clock():
+            self._failures += 1
+        self._down_until[index] = self._clock() + self.retry_after
+
+    def is_replica(self, pool: ConnectionPool) -> bool:
+        return any(pool is replica for replica in self.pools)
+
+    def stats(self) -> Dict[str, Any]:
+        now = self._clock()
+        return {
+            "replicas": len(self.pools),
+            "replicas_down": sum(1 for until in self._down_until.values() if until > now),
+            "replica_failures": self._failures,
+        }
+
+
+class RecentWriters:
+    """Users who wrote within the last ``window`` seconds, whose reads go to the primary
+    so they see their own writes despite replication lag"""
+
+    def __init__(self, window: float = 5.0, max_size: int = 100000,
+                 clock: Callable[[], float] = time.monotonic):
+        self.window = window
+        self.max_size = max_size
+        self._clock = clock
+        self._until: "OrderedDict[str, float]" = OrderedDict()  # key -> monotonic time
+
+    def note(self, key: Optional[str]):
+        if key is None or self.window <= 0:
+            return
+        self._until[key] = self._clock() + self.window
+        self._until.move_to_end(key)
+        self._prune()
+
+    def is_recent(self, key: Optional[str]) -> bool:
+        if key is None:
+            return False
+        until = self._until.get(key)
+        return until is not None and until > self._clock()
+
+    def _prune(self):
+        # Every entry gets the same window, so the oldest sit at the front
+        now = self._clock()
+        while self._until and (len(self._until) > self.max_size or next(iter(self._until.values())) <= now):
+            self._until.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        self._prune()
+        return {"sticky_users": len(self._until), "sticky_window_seconds": self.window}
+
+
+class AsyncConnection:
+    """Request-scoped handle on a pooled connection.
+
+    Every call runs on the database executor, so a slow query only occupies a
+    worker thread instead of the event loop. If the awaiting request is
+    cancelled, the in-flight statement is cancelled on the server as well.
+    ``on_commit`` runs after every successful commit.
+    """
+
+    def __init__(self, database: "Database", conn, pool: Optional[ConnectionPool] = None):
+        self._database = database
+        self._conn = conn
+        self._pool = pool or database.pool
+        self._cursor = None
+        self._pending = None
+        self._dirty = False  # ran a statement since the last commit or rollback
+        self.on_commit: Optional[Callable[[], None]] = None
+
+    @property
+    def is_replica(self) -> bool:
+        return self._pool is not self._database.pool
+
+    async def fetchone(self, sql: str, *params):
+        return await self._timed("fetchone", self._fetch_sync, sql, params, False)
+
+    async def fetchall(self, sql: str, *params) -> list:
+        return await self._timed("fetchall", self._fetch_sync, sql, params, True)
+
+    async def iterate(self, sql: str, *params, batch_size: int = 500) -> AsyncIterator[list]:
+        """Yield the result in batches of up to ``batch_size`` rows, fetching the next only when asked.
+
+        The statement keeps the connection busy until the last batch is read
+        or the iteration is closed, so use a connection of its own.
+        """
+        cursor = await self._timed("iterate", self._open_sync, sql, params)
+        try:
+            while True:
+                rows = await self._timed("fetchmany", cursor.fetchmany, batch_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            future = self._database.executor.submit(self._close_sync, cursor)
+            # Shielded so an abandoned stream still closes its statement
+            await asyncio.shield(asyncio.wrap_future(future))
+
+    async def execute(self, sql: str, *params) -> int:
+        """Run a statement that returns no rows and report its rowcount"""
+        return await self._timed("execute", self._execute_sync, sql, params)
+
+    async def executemany(self, sql: str, rows: list):
+        """Run one statement for every parameter tuple in a single batched round trip"""
+        await self._timed("executemany", self._executemany_sync, sql, rows)
+
+    async def commit(self):
+        await self._timed("commit", self._conn.commit)
+        self._dirty = False
+        if self.on_commit is not None:
+            self.on_commit()
+
+    async def rollback(self):
+        await self._timed("rollback", self._conn.rollback)
+        self._dirty = False
+
+    async def run(self, fn, *args):
+        """Run ``fn(connection, *args)`` on the executor for multi-statement work"""
+        return await self._timed("run", fn, self._conn, *args)
+
+    async def release(self):
+        # Shielded so a cancelled request still hands its connection back
+        await asyncio.shield(self._database._checkin(self))
+
+    async def _timed(self, operation: str, fn, *args):
+        """Submit one database call and record its duration and rows in the metrics"""
+        if operation not in ("commit", "rollback"):
+            self._dirty = True
+        started = time.perf_counter()
+        result, failed = None, True
+        try:
+            result = await self._submit(fn, *args)
+            failed = False
+            return result
+        except pyodbc.Error as e:
+            # The replica went away under us; route the next reads elsewhere
+            if self.is_replica and is_connection_error(e):
+                self._database.replicas.mark_down(self._pool)
+            raise
+        finally:
+            if operation in ("fetchall", "fetchmany") and result is not None:
+                rows = len(result)
+            else:
+                rows = int(operation == "fetchone" and result is not None)
+            record_query(operation, time.perf_counter() - started, rows, failed)
+
+    async def _submit(self, fn, *args):
+        future = self._database.executor.submit(fn, *args)
+        self._pending = future
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            cursor = self._cursor
+            if cursor is not None:
+                try:
+                    cursor.cancel()
+                except Exception as e:
+                    logger.warning(f"Failed to cancel running statement: {e}")
+            raise
+
+    def _fetch_sync(self, sql, params, many):
+        cursor = self._conn.cursor()
+        self._cursor = cursor
+        try:
+            cursor.execute(sql, *params)
+            return cursor.fetchall() if many else cursor.fetchone()
+        finally:
+            self._cursor = None
+            cursor.close()
+
+    def _open_sync(self, sql, params):
+        cursor = self._conn.cursor()
+        self._cursor = cursor
+        try:
+            cursor.execute(sql, *params)
+        except Exception:
+            self._cursor = None
+            cursor.close()
+            raise
+        return cursor
+
+    def _close_sync(self, cursor):
+        self._cursor = None
+        cursor.close()
+
+    def _execute_sync(self, sql, params):
+        cursor = self._conn.cursor()
+        self._cursor = cursor
+        try:
+            cursor.execute(sql, *params)
+            return cursor.rowcount
+        finally:
+            self._cursor = None
+            cursor.close()
+
+    def _executemany_sync(self, sql, rows):
+        cursor = self._conn.cursor()
+        self._cursor = cursor
+        try:
+            # Send all parameter sets as one array-bound batch instead of a round trip per row
+            cursor.fast_executemany = True
+            cursor.executemany(sql, rows)
+        finally:
+            self._cursor = None
+            cursor.close()
+
+    def _release_sync(self):
+        # A cancelled statement may still be unwinding on another worker
+        if self._pending is not None:
+            wait([self._pending])
+        # release() rolls back whatever ran and drops the connection if that fails;
+        # a request served entirely from cache skips that round trip
+        self._pool.release(self._conn, rollback=self._dirty)
+
+
+class Database:
+    """Primary connection pool, optional read replicas, and the bounded thread
+    pool that all DB work runs on.
+
+    ``acquire(read_only=True)`` hands out a replica connection unless there
+    are none up or ``sticky_key`` wrote recently (see ``note_write``); it
+    falls back to the primary whenever no replica can serve the read.
+
+    Waiting for a free connection happens on the event loop, one semaphore
+    per pool, so queued requests never hold a worker thread that a connection
+    holder needs to finish its query. Checkout and check-in themselves run on
+    a separate ``pool_executor`` with one thread per pooled connection.
+    """
+
+    def __init__(self, pool: ConnectionPool, max_workers: Optional[int] = None,
+                 replicas: Optional[ReplicaSet] = None, recent_writers: Optional[RecentWriters] = None):
+        self.pool = pool
+        self.replicas = replicas or ReplicaSet([])
+        self.recent_writers = recent_writers or RecentWriters()
+        self.max_workers = max_workers or pool.max_size + sum(replica.max_size for replica in self.replicas.pools)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="db")
+        pools = [pool, *self.replicas.pools]
+        self.pool_executor = ThreadPoolExecutor(
+            max_workers=sum(p.max_size for p in pools), thread_name_prefix="db-pool"
+        )
+        # Created lazily so they bind to the serving event loop
+        self._slots: Dict[int, asyncio.Semaphore] = {}
+        self._reads = {"replica_reads": 0, "sticky_reads": 0, "replica_fallbacks": 0}
+
+    async def acquire(self, read_only: bool = False, sticky_key: Optional[str] = None) -> AsyncConnection:
+        started = time.perf_counter()
+        try:
+            if read_only:
+                conn = await self._acquire_read(sticky_key)
+                if conn is not None:
+                    return conn
+            return AsyncConnection(self, await self._checkout(self.pool), self.pool)
+        finally:
+            record_acquire(time.perf_counter() - started)
+
+    def note_write(self, sticky_key: Optional[str]):
+        """Keep ``sticky_key``'s reads on the primary for the read-your-writes window"""
+        self.recent_writers.note(sticky_key)
+
+    async def _acquire_read(self, sticky_key: Optional[str]) -> Optional[AsyncConnection]:
+        if not self.replicas:
+            return None
+        if self.recent_writers.is_recent(sticky_key):
+            self._reads["sticky_reads"] += 1
+            return None
+        for replica in self.replicas.candidates():
+            try:
+                conn = await self._checkout(replica)
+            except PoolTimeout as e:
+                # Busy rather than broken; try the next one
+                logger.warning(f"Replica pool busy, trying elsewhere: {e}")
+                continue
+            except Exception as e:
+                logger.warning(f"Replica unavailable, failing over: {e}")
+                self.replicas.mark_down(replica)
+                continue
+            self._reads["replica_reads"] += 1
+            return AsyncConnection(self, conn, replica)
+        self._reads["replica_fallbacks"] += 1
+        return None
+
+    async def _checkout(self, pool: ConnectionPool):
+        slots = self._slots_for(pool)
+        if not slots.locked():
+            # A free slot is taken without yielding to the loop
+            await slots.acquire()
+        else:
+            pool.count("waits")
+            try:
+                await asyncio.wait_for(slots.acquire(), pool.acquire_timeout)
+            except asyncio.TimeoutError:
+                pool.count("timeouts")
+                raise PoolTimeout(
+                    f"Timed out after {pool.acquire_timeout:.1f}s waiting for a database connection"
+                ) from None
+
+        # Holding a slot means the pool has room, so this only blocks to connect or health-check
+        future = self.pool_executor.submit(pool.acquire)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            future.add_done_callback(partial(self._release_abandoned, pool, asyncio.get_running_loop()))
+            raise
+        except BaseException:
+            slots.release()
+            raise
+
+    async def _checkin(self, conn: AsyncConnection):
+        try:
+            await asyncio.wrap_future(self.pool_executor.submit(conn._release_sync))
+        finally:
+            self._slots_for(conn._pool).release()
+
+    def _slots_for(self, pool: ConnectionPool) -> asyncio.Semaphore:
+        slots = self._slots.get(id(pool))
+        if slots is None:
+            slots = self._slots[id(pool)] = asyncio.Semaphore(pool.max_size)
+        return slots
+
+    async def open(self):
+        await asyncio.wrap_future(self.pool_executor.submit(self.pool.open))
+        for replica in self.replicas.pools:
+            try:
+                await asyncio.wrap_future(self.pool_executor.submit(replica.open))
+            except Exception as e:
+                logger.error(f"Failed to open replica connections, reading from the primary: {e}")
+                self.replicas.mark_down(replica)
+
+    async def close(self):
+        for pool in [self.pool, *self.replicas.pools]:
+            await asyncio.wrap_future(self.pool_executor.submit(pool.close))
+        self.executor.shutdown(wait=False)
+        self.pool_executor.shutdown(wait=False)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {**self.pool.stats(), "executor_workers": self.max_workers}
+        if self.replicas:
+            stats.update(self.replicas.stats())
+            stats.update(self.recent_writers.stats())
+            stats.update(self._reads)
+            stats["replica_pools"] = [replica.stats() for replica in self.replicas.pools]
+        return stats
+
+    def _release_abandoned(self, pool: ConnectionPool, loop: asyncio.AbstractEventLoop, future):
+        if not future.cancelled() and future.exception() is None:
+            pool.release(future.result())
+        try:
+            loop.call_soon_threadsafe(self._slots_for(pool).release)
+        except RuntimeError:
+            # The loop is already closed; nobody is left waiting on the slot
+            pass
+
+
+def connect_sql_server(connection_string: Optional[str] = None):
+    conn = pyodbc.connect(
+        connection_string or os.getenv("DB_CONNECTION_STRING", DEFAULT_CONNECTION_STRING),
+        timeout=int(os.getenv("DB_LOGIN_TIMEOUT", "10")),
+    )
+    # Server-side cap on any single statement so a stuck query frees its worker
+    conn.timeout = int(os.getenv("DB_QUERY_TIMEOUT", "30"))
+    return conn
+
+
+def connection_factory(connection_string: Optional[str] = None) -> Callable[[], Any]:
+    """SQL Server by default; DB_CONNECT=module:function plugs in another DB-API connect function.
+
+    With ``connection_string`` (a replica) the function is called with it as its only argument.
+    """
+    target = os.getenv("DB_CONNECT")
+    if not target:
+        connect = connect_sql_server
+    else:
+        module_name, _, function_name = target.partition(":")
+        connect = getattr(importlib.import_module(module_name), function_name or "connect")
+    return partial(connect, connection_string) if connection_string else connect
+
+
+def replica_connection_strings() -> List[str]:
+    """DB_REPLICA_1_CONNECTION_STRING, DB_REPLICA_2_CONNECTION_STRING, ... up to the first gap"""
+    found = []
+    while os.getenv(f"DB_REPLICA_{len(found) + 1}_CONNECTION_STRING"):
+        found.append(os.getenv(f"DB_REPLICA_{len(found) + 1}_CONNECTION_STRING"))
+    return found
+
+
+db_pool = ConnectionPool(
+    connection_factory(),
+    min_size=int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+    max_size=int(os.getenv("DB_POOL_MAX_SIZE", "20")),
+    acquire_timeout=float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", "5")),
+    max_idle_seconds=float(os.getenv("DB_POOL_MAX_IDLE_SECONDS", "300")),
+    health_check_after=float(os.getenv("DB_POOL_HEALTH_CHECK_AFTER", "30")),
+)
+
+replica_pools = [
+    ConnectionPool(
+        connection_factory(connection_string),
+        min_size=int(os.getenv("DB_REPLICA_POOL_MIN_SIZE", "1")),
+        max_size=int(os.getenv("DB_REPLICA_POOL_MAX_SIZE", "20")),
+        # Short, so a saturated replica fails over to the primary instead of queueing
+        acquire_timeout=float(os.getenv("DB_REPLICA_ACQUIRE_TIMEOUT", "1")),
+        max_idle_seconds=float(os.getenv("DB_POOL_MAX_IDLE_SECONDS", "300")),
+        health_check_after=float(os.getenv("DB_POOL_HEALTH_CHECK_AFTER", "30")),
+    )
+    for connection_string in replica_connection_strings()
+]
+
+db = Database(
+    db_pool,
+    max_workers=int(os.getenv("DB_EXECUTOR_WORKERS", "0")) or None,
+    replicas=ReplicaSet(replica_pools, retry_after=float(os.getenv("DB_REPLICA_RETRY_SECONDS", "30"))),
+    recent_writers=RecentWriters(window=float(os.getenv("DB_READ_YOUR_WRITES_SECONDS", "5"))),
+)
@@ -0,0 +1,108 @@
+import os
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+from database import db
+from versions import versions
+
+logger = logging.getLogger(__name__)
+
+APPLY_ENROLLMENT_DELTA = "UPDATE courses SET total_enrollments = total_enrollments + ? WHERE id = ?"
+
+
+class EnrollmentCounter:
+    """Accumulates courses.total_enrollments increments outside the enrollment transaction.
+
+    Enrolling only bumps an in-memory delta; a background task adds the
+    aggregated deltas to the courses rows every ``flush_interval`` seconds, so
+    a popular launch takes one row lock per flush instead of one per student.
+    Readers see totals that lag by at most one interval.
+    """
+
+    def __init__(self, database, flush_interval: float = 5.0):
+        self._database = database
+        self.flush_interval = flush_interval
+        self._deltas: Dict[int, int] = {}
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._recorded = 0
+        self._flushes = 0
+        self._flushed_rows = 0
+        self._failures = 0
+
+    def add(self, course_id: int, delta: int = 1):
+        self._deltas[course_id] = self._deltas.get(course_id, 0) + delta
+        self._recorded += 1
+
+    async def flush(self) -> int:
+        async with self._lock:
+            deltas = {course_id: delta for course_id, delta in self._deltas.items() if delta}
+            self._deltas = {}
+            if not deltas:
+                return 0
+            try:
+                conn = await self._database.acquire()
+                try:
+                    # Ascending ids so concurrent flushers can't deadlock on each other's rows
+                    await conn.executemany(
+                        APPLY_ENROLLMENT_DELTA,
+                        [(delta, course_id) for course_id, delta in sorted(deltas.items())]
+                    )
+                    await conn.commit()
+                except Exception:
+                    await conn.rollback()
+                    raise
+                finally:
+                    await conn.release()
+            except BaseException:
+                self._failures += 1
+                # Put the deltas back so the next flush retries them
+                for course_id, delta in deltas.items():
+                    self._deltas[course_id] = self._deltas.get(course_id, 0) + delta
+                raise
+            self._flushes += 1
+            self._flushed_rows += len(deltas)
+            versions.bump("enrollments")
+            return len(deltas)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush loop and write out whatever is still pending"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Failed to drain enrollment counters, {sum(self._deltas.values())} enrollments lost: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending_courses": len(self._deltas),
+            "pending_enrollments": sum(self._deltas.values()),
+            "recorded": self._recorded,
+            "flushes": self._flushes,
+            "flushed_rows": self._flushed_rows,
+            "failures": self._failures,
+        }
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Enrollment counter flush failed, will retry: {e}")
+
+
+enrollment_counter = EnrollmentCounter(db, flush_interval=float(os.getenv("ENROLLMENT_FLUSH_INTERVAL", "5")))
@@ -0,0 +1,83 @@
+# CPU-bound avatar rendering; kept free of app imports so worker processes load it cheaply
+import io
+import base64
+import hashlib
+from typing import Dict
+
+from PIL import Image
+
+# Largest first; the first size is the full avatar, the rest are pre-generated thumbnails
+AVATAR_SIZES = (400, 160, 64)
+AVATAR_CONTENT_TYPE = "image/jpeg"
+AVATAR_QUALITY = 85
+
+# Hard input limits, checked before any pixel data is decoded
+MAX_UPLOAD_BYTES = 8 * 1024 * 1024
+MAX_IMAGE_PIXELS = 40_000_000
+
+
+class InvalidImage(ValueError):
+    """Raised when uploaded avatar data can't be decoded as an image"""
+
+
+class ImageTooLarge(InvalidImage):
+    """Raised when an upload exceeds the byte or pixel limits"""
+
+
+class Avatar:
+    """Encoded JPEG variants of one uploaded picture, keyed by size"""
+
+    __slots__ = ("version", "variants")
+
+    def __init__(self, version: str, variants: Dict[int, bytes]):
+        self.version = version
+        self.variants = variants
+
+
+def decode_upload(data: str, max_bytes: int = MAX_UPLOAD_BYTES) -> bytes:
+    """Raw bytes of a base64 upload, with or without a ``data:image/...;base64,`` prefix"""
+    if data.startswith("data:"):
+        data = data.partition(",")[2]
+    # Base64 is 4 characters per 3 bytes; reject before allocating the decoded copy
+    if len(data) * 3 // 4 > max_bytes:
+        raise ImageTooLarge(f"Image exceeds {max_bytes} bytes")
+    try:
+        return base64.b64decode(data, validate=True)
+    except ValueError as e:
+        raise InvalidImage(f"Invalid base64 image data: {e}")
+
+
+def render_avatar(image_data: bytes, max_pixels: int = MAX_IMAGE_PIXELS) -> Avatar:
+    """Decode an upload once and encode every size in AVATAR_SIZES"""
+    try:
+        image = Image.open(io.BytesIO(image_data))
+        # Only the header has been read so far
+        width, height = image.size
+        if width * height > max_pixels:
+            raise ImageTooLarge(f"Image has {width * height} pixels, limit is {max_pixels}")
+        # JPEGs decode straight to a 1/2, 1/4 or 1/8 scale that still covers the largest size
+        largest = AVATAR_SIZES[0]
+        image.draft("RGB", (largest, largest))
+        # Convert to RGB if necessary (for PNG with transparency)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+    except ImageTooLarge:
+        raise
+    except Exception as e:
+        raise InvalidImage(f"Invalid image format: {e}")
+
+    variants = {}
+    for size in AVATAR_SIZES:
+        # Each thumbnail is resized from the previous (larger) one, never upscaled
+        image.thumbnail((size, size), Image.Resampling.LANCZOS)
+        output_buffer = io.BytesIO()
+        image.save(output_buffer, format="JPEG", quality=AVATAR_QUALITY, optimize=True)
+        variants[size] = output_buffer.getvalue()
+
+    version = hashlib.sha256(variants[AVATAR_SIZES[0]]).hexdigest()[:16]
+    return Avatar(version, variants)
+
+
+def render_upload(data: str) -> Avatar:
+    """Decode a base64 upload and render it; the unit of work sent to the pool"""
+    return render_avatar(decode_upload(data))
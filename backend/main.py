@@ -1,5 +1,6 @@
-from fastapi import FastAPI, HTTPException, Depends, status, Query
+from fastapi import FastAPI, HTTPException, Depends, status, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, EmailStr
 from typing import List, Optional, Dict, Any
@@ -9,17 +10,107 @@ from firebase_admin import credentials, auth
 import json
 from datetime import datetime, timedelta
 import logging
-import base64
 import uuid
+import hmac
 import os
-import io
-from PIL import Image
+import heapq
+import asyncio
+from contextlib import asynccontextmanager
+from database import db, AsyncConnection, PoolTimeout
+from auth_cache import create_token_cache
+from user_resolver import user_resolver
+from pagination import (
+    KeysetOrder, InvalidCursor, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE,
+    query_scope, encode_cursor, decode_cursor, trim_page, parse_fields
+)
+from search_index import search_index, rebuild_periodically
+from recommendations import recommender, rebuild_periodically as rebuild_recommendations_periodically
+from catalog_cache import catalog_cache
+from progress_buffer import progress_buffer
+from enrollment_counter import enrollment_counter
+from versions import versions
+from serializers import (
+    RowMapper, FastJSONResponse, as_bool, as_float, as_float_or_zero, as_optional_float, as_int_or_zero,
+    stream_format, streaming_json_response
+)
+from image_processing import AVATAR_SIZES, Avatar, InvalidImage, ImageTooLarge
+from avatar_store import (
+    ImageBusy, image_processor, avatar_url,
+    save_avatar, delete_avatar, load_avatar, ensure_avatar_schema, migrate_in_background,
+)
+from progress_counters import lesson_counts, ensure_progress_schema, reconcile_periodically
+from quiz_engine import (
+    quiz_cache, resolve_foreign_ids, grade, save_answers, record_attempt, ensure_quiz_summary_schema,
+    reconcile_summaries_periodically,
+)
+from catalog_io import (
+    FORMATS as CATALOG_FORMATS, catalog_importer, ImportInProgress, export_catalog, ensure_catalog_import_schema
+)
+from metrics import registry as metrics_registry, MetricsMiddleware, metrics_enabled
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Internee.pk Learning App API", version="1.0.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        await db.open()
+    except Exception as e:
+        # The pool opens connections lazily, so the API can still start and recover
+        logger.error(f"Failed to pre-open database connections: {e}")
+    try:
+        await ensure_progress_schema(db)
+    except Exception as e:
+        logger.error(f"Failed to prepare progress counters: {e}")
+    try:
+        await ensure_avatar_schema(db)
+    except Exception as e:
+        logger.error(f"Failed to prepare avatar store: {e}")
+    try:
+        await ensure_quiz_summary_schema(db)
+    except Exception as e:
+        logger.error(f"Failed to prepare quiz summaries: {e}")
+    try:
+        await ensure_catalog_import_schema(db)
+    except Exception as e:
+        logger.error(f"Failed to prepare catalog imports: {e}")
+    avatar_migration = asyncio.create_task(migrate_in_background(db))
+    token_cache.start_cert_refresh()
+    progress_buffer.start()
+    enrollment_counter.start()
+    reconcile_task = asyncio.create_task(reconcile_periodically(
+        db, float(os.getenv("PROGRESS_RECONCILE_SECONDS", "3600"))
+    ))
+    quiz_reconcile_task = asyncio.create_task(reconcile_summaries_periodically(
+        db, float(os.getenv("QUIZ_SUMMARY_RECONCILE_SECONDS", "3600"))
+    ))
+    search_task = None
+    if os.getenv("SEARCH_INDEX_ENABLED", "1") == "1":
+        search_task = asyncio.create_task(rebuild_periodically(
+            search_index, db, float(os.getenv("SEARCH_INDEX_REFRESH_SECONDS", "600"))
+        ))
+    recommendation_task = None
+    if os.getenv("RECOMMENDATIONS_ENABLED", "1") == "1":
+        recommendation_task = asyncio.create_task(rebuild_recommendations_periodically(
+            recommender, db, float(os.getenv("RECOMMENDATIONS_REFRESH_SECONDS", "3600"))
+        ))
+    yield
+    if recommendation_task is not None:
+        recommendation_task.cancel()
+    if search_task is not None:
+        search_task.cancel()
+    quiz_reconcile_task.cancel()
+    reconcile_task.cancel()
+    avatar_migration.cancel()
+    await progress_buffer.stop()
+    await enrollment_counter.stop()
+    image_processor.shutdown()
+    await token_cache.stop()
+    await db.close()
+
+app = FastAPI(title="Internee.pk Learning App API", version="1.0.0", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -28,30 +119,61 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing"],
 )
 
+# Per-route latency and DB work, exposed at /metrics
+if metrics_enabled:
+    app.add_middleware(MetricsMiddleware, server_timing=os.getenv("METRICS_SERVER_TIMING", "1") == "1")
+
 # Security
 security = HTTPBearer()
+token_cache = create_token_cache()
 
+# Firebase uids allowed to use the /admin endpoints
+ADMIN_UIDS = {uid.strip() for uid in os.getenv("ADMIN_UIDS", "").split(",") if uid.strip()}
 
 
-def get_db_connection():
+async def checkout(read_only: bool = False, sticky_key: Optional[str] = None) -> AsyncConnection:
     try:
-        conn = pyodbc.connect(
-            "DRIVER={ODBC Driver 17 for SQL Server};"
-            "SERVER=DESKTOP-8BL3MIG\\SQLEXPRESS;"
-            "DATABASE=learning_app;"
-            "Trusted_Connection=yes;"
+        return await db.acquire(read_only=read_only, sticky_key=sticky_key)
+    except PoolTimeout as e:
+        logger.error(f"Database pool exhausted: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database is busy, please retry",
+            headers={"Retry-After": "1"}
         )
-        return conn
     except Exception as e:
         logger.error(f"Database connection failed: {e}")
         raise HTTPException(status_code=500, detail="Database connection failed")
 
-async def verify_firebase_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def get_db(request: Request):
+    """Check out one primary connection shared by the whole request.
+
+    Committing keeps the signed-in user's reads on the primary for the
+    read-your-writes window, so they don't read a replica that lags behind.
+    """
+    conn = await checkout()
+    conn.on_commit = lambda: db.note_write(getattr(request.state, "firebase_uid", None))
+    try:
+        yield conn
+    finally:
+        await conn.release()
+
+async def get_read_db():
+    """A connection for read-only handlers of shared data; a replica when one is up"""
+    conn = await checkout(read_only=True)
+    try:
+        yield conn
+    finally:
+        await conn.release()
+
+async def verify_firebase_token(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)):
     try:
         token = credentials.credentials
-        decoded_token = auth.verify_id_token(token)
+        decoded_token = await token_cache.verify(token)
+        request.state.firebase_uid = decoded_token["uid"]
         return decoded_token
     except Exception as e:
         logger.error(f"Token verification failed: {e}")
@@ -60,72 +182,52 @@ async def verify_firebase_token(credentials: HTTPAuthorizationCredentials = Depe
             detail="Invalid authentication token"
         )
 
+async def require_admin(current_user: dict = Depends(verify_firebase_token)):
+    if current_user["uid"] not in ADMIN_UIDS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return current_user
 
-# Add this function to main.py after the verify_firebase_token function
-async def get_or_create_user(current_user: dict):
-    """Get user from database or create if doesn't exist"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
+async def get_user_read_db(current_user: dict = Depends(verify_firebase_token)):
+    """A connection for a user's read-only handlers: a replica, or the primary
+    while the user's own recent writes may not have replicated yet"""
+    conn = await checkout(read_only=True, sticky_key=current_user["uid"])
     try:
-        cursor.execute("SELECT id FROM users WHERE firebase_uid = ?", current_user["uid"])
-        user_row = cursor.fetchone()
-        
-        if user_row:
-            return user_row.id
-        
-        # Create user if doesn't exist
-        email = current_user.get("email", f"{current_user['uid']}@unknown.com")
-        display_name = current_user.get("name", "Unknown User")
-        
-        cursor.execute("""
-            INSERT INTO users (firebase_uid, email, display_name, profile_picture_data)
-            OUTPUT INSERTED.id VALUES (?, ?, ?, ?)
-        """, current_user["uid"], email, display_name, None)
-        
-        new_user = cursor.fetchone()
-        conn.commit()
-        logger.info(f"Auto-created user {current_user['uid']} with ID {new_user.id}")
-        
-        return new_user.id
-        
+        yield conn
+    finally:
+        await conn.release()
+
+
+async def get_or_create_user(current_user: dict, conn: AsyncConnection):
+    """Get user from database or create if doesn't exist, on the request's connection"""
+    try:
+        return await user_resolver.get_or_create(conn, current_user)
     except Exception as e:
-        conn.rollback()
+        await conn.rollback()
         logger.error(f"Failed to get or create user: {e}")
         raise HTTPException(status_code=500, detail="User setup failed")
-    finally:
-        conn.close()
-
 
 
-def process_profile_image(base64_image_data: str) -> str:
-    """Process and optimize the profile image. Returns the base64 encoded image data."""
+async def process_profile_image(base64_image_data: str) -> Avatar:
+    """Render every stored avatar size on the image process pool"""
     try:
-        # Decode base64 image
-        image_data = base64.b64decode(base64_image_data)
-        
-        # Open image with PIL
-        image = Image.open(io.BytesIO(image_data))
-        
-        # Convert to RGB if necessary (for PNG with transparency)
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-        
-        # Resize image to max 400x400 while maintaining aspect ratio
-        image.thumbnail((400, 400), Image.Resampling.LANCZOS)
-        
-        # Save to bytes
-        output_buffer = io.BytesIO()
-        image.save(output_buffer, format='JPEG', quality=85, optimize=True)
-        
-        # Encode back to base64
-        processed_image_data = base64.b64encode(output_buffer.getvalue()).decode('utf-8')
-        
-        return processed_image_data
-        
-    except Exception as e:
+        return await image_processor.render(base64_image_data)
+    except ImageTooLarge as e:
+        logger.error(f"Image rejected: {e}")
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except InvalidImage as e:
         logger.error(f"Image processing failed: {e}")
         raise HTTPException(status_code=400, detail="Invalid image format")
+    except ImageBusy as e:
+        logger.error(f"Image processing unavailable: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Image processing is busy, please retry",
+            headers={"Retry-After": "2"}
+        )
+
+def is_avatar_url(value: str) -> bool:
+    # Clients may echo back the URL we gave them; that means "unchanged"
+    return value.startswith(("http://", "https://", "/users/"))
 
 # Pydantic Models
 class UserCreate(BaseModel):
@@ -143,7 +245,8 @@ class UserResponse(BaseModel):
     firebase_uid: str
     email: str
     display_name: Optional[str]
-    profile_picture: Optional[str]
+    profile_picture: Optional[str]  # URL of the avatar image, see /users/{user_id}/avatar
+    profile_picture_version: Optional[str] = None
     created_at: datetime
 
 class CategoryResponse(BaseModel):
@@ -211,6 +314,20 @@ class SubmitQuizRequest(BaseModel):
     answers: List[Dict[str, Any]]
     time_taken_seconds: int
 
+class HomeResponse(BaseModel):
+    categories: Optional[List[CategoryResponse]] = None
+    featured: Optional[List[CourseResponse]] = None
+    popular: Optional[List[CourseResponse]] = None
+    enrollments: Optional[List[CourseResponse]] = None
+    enrollments_next_cursor: Optional[str] = None  # continue with /user/enrollments?cursor=
+
+class CourseBundleResponse(BaseModel):
+    version: str  # pass back as ?since= to leave out sections that haven't changed
+    course: Optional[CourseResponse] = None
+    lessons: Optional[List[LessonResponse]] = None  # only for enrolled users
+    quizzes: Optional[List[QuizResponse]] = None
+    unchanged: List[str] = []
+
 class EnrollRequest(BaseModel):
     course_id: int
 
@@ -219,7 +336,312 @@ class UpdateProgressRequest(BaseModel):
     watched_duration_seconds: int
     is_completed: bool = False
 
+# Profile columns plus the current avatar version; the picture itself is served separately
+USER_SELECT = f"""
+    SELECT u.id, u.firebase_uid, u.email, u.display_name, u.created_at, a.etag AS avatar_etag
+    FROM users u
+    LEFT JOIN user_avatars a ON a.user_id = u.id AND a.size = {AVATAR_SIZES[0]}
+"""
+
+def public_base_url(request: Request) -> str:
+    return os.getenv("PUBLIC_BASE_URL") or str(request.base_url)
+
+def user_response(request: Request, row, avatar_version: Optional[str]) -> UserResponse:
+    return UserResponse(
+        id=row.id,
+        firebase_uid=row.firebase_uid,
+        email=row.email,
+        display_name=row.display_name,
+        profile_picture=avatar_url(public_base_url(request), row.id, avatar_version),
+        profile_picture_version=avatar_version,
+        created_at=row.created_at
+    )
+
+def avatar_version_of(etag: Optional[str]) -> Optional[str]:
+    return etag.rsplit("-", 1)[0] if etag else None
+
+# Column behind each CourseResponse field, so sparse fieldsets only read what they return
+COURSE_COLUMNS = {
+    "id": "c.id",
+    "title": "c.title",
+    "description": "c.description",
+    "thumbnail_url": "c.thumbnail_url",
+    "category_id": "c.category_id",
+    "category_name": "cat.name",
+    "instructor_name": "c.instructor_name",
+    "duration_minutes": "c.duration_minutes",
+    "level": "c.level",
+    "price": "c.price",
+    "is_free": "c.is_free",
+    "rating": "c.rating",
+    "total_ratings": "c.total_ratings",
+    "total_enrollments": "c.total_enrollments",
+    "is_enrolled": "CASE WHEN ue.user_id IS NOT NULL THEN 1 ELSE 0 END",
+    "progress_percentage": "ISNULL(ue.progress_percentage, 0)",
+    "course_url": "c.course_url",
+}
+
+# Every keyset order ends in a unique column so page boundaries are stable
+COURSE_SORTS = {
+    "newest": KeysetOrder([("c.created_at", "datetime"), ("c.id", "int")]),
+    "popular": KeysetOrder([("c.total_enrollments", "int"), ("c.id", "int")]),
+    "rating": KeysetOrder([("ISNULL(c.rating, 0)", "decimal"), ("c.total_ratings", "int"), ("c.id", "int")]),
+}
+ENROLLMENT_ORDER = KeysetOrder([("ue.enrolled_at", "datetime"), ("ue.id", "int")])
+RELEVANCE_ORDER = KeysetOrder([("relevance", "float"), ("c.id", "int")])
+
+def search_sort_key(sort_by: str, hit) -> tuple:
+    """The same keys COURSE_SORTS orders by in SQL, read from the search index"""
+    doc = hit.doc
+    if sort_by == "newest":
+        return (doc.created_at or datetime.min, doc.id)
+    if sort_by == "popular":
+        return (doc.total_enrollments, doc.id)
+    if sort_by == "rating":
+        return (doc.rating or 0, doc.total_ratings, doc.id)
+    return (hit.score, doc.id)
+
+def course_select(fields: List[str]) -> str:
+    return ", ".join(f"{COURSE_COLUMNS[name]} AS {name}" for name in fields)
+
+# Row -> response mappings; course_select aliases every column to its field name
+COURSE_MAPPER = RowMapper({
+    **{name: name for name in COURSE_COLUMNS},
+    "price": ("price", as_float_or_zero),
+    "is_free": ("is_free", as_bool),
+    "rating": ("rating", as_float_or_zero),
+    "is_enrolled": ("is_enrolled", as_bool),
+    "progress_percentage": ("progress_percentage", as_float),
+})
+CATEGORY_MAPPER = RowMapper({name: name for name in CategoryResponse.model_fields})
+LESSON_MAPPER = RowMapper({
+    **{name: name for name in LessonResponse.model_fields},
+    "is_preview": ("is_preview", as_bool),
+    "is_watched": ("is_watched", as_bool),
+})
+QUIZ_MAPPER = RowMapper({
+    **{name: name for name in QuizResponse.model_fields},
+    "passing_score_percentage": ("passing_score_percentage", as_float),
+    "user_attempts": ("user_attempts", as_int_or_zero),
+    "best_score": ("best_score", as_optional_float),
+    "is_passed": ("is_passed", as_bool),
+})
+ATTEMPT_MAPPER = RowMapper({
+    "id": "id",
+    "attempt_number": "attempt_number",
+    "score_percentage": ("score_percentage", as_float_or_zero),
+    "correct_answers": "correct_answers",
+    "total_questions": "total_questions",
+    "time_taken_seconds": "time_taken_seconds",
+    "started_at": "started_at",
+    "completed_at": "completed_at",
+    "is_passed": ("is_passed", as_bool),
+})
+
+def json_response(response: Response, content: Any, headers: Optional[Dict[str, str]] = None) -> FastJSONResponse:
+    """Encode mapped rows once, keeping headers already set on ``response`` (e.g. ETag)"""
+    return FastJSONResponse(content=content, headers={**response.headers, **(headers or {})})
+
+def streamed_rows(conn: AsyncConnection, fmt: str, mapper: RowMapper, sql: str, params: List[Any],
+                  fields: Optional[List[str]] = None) -> Response:
+    """Stream every row of ``sql`` in ``fmt``, fetched in batches on the request's connection.
+
+    The connection dependency is only released once the body has been sent,
+    and it was checked out before the response started, so a busy pool is
+    still reported as a 503 rather than a truncated stream.
+    """
+    async def batches():
+        async for rows in conn.iterate(sql, *params):
+            yield rows
+    return streaming_json_response(batches(), mapper, fmt, fields)
+
+def course_page(response: Response, rows: list, fields: Optional[List[str]], next_cursor: Optional[str]):
+    """Shape one page of course rows, passing the continuation token in X-Next-Cursor"""
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    return json_response(response, COURSE_MAPPER.many(rows, fields), headers)
+
+def not_modified(request: Request, response: Response, *parts: Any) -> Optional[Response]:
+    """304 if the client's If-None-Match names the current version, else tag the response to be built.
+
+    ``parts`` are the versions the response depends on; the URL is always included.
+    """
+    etag = versions.etag(request.url.path, str(request.query_params), *parts)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    matched = versions.matches(etag, request.headers.get("if-none-match", ""))
+    versions.record(matched)
+    if matched:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+def user_versions(user_id: Optional[int]) -> tuple:
+    """Versions of one user's enrollment and progress state"""
+    return (versions.get("progress"), user_id, versions.user(user_id) if user_id else 0)
+
+# CourseResponse fields that are the same for every user and can be shared through catalog_cache
+CATALOG_FIELDS = [name for name in COURSE_COLUMNS if name not in ("is_enrolled", "progress_percentage")]
+
+async def load_catalog_courses(conn: AsyncConnection, condition: str) -> List[Dict[str, Any]]:
+    rows = await conn.fetchall(f"""
+        SELECT {course_select(CATALOG_FIELDS)}
+        FROM courses c
+        LEFT JOIN categories cat ON c.category_id = cat.id
+        WHERE c.is_active = 1 AND {condition}
+    """)
+    return COURSE_MAPPER.many(rows, CATALOG_FIELDS)
+
+async def enrollment_state(conn: AsyncConnection, user_id: Optional[int]) -> Dict[int, float]:
+    """course_id -> progress_percentage for every course the user is enrolled in"""
+    if user_id is None:
+        return {}
+    rows = await conn.fetchall(
+        "SELECT course_id, progress_percentage FROM user_enrollments WHERE user_id = ?", user_id
+    )
+    return {row.course_id: float(row.progress_percentage or 0) for row in rows}
+
+def mark_enrolled(courses: List[Dict[str, Any]], enrolled: Dict[int, float]) -> List[Dict[str, Any]]:
+    return [{
+        **course,
+        "is_enrolled": course["id"] in enrolled,
+        "progress_percentage": enrolled.get(course["id"], 0.0)
+    } for course in courses]
+
+def with_enrollment_state(response: Response, courses: List[Dict[str, Any]], enrolled: Dict[int, float]) -> FastJSONResponse:
+    return json_response(response, mark_enrolled(courses, enrolled))
+
+FEATURED_CONDITION = """
+    c.rating >= 4.5 AND c.total_enrollments > 100000
+    ORDER BY c.rating DESC, c.total_enrollments DESC
+"""
+POPULAR_CONDITION = """
+    c.total_enrollments > 150000
+    ORDER BY c.total_enrollments DESC
+"""
+
+async def load_categories(conn: AsyncConnection) -> List[Dict[str, Any]]:
+    rows = await conn.fetchall("SELECT * FROM categories WHERE is_active = 1 ORDER BY name")
+    return CATEGORY_MAPPER.many(rows)
+
+# catalog_cache key -> loader of each shared home section
+CATALOG_SECTIONS = {
+    "categories": load_categories,
+    "featured": lambda conn: load_catalog_courses(conn, FEATURED_CONDITION),
+    "popular": lambda conn: load_catalog_courses(conn, POPULAR_CONDITION),
+}
+
+async def shared_catalog(key: str) -> List[Dict[str, Any]]:
+    """A catalog section through catalog_cache; misses load on their own pooled connection
+    so they overlap with the request's per-user queries"""
+    async def load():
+        conn = await db.acquire(read_only=True)
+        try:
+            return await CATALOG_SECTIONS[key](conn)
+        finally:
+            await conn.release()
+    return await catalog_cache.get(key, load)
+
+# All of one user's enrollments with their courses: the home enrollments section
+# (listed rows, in /user/enrollments order) and is_enrolled for every other section
+HOME_ENROLLMENTS_QUERY = f"""
+    SELECT ue.course_id AS enrolled_course_id, ue.progress_percentage AS enrolled_progress,
+           CASE WHEN ue.is_active = 1 AND c.is_active = 1 THEN 1 ELSE 0 END AS listed,
+           {course_select(list(COURSE_COLUMNS))}, {ENROLLMENT_ORDER.select_list()}
+    FROM user_enrollments ue
+    LEFT JOIN courses c ON ue.course_id = c.id
+    LEFT JOIN categories cat ON c.category_id = cat.id
+    WHERE ue.user_id = ?
+    ORDER BY {ENROLLMENT_ORDER.order_by()}
+"""
+
+COURSE_DETAIL_QUERY = f"""
+    SELECT {course_select(list(COURSE_COLUMNS))}
+    FROM courses c
+    LEFT JOIN categories cat ON c.category_id = cat.id
+    LEFT JOIN user_enrollments ue ON c.id = ue.course_id AND ue.user_id = ?
+    WHERE c.id = ? AND c.is_active = 1
+"""
+
+COURSE_LESSONS_QUERY = """
+    SELECT cl.*, 
+           CASE WHEN ulp.is_completed IS NOT NULL THEN ulp.is_completed ELSE 0 END as is_watched,
+           ISNULL(ulp.watched_duration_seconds, 0) as watched_duration
+    FROM course_lessons cl
+    LEFT JOIN user_lesson_progress ulp ON cl.id = ulp.lesson_id AND ulp.user_id = ?
+    WHERE cl.course_id = ? AND cl.is_active = 1
+    ORDER BY cl.order_index
+"""
+
+# Fixed query - remove DISTINCT and handle NTEXT fields properly; attempt stats
+# come from the user's maintained summary row per quiz
+COURSE_QUIZZES_QUERY = """
+    SELECT q.id, q.course_id, q.lesson_id, q.title, 
+           CAST(q.description AS NVARCHAR(MAX)) as description,
+           q.total_questions, q.time_limit_minutes, q.passing_score_percentage, 
+           q.attempts_allowed, q.created_at, q.is_active,
+           ISNULL(s.attempts, 0) as user_attempts,
+           s.best_score,
+           ISNULL(s.is_passed, 0) as is_passed
+    FROM quizzes q
+    LEFT JOIN user_quiz_summaries s ON s.quiz_id = q.id AND s.user_id = ?
+    WHERE q.course_id = ? AND q.is_active = 1
+    ORDER BY q.created_at
+"""
+
+async def load_lessons(conn: AsyncConnection, user_id: int, course_id: int) -> List[Dict[str, Any]]:
+    rows = await conn.fetchall(COURSE_LESSONS_QUERY, user_id, course_id)
+    
+    # Overlay heartbeats that haven't been written yet
+    pending = progress_buffer.pending_for(user_id)
+    
+    lessons = LESSON_MAPPER.many(rows)
+    for lesson in lessons:
+        update = pending.get(lesson["id"])
+        if update is not None:
+            lesson["is_watched"] = bool(update.is_completed)
+            lesson["watched_duration"] = update.watched_duration_seconds
+    return lessons
+
+async def load_quizzes(conn: AsyncConnection, user_id: Optional[int], course_id: int) -> List[Dict[str, Any]]:
+    rows = await conn.fetchall(COURSE_QUIZZES_QUERY, user_id, course_id)
+    return QUIZ_MAPPER.many(rows)
+
+BUNDLE_SECTIONS = ["course", "lessons", "quizzes"]
+
+def bundle_digests(course_id: int, user_id: Optional[int]) -> Dict[str, str]:
+    """Version digest of each bundle section, from the counters its content depends on"""
+    def scoped(scope: str) -> int:
+        return versions.user(user_id, scope) if user_id else 0
+    catalog = catalog_cache.version
+    return {
+        "course": versions.digest(course_id, catalog, versions.get("enrollments"), versions.get("progress"),
+                                  user_id, scoped("courses")),
+        "lessons": versions.digest(course_id, catalog, user_id, scoped("courses"), scoped("lessons")),
+        "quizzes": versions.digest(course_id, catalog, user_id, scoped("quizzes")),
+    }
+
+def bundle_version(digests: Dict[str, str]) -> str:
+    return ".".join([versions.boot] + [digests[name] for name in BUNDLE_SECTIONS])
+
+def unchanged_since(since: str, digests: Dict[str, str]) -> List[str]:
+    """Sections whose digest still matches the ``since`` version; a token from
+    before a restart matches nothing"""
+    parts = since.split(".")
+    if len(parts) != len(BUNDLE_SECTIONS) + 1:
+        raise ValueError("Invalid since version")
+    if parts[0] != versions.boot:
+        return []
+    return [name for name, digest in zip(BUNDLE_SECTIONS, parts[1:]) if digest == digests[name]]
+
 # Initialize Firebase
+def initialize_firebase():
+    """Initialize the Firebase Admin SDK once; not needed when tokens are verified locally"""
+    if os.getenv("AUTH_VERIFIER", "firebase") == "local" or firebase_admin._apps:
+        return
+    # FIREBASE_CREDENTIALS points at a service account JSON; otherwise use application default credentials
+    cred_path = os.getenv("FIREBASE_CREDENTIALS")
+    cred = credentials.Certificate(cred_path) if cred_path else credentials.ApplicationDefault()
+    firebase_admin.initialize_app(cred)
+
 initialize_firebase()
 
 # API Endpoints
@@ -228,758 +650,625 @@ initialize_firebase()
 async def root():
     return {"message": "Internee.pk Learning App API"}
 
+# stats() of every subsystem, reported by /health and /metrics
+SUBSYSTEM_STATS = {
+    "database_pool": db.stats,
+    "token_cache": token_cache.stats,
+    "user_cache": user_resolver.stats,
+    "search_index": search_index.stats,
+    "recommender": recommender.stats,
+    "catalog_cache": catalog_cache.stats,
+    "quiz_cache": quiz_cache.stats,
+    "progress_buffer": progress_buffer.stats,
+    "lesson_counts": lesson_counts.stats,
+    "image_processor": image_processor.stats,
+    "enrollment_counter": enrollment_counter.stats,
+    "catalog_importer": catalog_importer.stats,
+    "etags": versions.stats,
+}
+for subsystem, stats in SUBSYSTEM_STATS.items():
+    metrics_registry.register_collector(subsystem, stats)
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", **{subsystem: stats() for subsystem, stats in SUBSYSTEM_STATS.items()}}
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text exposition of request, query and subsystem metrics"""
+    if not metrics_enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return Response(content=metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
 # Auth Endpoints
 @app.post("/auth/register", response_model=UserResponse)
-async def register_user(user_data: UserCreate):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
+async def register_user(user_data: UserCreate, request: Request, conn: AsyncConnection = Depends(get_db)):
     try:
-        cursor.execute("SELECT id FROM users WHERE firebase_uid = ?", user_data.firebase_uid)
-        existing_user = cursor.fetchone()
+        existing_user = await user_resolver.resolve(conn, user_data.firebase_uid)
         
         if existing_user:
             raise HTTPException(status_code=400, detail="User already exists")
         
-        processed_profile_picture = None
-        if user_data.profile_picture:
+        avatar = None
+        if user_data.profile_picture and not is_avatar_url(user_data.profile_picture):
             try:
-                processed_profile_picture = process_profile_image(user_data.profile_picture)
+                avatar = await process_profile_image(user_data.profile_picture)
             except Exception as e:
                 logger.warning(f"Profile picture processing failed during registration: {e}")
         
-        cursor.execute("""
-            INSERT INTO users (firebase_uid, email, display_name, profile_picture_data)
-            OUTPUT INSERTED.* VALUES (?, ?, ?, ?)
-        """, user_data.firebase_uid, user_data.email, user_data.display_name, processed_profile_picture)
-        
-        row = cursor.fetchone()
-        conn.commit()
-        
-        return UserResponse(
-            id=row.id,
-            firebase_uid=row.firebase_uid,
-            email=row.email,
-            display_name=row.display_name,
-            profile_picture=row.profile_picture_data,
-            created_at=row.created_at
-        )
+        row = await conn.fetchone("""
+            INSERT INTO users (firebase_uid, email, display_name)
+            OUTPUT INSERTED.id, INSERTED.firebase_uid, INSERTED.email, INSERTED.display_name, INSERTED.created_at
+            VALUES (?, ?, ?)
+        """, user_data.firebase_uid, user_data.email, user_data.display_name)
+        avatar_version = await save_avatar(conn, row.id, avatar) if avatar is not None else None
+        await conn.commit()
+        db.note_write(row.firebase_uid)
+        user_resolver.remember(row.firebase_uid, row.id)
+        
+        return user_response(request, row, avatar_version)
     except Exception as e:
-        conn.rollback()
+        await conn.rollback()
         logger.error(f"Registration failed: {e}")
         raise HTTPException(status_code=500, detail="Registration failed")
-    finally:
-        conn.close()
 
 @app.get("/auth/profile", response_model=UserResponse)
-async def get_user_profile(current_user: dict = Depends(verify_firebase_token)):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+async def get_user_profile(request: Request, current_user: dict = Depends(verify_firebase_token), conn: AsyncConnection = Depends(get_user_read_db)):
+    row = await conn.fetchone(f"{USER_SELECT} WHERE u.firebase_uid = ?", current_user["uid"])
     
-    try:
-        cursor.execute("SELECT * FROM users WHERE firebase_uid = ?", current_user["uid"])
-        row = cursor.fetchone()
-        
-        if not row:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        return UserResponse(
-            id=row.id,
-            firebase_uid=row.firebase_uid,
-            email=row.email,
-            display_name=row.display_name,
-            profile_picture=row.profile_picture_data,
-            created_at=row.created_at
-        )
-    finally:
-        conn.close()
+    if not row:
+        raise HTTPException(status_code=404, detail="User not found")
+    user_resolver.remember(row.firebase_uid, row.id)
+    
+    return user_response(request, row, avatar_version_of(row.avatar_etag))
 
 @app.put("/auth/profile", response_model=UserResponse)
 async def update_user_profile(
     user_data: UserUpdate,
-    current_user: dict = Depends(verify_firebase_token)
+    request: Request,
+    current_user: dict = Depends(verify_firebase_token),
+    conn: AsyncConnection = Depends(get_db)
 ):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     try:
-        cursor.execute("SELECT id FROM users WHERE firebase_uid = ?", current_user["uid"])
-        user_row = cursor.fetchone()
-        
-        if not user_row:
+        user_id = await user_resolver.resolve(conn, current_user["uid"])
+        if user_id is None:
             raise HTTPException(status_code=404, detail="User not found")
-        user_id = user_row.id
-        
-        processed_profile_picture = None
-        if user_data.profile_picture is not None:
-            if user_data.profile_picture == "":
-                processed_profile_picture = None
-            else:
-                try:
-                    processed_profile_picture = process_profile_image(user_data.profile_picture)
-                except Exception as e:
-                    raise HTTPException(status_code=400, detail=f"Image processing failed: {str(e)}")
         
-        update_fields = []
-        update_values = []
+        avatar = None
+        picture_changed = user_data.profile_picture is not None and not is_avatar_url(user_data.profile_picture)
+        if picture_changed and user_data.profile_picture != "":
+            avatar = await process_profile_image(user_data.profile_picture)
         
         if user_data.display_name is not None:
-            update_fields.append("display_name = ?")
-            update_values.append(user_data.display_name.strip())
+            await conn.execute("UPDATE users SET display_name = ? WHERE id = ?", user_data.display_name.strip(), user_id)
         
-        if user_data.profile_picture is not None:
-            update_fields.append("profile_picture_data = ?")
-            update_values.append(processed_profile_picture)
+        if picture_changed:
+            if avatar is not None:
+                await save_avatar(conn, user_id, avatar)
+            else:
+                await delete_avatar(conn, user_id)
         
-        if not update_fields:
-            cursor.execute("SELECT * FROM users WHERE id = ?", user_id)
-            row = cursor.fetchone()
-        else:
-            update_values.append(user_id)
-            update_query = f"UPDATE users SET {', '.join(update_fields)} WHERE id = ?"
-            cursor.execute(update_query, update_values)
-            conn.commit()
-            
-            cursor.execute("SELECT * FROM users WHERE id = ?", user_id)
-            row = cursor.fetchone()
+        if user_data.display_name is not None or picture_changed:
+            await conn.commit()
+        
+        row = await conn.fetchone(f"{USER_SELECT} WHERE u.id = ?", user_id)
         
         if not row:
             raise HTTPException(status_code=404, detail="User not found")
         
-        return UserResponse(
-            id=row.id,
-            firebase_uid=row.firebase_uid,
-            email=row.email,
-            display_name=row.display_name,
-            profile_picture=row.profile_picture_data,
-            created_at=row.created_at
-        )
+        return user_response(request, row, avatar_version_of(row.avatar_etag))
+    except HTTPException:
+        # Keep 400/413/503 from image processing instead of reporting a generic failure
+        await conn.rollback()
+        raise
     except Exception as e:
-        conn.rollback()
+        await conn.rollback()
         logger.error(f"Profile update failed: {e}")
         raise HTTPException(status_code=500, detail="Profile update failed")
-    finally:
-        conn.close()
+
+@app.get("/users/{user_id}/avatar")
+async def get_user_avatar(
+    user_id: int,
+    request: Request,
+    v: str = Query(..., description="Avatar version from profile_picture_version"),
+    size: int = Query(AVATAR_SIZES[0], ge=1, le=AVATAR_SIZES[0], description="Largest edge in pixels"),
+    conn: AsyncConnection = Depends(get_read_db)
+):
+    """Avatar image bytes.
+
+    The version is random per upload and only handed out with the profile,
+    so it doubles as the access token: user ids alone can't be walked to
+    collect pictures. Versioned URLs never change, so they're
+    cached for a year, by the client only.
+    """
+    row = await load_avatar(conn, user_id, size)
+    if (not row or not hmac.compare_digest(v, avatar_version_of(row.etag))) and conn.is_replica:
+        # Clients request a new avatar right after uploading it, possibly before the replica has it
+        primary = await checkout()
+        try:
+            row = await load_avatar(primary, user_id, size)
+        finally:
+            await primary.release()
+    if not row or not hmac.compare_digest(v, avatar_version_of(row.etag)):
+        raise HTTPException(status_code=404, detail="Avatar not found")
+    
+    etag = f'"{row.etag}"'
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=31536000, immutable"}
+    
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    
+    return Response(content=bytes(row.data), media_type=row.content_type, headers=headers)
 
 @app.get("/categories", response_model=List[CategoryResponse])
-async def get_categories():
-    conn = get_db_connection()
-    cursor = conn.cursor()
+async def get_categories(request: Request, response: Response, conn: AsyncConnection = Depends(get_read_db)):
+    cached = not_modified(request, response, catalog_cache.version)
+    if cached:
+        return cached
     
-    try:
-        cursor.execute("SELECT * FROM categories WHERE is_active = 1 ORDER BY name")
-        rows = cursor.fetchall()
-        
-        return [CategoryResponse(
-            id=row.id,
-            name=row.name,
-            description=row.description,
-            icon_url=row.icon_url,
-            color=row.color
-        ) for row in rows]
-    finally:
-        conn.close()
+    return json_response(response, await catalog_cache.get("categories", lambda: load_categories(conn)))
 
 @app.get("/courses", response_model=List[CourseResponse])
 async def get_courses(
+    request: Request,
+    response: Response,
     category_id: Optional[int] = Query(None, description="Filter by category ID"),
     search: Optional[str] = Query(None, description="Search in title, description, instructor"),
     level: Optional[str] = Query(None, description="Filter by difficulty level"),
     is_free: Optional[bool] = Query(None, description="Filter by free/paid courses"),
     min_rating: Optional[float] = Query(None, description="Minimum rating filter"),
-    sort_by: Optional[str] = Query("newest", description="Sort by: newest, popular, rating"),
-    current_user: dict = Depends(verify_firebase_token)
+    sort_by: Optional[str] = Query(None, description="Sort by: relevance (default with search), newest, popular, rating"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Page size"),
+    cursor: Optional[str] = Query(None, description="Continuation token from X-Next-Cursor"),
+    fields: Optional[str] = Query(None, description="Comma separated course fields to return"),
+    current_user: dict = Depends(verify_firebase_token),
+    conn: AsyncConnection = Depends(get_user_read_db)
 ):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    # Searches go through the in-memory index; the LIKE scan is only a fallback
+    # while the index is still building or disabled
+    use_index = bool(search) and search_index.ready
+    if sort_by is None:
+        sort_by = "relevance" if search else "newest"
+    if use_index and sort_by == "relevance":
+        order = RELEVANCE_ORDER
+    else:
+        sort_by = sort_by if sort_by in COURSE_SORTS else "newest"
+        order = COURSE_SORTS[sort_by]
     
+    scope = query_scope("courses", category_id, search, level, is_free, min_rating, sort_by, use_index)
     try:
-        cursor.execute("SELECT id FROM users WHERE firebase_uid = ?", current_user["uid"])
-        user_row = cursor.fetchone()
-        user_id = user_row.id if user_row else None
-        
-        base_query = """
-            SELECT c.*, cat.name as category_name,
-                   CASE WHEN ue.user_id IS NOT NULL THEN 1 ELSE 0 END as is_enrolled,
-                   ISNULL(ue.progress_percentage, 0) as progress_percentage
-            FROM courses c
-            LEFT JOIN categories cat ON c.category_id = cat.id
-            LEFT JOIN user_enrollments ue ON c.id = ue.course_id AND ue.user_id = ?
-            WHERE c.is_active = 1
-        """
-        params = [user_id]
-        
-        if category_id:
-            base_query += " AND c.category_id = ?"
-            params.append(category_id)
-        
-        if search:
-            base_query += " AND (c.title LIKE ? OR c.description LIKE ? OR c.instructor_name LIKE ?)"
-            search_term = f"%{search}%"
-            params.extend([search_term, search_term, search_term])
-        
-        if level:
-            base_query += " AND c.level = ?"
-            params.append(level)
-        
-        if is_free is not None:
-            base_query += " AND c.is_free = ?"
-            params.append(is_free)
-        
-        if min_rating:
-            base_query += " AND c.rating >= ?"
-            params.append(min_rating)
-        
-        if sort_by == "popular":
-            base_query += " ORDER BY c.total_enrollments DESC"
-        elif sort_by == "rating":
-            base_query += " ORDER BY c.rating DESC, c.total_ratings DESC"
-        else:
-            base_query += " ORDER BY c.created_at DESC"
-        
-        cursor.execute(base_query, params)
-        rows = cursor.fetchall()
-        
-        return [CourseResponse(
-            id=row.id,
-            title=row.title,
-            description=row.description,
-            thumbnail_url=row.thumbnail_url,
-            category_id=row.category_id,
-            category_name=row.category_name,
-            instructor_name=row.instructor_name,
-            duration_minutes=row.duration_minutes,
-            level=row.level,
-            price=float(row.price) if row.price else 0.0,
-            is_free=bool(row.is_free),
-            rating=float(row.rating) if row.rating else 0.0,
-            total_ratings=row.total_ratings,
-            total_enrollments=row.total_enrollments,
-            is_enrolled=bool(row.is_enrolled),
-            progress_percentage=float(row.progress_percentage),
-            course_url=row.course_url
-        ) for row in rows]
-    finally:
-        conn.close()
+        selected = parse_fields(fields, COURSE_COLUMNS)
+        after = decode_cursor(order, cursor, scope) if cursor else None
+    except (ValueError, InvalidCursor) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    user_id = await user_resolver.resolve(conn, current_user["uid"])
+    
+    cached = not_modified(
+        request, response, catalog_cache.version, versions.get("enrollments"), user_versions(user_id),
+        search_index.updated_at if use_index else None
+    )
+    if cached:
+        return cached
+    
+    if use_index:
+        hits = search_index.search(search, category_id, level, is_free, min_rating)
+        keys = [search_sort_key(sort_by, hit) for hit in hits]
+        if after is not None:
+            after = tuple(after)
+            keys = [key for key in keys if key < after]
+        page = heapq.nlargest(limit + 1, keys)
+        
+        next_cursor = None
+        if len(page) > limit:
+            page = page[:limit]
+            next_cursor = encode_cursor(order, page[-1], scope)
+        
+        rows = await fetch_courses_by_id(conn, user_id, [key[-1] for key in page], selected)
+        return course_page(response, rows, selected, next_cursor)
+    
+    base_query = f"""
+        SELECT TOP (?) {course_select(selected or list(COURSE_COLUMNS))}, {order.select_list()}
+        FROM courses c
+        LEFT JOIN categories cat ON c.category_id = cat.id
+        LEFT JOIN user_enrollments ue ON c.id = ue.course_id AND ue.user_id = ?
+        WHERE c.is_active = 1
+    """
+    params = [limit + 1, user_id]
+    
+    if category_id:
+        base_query += " AND c.category_id = ?"
+        params.append(category_id)
+    
+    if search:
+        base_query += " AND (c.title LIKE ? OR c.description LIKE ? OR c.instructor_name LIKE ?)"
+        search_term = f"%{search}%"
+        params.extend([search_term, search_term, search_term])
+    
+    if level:
+        base_query += " AND c.level = ?"
+        params.append(level)
+    
+    if is_free is not None:
+        base_query += " AND c.is_free = ?"
+        params.append(is_free)
+    
+    if min_rating:
+        base_query += " AND c.rating >= ?"
+        params.append(min_rating)
+    
+    if after is not None:
+        seek_sql, seek_params = order.seek(after)
+        base_query += f" AND {seek_sql}"
+        params.extend(seek_params)
+    
+    base_query += f" ORDER BY {order.order_by()}"
+    
+    rows = await conn.fetchall(base_query, *params)
+    rows, next_cursor = trim_page(rows, limit, order, scope)
+    
+    return course_page(response, rows, selected, next_cursor)
+
+async def fetch_courses_by_id(conn: AsyncConnection, user_id: Optional[int], course_ids: List[int],
+                              fields: Optional[List[str]]) -> list:
+    """Load course rows for already ranked ids, keeping their order"""
+    if not course_ids:
+        return []
+    
+    placeholders = ", ".join("?" for _ in course_ids)
+    rows = await conn.fetchall(f"""
+        SELECT {course_select(fields or list(COURSE_COLUMNS))}
+        FROM courses c
+        LEFT JOIN categories cat ON c.category_id = cat.id
+        LEFT JOIN user_enrollments ue ON c.id = ue.course_id AND ue.user_id = ?
+        WHERE c.is_active = 1 AND c.id IN ({placeholders})
+    """, user_id, *course_ids)
+    
+    by_id = {row.id: row for row in rows}
+    return [by_id[course_id] for course_id in course_ids if course_id in by_id]
 
 @app.get("/courses/featured", response_model=List[CourseResponse])
-async def get_featured_courses(current_user: dict = Depends(verify_firebase_token)):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+async def get_featured_courses(response: Response, current_user: dict = Depends(verify_firebase_token), conn: AsyncConnection = Depends(get_user_read_db)):
+    user_id = await user_resolver.resolve(conn, current_user["uid"])
     
-    try:
-        cursor.execute("SELECT id FROM users WHERE firebase_uid = ?", current_user["uid"])
-        user_row = cursor.fetchone()
-        user_id = user_row.id if user_row else None
-        
-        cursor.execute("""
-            SELECT c.*, cat.name as category_name,
-                   CASE WHEN ue.user_id IS NOT NULL THEN 1 ELSE 0 END as is_enrolled,
-                   ISNULL(ue.progress_percentage, 0) as progress_percentage
-            FROM courses c
-            LEFT JOIN categories cat ON c.category_id = cat.id
-            LEFT JOIN user_enrollments ue ON c.id = ue.course_id AND ue.user_id = ?
-            WHERE c.is_active = 1 AND c.rating >= 4.5 AND c.total_enrollments > 100000
-            ORDER BY c.rating DESC, c.total_enrollments DESC
-        """, user_id)
-        
-        rows = cursor.fetchall()
-        
-        return [CourseResponse(
-            id=row.id,
-            title=row.title,
-            description=row.description,
-            thumbnail_url=row.thumbnail_url,
-            category_id=row.category_id,
-            category_name=row.category_name,
-            instructor_name=row.instructor_name,
-            duration_minutes=row.duration_minutes,
-            level=row.level,
-            price=float(row.price) if row.price else 0.0,
-            is_free=bool(row.is_free),
-            rating=float(row.rating) if row.rating else 0.0,
-            total_ratings=row.total_ratings,
-            total_enrollments=row.total_enrollments,
-            is_enrolled=bool(row.is_enrolled),
-            progress_percentage=float(row.progress_percentage),
-            course_url=row.course_url
-        ) for row in rows]
-    finally:
-        conn.close()
+    courses = await catalog_cache.get("featured", lambda: load_catalog_courses(conn, FEATURED_CONDITION))
+    
+    return with_enrollment_state(response, courses, await enrollment_state(conn, user_id))
 
 @app.get("/courses/popular", response_model=List[CourseResponse])
-async def get_popular_courses(current_user: dict = Depends(verify_firebase_token)):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+async def get_popular_courses(response: Response, current_user: dict = Depends(verify_firebase_token), conn: AsyncConnection = Depends(get_user_read_db)):
+    user_id = await user_resolver.resolve(conn, current_user["uid"])
     
-    try:
-        cursor.execute("SELECT id FROM users WHERE firebase_uid = ?", current_user["uid"])
-        user_row = cursor.fetchone()
-        user_id = user_row.id if user_row else None
-        
-        cursor.execute("""
-            SELECT c.*, cat.name as category_name,
-                   CASE WHEN ue.user_id IS NOT NULL THEN 1 ELSE 0 END as is_enrolled,
-                   ISNULL(ue.progress_percentage, 0) as progress_percentage
-            FROM courses c
-            LEFT JOIN categories cat ON c.category_id = cat.id
-            LEFT JOIN user_enrollments ue ON c.id = ue.course_id AND ue.user_id = ?
-            WHERE c.is_active = 1 AND c.total_enrollments > 150000
-            ORDER BY c.total_enrollments DESC
-        """, user_id)
-        
-        rows = cursor.fetchall()
-        
-        return [CourseResponse(
-            id=row.id,
-            title=row.title,
-            description=row.description,
-            thumbnail_url=row.thumbnail_url,
-            category_id=row.category_id,
-            category_name=row.category_name,
-            instructor_name=row.instructor_name,
-            duration_minutes=row.duration_minutes,
-            level=row.level,
-            price=float(row.price) if row.price else 0.0,
-            is_free=bool(row.is_free),
-            rating=float(row.rating) if row.rating else 0.0,
-            total_ratings=row.total_ratings,
-            total_enrollments=row.total_enrollments,
-            is_enrolled=bool(row.is_enrolled),
-            progress_percentage=float(row.progress_percentage),
-            course_url=row.course_url
-        ) for row in rows]
-    finally:
-        conn.close()
+    courses = await catalog_cache.get("popular", lambda: load_catalog_courses(conn, POPULAR_CONDITION))
+    
+    return with_enrollment_state(response, courses, await enrollment_state(conn, user_id))
 
-@app.get("/courses/{course_id}", response_model=CourseResponse)
-async def get_course_detail(course_id: int, current_user: dict = Depends(verify_firebase_token)):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+@app.get("/courses/recommended", response_model=List[CourseResponse])
+async def get_recommended_courses(
+    request: Request,
+    response: Response,
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE, description="Max courses"),
+    current_user: dict = Depends(verify_firebase_token),
+    conn: AsyncConnection = Depends(get_user_read_db)
+):
+    """Courses that students in the user's courses also took, leaving out the user's own.
+
+    Falls back to popular courses until the recommender has built, or when
+    the user's courses have no co-enrollments yet.
+    """
+    user_id = await user_resolver.resolve(conn, current_user["uid"])
+
+    cached = not_modified(
+        request, response, catalog_cache.version, versions.get("enrollments"), user_versions(user_id),
+        recommender.built_at
+    )
+    if cached:
+        return cached
+
+    enrolled = await enrollment_state(conn, user_id)
+    ranked = recommender.recommend(enrolled, limit)
+    if ranked:
+        rows = await fetch_courses_by_id(conn, user_id, [course_id for course_id, _ in ranked], None)
+        return json_response(response, COURSE_MAPPER.many(rows))
+
+    popular = await catalog_cache.get("popular", lambda: load_catalog_courses(conn, POPULAR_CONDITION))
+    courses = [course for course in popular if course["id"] not in enrolled][:limit]
+    return with_enrollment_state(response, courses, enrolled)
+
+HOME_SECTIONS = ["categories", "featured", "popular", "enrollments"]
+
+@app.get("/home", response_model=HomeResponse)
+async def get_home(
+    request: Request,
+    response: Response,
+    sections: Optional[str] = Query(None, description="Comma separated sections to return, default all"),
+    categories_limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Max categories"),
+    featured_limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Max featured courses"),
+    popular_limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Max popular courses"),
+    enrollments_limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Enrollments page size"),
+    current_user: dict = Depends(verify_firebase_token),
+    conn: AsyncConnection = Depends(get_user_read_db)
+):
+    """Categories, featured and popular courses and the user's enrollments in one response.
+
+    The user is resolved once; shared sections come from catalog_cache and
+    the user's enrollment state from a single query, run concurrently.
+    """
+    try:
+        wanted = parse_fields(sections, HOME_SECTIONS) or HOME_SECTIONS
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    user_id = await user_resolver.resolve(conn, current_user["uid"])
+    
+    cached = not_modified(request, response, catalog_cache.version, versions.get("enrollments"), user_versions(user_id))
+    if cached:
+        return cached
+    
+    async def user_enrollments():
+        if user_id is None or wanted == ["categories"]:
+            return []
+        return await conn.fetchall(HOME_ENROLLMENTS_QUERY, user_id)
     
+    shared = [name for name in wanted if name in CATALOG_SECTIONS]
     try:
-        cursor.execute("SELECT id FROM users WHERE firebase_uid = ?", current_user["uid"])
-        user_row = cursor.fetchone()
-        user_id = user_row.id if user_row else None
-        
-        cursor.execute("""
-            SELECT c.*, cat.name as category_name,
-                   CASE WHEN ue.user_id IS NOT NULL THEN 1 ELSE 0 END as is_enrolled,
-                   ISNULL(ue.progress_percentage, 0) as progress_percentage
-            FROM courses c
-            LEFT JOIN categories cat ON c.category_id = cat.id
-            LEFT JOIN user_enrollments ue ON c.id = ue.course_id AND ue.user_id = ?
-            WHERE c.id = ? AND c.is_active = 1
-        """, user_id, course_id)
-        
-        row = cursor.fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail="Course not found")
-        
-        return CourseResponse(
-            id=row.id,
-            title=row.title,
-            description=row.description,
-            thumbnail_url=row.thumbnail_url,
-            category_id=row.category_id,
-            category_name=row.category_name,
-            instructor_name=row.instructor_name,
-            duration_minutes=row.duration_minutes,
-            level=row.level,
-            price=float(row.price) if row.price else 0.0,
-            is_free=bool(row.is_free),
-            rating=float(row.rating) if row.rating else 0.0,
-            total_ratings=row.total_ratings,
-            total_enrollments=row.total_enrollments,
-            is_enrolled=bool(row.is_enrolled),
-            progress_percentage=float(row.progress_percentage),
-            course_url=row.course_url
+        rows, *loaded = await asyncio.gather(user_enrollments(), *(shared_catalog(name) for name in shared))
+    except PoolTimeout as e:
+        logger.error(f"Database pool exhausted: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database is busy, please retry",
+            headers={"Retry-After": "1"}
         )
-    finally:
-        conn.close()
+    
+    enrolled = {row.enrolled_course_id: float(row.enrolled_progress or 0) for row in rows}
+    limits = {"categories": categories_limit, "featured": featured_limit, "popular": popular_limit}
+    content = {}
+    for name, items in zip(shared, loaded):
+        items = items[:limits[name]] if limits[name] else items
+        content[name] = items if name == "categories" else mark_enrolled(items, enrolled)
+    
+    if "enrollments" in wanted:
+        listed = [row for row in rows if row.listed][:enrollments_limit + 1]
+        page, next_cursor = trim_page(listed, enrollments_limit, ENROLLMENT_ORDER, query_scope("enrollments"))
+        content["enrollments"] = COURSE_MAPPER.many(page)
+        content["enrollments_next_cursor"] = next_cursor
+    
+    return json_response(response, {name: content[name] for name in HomeResponse.model_fields if name in content})
 
-# Add this function to main.py after the verify_firebase_token function
-async def get_or_create_user(current_user: dict):
-    """Get user from database or create if doesn't exist"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+@app.get("/courses/{course_id}", response_model=CourseResponse)
+async def get_course_detail(course_id: int, request: Request, response: Response, current_user: dict = Depends(verify_firebase_token), conn: AsyncConnection = Depends(get_user_read_db)):
+    user_id = await user_resolver.resolve(conn, current_user["uid"])
+    
+    cached = not_modified(request, response, catalog_cache.version, versions.get("enrollments"), user_versions(user_id))
+    if cached:
+        return cached
+    
+    row = await conn.fetchone(COURSE_DETAIL_QUERY, user_id, course_id)
+    if not row:
+        raise HTTPException(status_code=404, detail="Course not found")
     
+    return json_response(response, COURSE_MAPPER.one(row))
+
+@app.get("/courses/{course_id}/similar", response_model=List[CourseResponse])
+async def get_similar_courses(
+    course_id: int,
+    request: Request,
+    response: Response,
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE, description="Max courses"),
+    current_user: dict = Depends(verify_firebase_token),
+    conn: AsyncConnection = Depends(get_user_read_db)
+):
+    """Students who took this course also took: its precomputed nearest neighbours"""
+    user_id = await user_resolver.resolve(conn, current_user["uid"])
+
+    cached = not_modified(
+        request, response, catalog_cache.version, versions.get("enrollments"), user_versions(user_id),
+        recommender.built_at
+    )
+    if cached:
+        return cached
+
+    ranked = recommender.similar(course_id, limit)
+    rows = await fetch_courses_by_id(conn, user_id, [similar_id for similar_id, _ in ranked], None)
+    return json_response(response, COURSE_MAPPER.many(rows))
+
+@app.get("/courses/{course_id}/bundle", response_model=CourseBundleResponse)
+async def get_course_bundle(
+    course_id: int,
+    request: Request,
+    response: Response,
+    since: Optional[str] = Query(None, description="version of an earlier bundle; sections unchanged since are left out"),
+    current_user: dict = Depends(verify_firebase_token),
+    conn: AsyncConnection = Depends(get_user_read_db)
+):
+    """Course detail, lessons with watch state and quizzes with attempt stats in one response.
+
+    The course row doubles as the enrollment check, so this takes at most
+    three queries, and sections listed in ``unchanged`` are not queried at all.
+    """
+    user_id = await user_resolver.resolve(conn, current_user["uid"])
+    digests = bundle_digests(course_id, user_id)
     try:
-        cursor.execute("SELECT id FROM users WHERE firebase_uid = ?", current_user["uid"])
-        user_row = cursor.fetchone()
-        
-        if user_row:
-            return user_row.id
-        
-        # Create user if doesn't exist
-        email = current_user.get("email", f"{current_user['uid']}@unknown.com")
-        display_name = current_user.get("name", "Unknown User")
-        
-        cursor.execute("""
-            INSERT INTO users (firebase_uid, email, display_name, profile_picture_data)
-            OUTPUT INSERTED.id VALUES (?, ?, ?, ?)
-        """, current_user["uid"], email, display_name, None)
-        
-        new_user = cursor.fetchone()
-        conn.commit()
-        logger.info(f"Auto-created user {current_user['uid']} with ID {new_user.id}")
-        
-        return new_user.id
-        
-    except Exception as e:
-        conn.rollback()
-        logger.error(f"Failed to get or create user: {e}")
-        raise HTTPException(status_code=500, detail="User setup failed")
-    finally:
-        conn.close()
+        unchanged = unchanged_since(since, digests) if since else []
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    cached = not_modified(request, response, *digests.values())
+    if cached:
+        return cached
+    
+    row = await conn.fetchone(COURSE_DETAIL_QUERY, user_id, course_id)
+    if not row:
+        raise HTTPException(status_code=404, detail="Course not found")
+    
+    content: Dict[str, Any] = {"version": bundle_version(digests)}
+    if "course" not in unchanged:
+        content["course"] = COURSE_MAPPER.one(row)
+    if row.is_enrolled and "lessons" not in unchanged:
+        content["lessons"] = await load_lessons(conn, user_id, course_id)
+    if "quizzes" not in unchanged:
+        content["quizzes"] = await load_quizzes(conn, user_id, course_id)
+    content["unchanged"] = unchanged
+    
+    return json_response(response, content)
 
 # Then update your enroll_course function
 @app.post("/courses/enroll")
 async def enroll_course(
     request: EnrollRequest,
-    current_user: dict = Depends(verify_firebase_token)
+    current_user: dict = Depends(verify_firebase_token),
+    conn: AsyncConnection = Depends(get_db)
 ):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
     try:
         logger.info(f"Attempting to enroll user {current_user['uid']} in course {request.course_id}")
         
         # Use get_or_create_user instead of manual lookup
-        user_id = await get_or_create_user(current_user)
+        user_id = await get_or_create_user(current_user, conn)
         logger.info(f"User {user_id} found/created, proceeding with enrollment")
         
-        cursor.execute(
+        if await conn.fetchone(
             "SELECT id FROM user_enrollments WHERE user_id = ? AND course_id = ?",
             user_id, request.course_id
-        )
-        if cursor.fetchone():
+        ):
             raise HTTPException(status_code=400, detail="Already enrolled in this course")
         
-        cursor.execute("""
+        await conn.execute("""
             INSERT INTO user_enrollments (user_id, course_id)
             VALUES (?, ?)
         """, user_id, request.course_id)
         
-        cursor.execute("""
-            UPDATE courses SET total_enrollments = total_enrollments + 1
-            WHERE id = ?
-        """, request.course_id)
+        await conn.commit()
         
-        conn.commit()
+        # Counted outside the transaction so enrollments don't queue on the course row lock
+        enrollment_counter.add(request.course_id)
+        versions.bump_user(user_id, "courses", "lessons")
         return {"message": "Successfully enrolled in course"}
     except Exception as e:
-        conn.rollback()
+        await conn.rollback()
         logger.error(f"Enrollment failed: {e}")
         raise HTTPException(status_code=500, detail="Enrollment failed")
-    finally:
-        conn.close()
 
 # Also update other endpoints to use get_or_create_user
 @app.get("/courses/{course_id}/lessons", response_model=List[LessonResponse])
-async def get_course_lessons(course_id: int, current_user: dict = Depends(verify_firebase_token)):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+async def get_course_lessons(course_id: int, request: Request, response: Response, current_user: dict = Depends(verify_firebase_token), conn: AsyncConnection = Depends(get_user_read_db)):
+    # Read-only: a user without a users row can't be enrolled either
+    user_id = await user_resolver.resolve(conn, current_user["uid"])
     
-    try:
-        user_id = await get_or_create_user(current_user)
-        
-        cursor.execute(
-            "SELECT id FROM user_enrollments WHERE user_id = ? AND course_id = ?",
-            user_id, course_id
-        )
-        if not cursor.fetchone():
-            raise HTTPException(status_code=403, detail="Not enrolled in this course")
-        
-        cursor.execute("""
-            SELECT cl.*, 
-                   CASE WHEN ulp.is_completed IS NOT NULL THEN ulp.is_completed ELSE 0 END as is_watched,
-                   ISNULL(ulp.watched_duration_seconds, 0) as watched_duration
-            FROM course_lessons cl
-            LEFT JOIN user_lesson_progress ulp ON cl.id = ulp.lesson_id AND ulp.user_id = ?
-            WHERE cl.course_id = ? AND cl.is_active = 1
-            ORDER BY cl.order_index
-        """, user_id, course_id)
-        
-        rows = cursor.fetchall()
-        
-        return [LessonResponse(
-            id=row.id,
-            course_id=row.course_id,
-            title=row.title,
-            description=row.description,
-            video_url=row.video_url,
-            duration_seconds=row.duration_seconds,
-            order_index=row.order_index,
-            is_preview=bool(row.is_preview),
-            is_watched=bool(row.is_watched),
-            watched_duration=row.watched_duration
-        ) for row in rows]
-    finally:
-        conn.close()
+    cached = not_modified(request, response, catalog_cache.version, user_versions(user_id))
+    if cached:
+        return cached
+    
+    if not await conn.fetchone(
+        "SELECT id FROM user_enrollments WHERE user_id = ? AND course_id = ?",
+        user_id, course_id
+    ):
+        raise HTTPException(status_code=403, detail="Not enrolled in this course")
+    
+    return json_response(response, await load_lessons(conn, user_id, course_id))
 
 @app.post("/lessons/progress")
 async def update_lesson_progress(
     request: UpdateProgressRequest,
-    current_user: dict = Depends(verify_firebase_token)
+    current_user: dict = Depends(verify_firebase_token),
+    conn: AsyncConnection = Depends(get_db)
 ):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     try:
-        cursor.execute("SELECT id FROM users WHERE firebase_uid = ?", current_user["uid"])
-        user_row = cursor.fetchone()
-        if not user_row:
+        user_id = await user_resolver.resolve(conn, current_user["uid"])
+        if user_id is None:
             raise HTTPException(status_code=404, detail="User not found")
-        user_id = user_row.id
-        
-        cursor.execute("""
-            MERGE user_lesson_progress AS target
-            USING (SELECT ? as user_id, ? as lesson_id, ? as watched_duration_seconds, ? as is_completed) AS source
-            ON target.user_id = source.user_id AND target.lesson_id = source.lesson_id
-            WHEN MATCHED THEN
-                UPDATE SET watched_duration_seconds = source.watched_duration_seconds,
-                          is_completed = source.is_completed,
-                          completed_at = CASE WHEN source.is_completed = 1 THEN GETDATE() ELSE NULL END,
-                          last_watched_at = GETDATE()
-            WHEN NOT MATCHED THEN
-                INSERT (user_id, lesson_id, watched_duration_seconds, is_completed, completed_at, last_watched_at)
-                VALUES (source.user_id, source.lesson_id, source.watched_duration_seconds, 
-                       source.is_completed, 
-                       CASE WHEN source.is_completed = 1 THEN GETDATE() ELSE NULL END,
-                       GETDATE());
-        """, user_id, request.lesson_id, request.watched_duration_seconds, request.is_completed)
-        
-        cursor.execute("""
-            UPDATE user_enrollments 
-            SET progress_percentage = (
-                SELECT CAST(COUNT(CASE WHEN ulp.is_completed = 1 THEN 1 END) AS FLOAT) / COUNT(*) * 100
-                FROM course_lessons cl
-                LEFT JOIN user_lesson_progress ulp ON cl.id = ulp.lesson_id AND ulp.user_id = ?
-                WHERE cl.course_id = (SELECT course_id FROM course_lessons WHERE id = ?)
-                AND cl.is_active = 1
-            )
-            WHERE user_id = ? AND course_id = (SELECT course_id FROM course_lessons WHERE id = ?)
-        """, user_id, request.lesson_id, user_id, request.lesson_id)
         
-        conn.commit()
+        # Heartbeats are coalesced and written in batches; a completion is written right away
+        progress_buffer.record(user_id, request.lesson_id, request.watched_duration_seconds, request.is_completed,
+                               sticky_key=current_user["uid"])
+        db.note_write(current_user["uid"])
+        if request.is_completed:
+            await progress_buffer.flush_lesson(conn, user_id, request.lesson_id)
+        versions.bump_user(user_id, "lessons")
         return {"message": "Progress updated successfully"}
     except Exception as e:
-        conn.rollback()
+        await conn.rollback()
         logger.error(f"Progress update failed: {e}")
         raise HTTPException(status_code=500, detail="Progress update failed")
-    finally:
-        conn.close()
 
 
 # Fixed Quiz Endpoints for FastAPI
 
 @app.get("/courses/{course_id}/quizzes", response_model=List[QuizResponse])
-async def get_course_quizzes(course_id: int, current_user: dict = Depends(verify_firebase_token)):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+async def get_course_quizzes(course_id: int, request: Request, response: Response, current_user: dict = Depends(verify_firebase_token), conn: AsyncConnection = Depends(get_user_read_db)):
+    user_id = await user_resolver.resolve(conn, current_user["uid"])
     
-    try:
-        cursor.execute("SELECT id FROM users WHERE firebase_uid = ?", current_user["uid"])
-        user_row = cursor.fetchone()
-        user_id = user_row.id if user_row else None
-        
-        # Fixed query - remove DISTINCT and handle NTEXT fields properly
-        cursor.execute("""
-            SELECT q.id, q.course_id, q.lesson_id, q.title, 
-                   CAST(q.description AS NVARCHAR(MAX)) as description,
-                   q.total_questions, q.time_limit_minutes, q.passing_score_percentage, 
-                   q.attempts_allowed, q.created_at, q.is_active,
-                   ISNULL(attempt_stats.user_attempts, 0) as user_attempts,
-                   attempt_stats.best_score,
-                   ISNULL(attempt_stats.is_passed, 0) as is_passed
-            FROM quizzes q
-            LEFT JOIN (
-                SELECT quiz_id, 
-                       COUNT(*) as user_attempts,
-                       MAX(score_percentage) as best_score,
-                       MAX(CAST(is_passed AS INT)) as is_passed
-                FROM user_quiz_attempts 
-                WHERE user_id = ?
-                GROUP BY quiz_id
-            ) attempt_stats ON q.id = attempt_stats.quiz_id
-            WHERE q.course_id = ? AND q.is_active = 1
-            ORDER BY q.created_at
-        """, user_id, course_id)
-        
-        rows = cursor.fetchall()
-        
-        return [QuizResponse(
-            id=row.id,
-            course_id=row.course_id,
-            lesson_id=row.lesson_id,
-            title=row.title,
-            description=row.description,
-            total_questions=row.total_questions,
-            time_limit_minutes=row.time_limit_minutes,
-            passing_score_percentage=float(row.passing_score_percentage),
-            attempts_allowed=row.attempts_allowed,
-            user_attempts=row.user_attempts or 0,
-            best_score=float(row.best_score) if row.best_score else None,
-            is_passed=bool(row.is_passed) if row.is_passed else False
-        ) for row in rows]
-    finally:
-        conn.close()
+    cached = not_modified(request, response, catalog_cache.version, user_versions(user_id))
+    if cached:
+        return cached
+    
+    return json_response(response, await load_quizzes(conn, user_id, course_id))
 
 @app.get("/quizzes/{quiz_id}/questions", response_model=List[QuestionResponse])
-async def get_quiz_questions(quiz_id: int, current_user: dict = Depends(verify_firebase_token)):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+async def get_quiz_questions(quiz_id: int, current_user: dict = Depends(verify_firebase_token), conn: AsyncConnection = Depends(get_user_read_db)):
+    user_id = await user_resolver.resolve(conn, current_user["uid"])
+    if user_id is None:
+        raise HTTPException(status_code=404, detail="User not found")
     
-    try:
-        cursor.execute("SELECT id FROM users WHERE firebase_uid = ?", current_user["uid"])
-        user_row = cursor.fetchone()
-        if not user_row:
-            raise HTTPException(status_code=404, detail="User not found")
-        user_id = user_row.id
-        
-        # Check if user has access to this quiz
-        cursor.execute("""
-            SELECT ue.id FROM user_enrollments ue
-            JOIN quizzes q ON ue.course_id = q.course_id
-            WHERE q.id = ? AND ue.user_id = ?
-        """, quiz_id, user_id)
-        
-        if not cursor.fetchone():
-            raise HTTPException(status_code=403, detail="Access denied")
-        
-        # Get questions with options - cast NTEXT to NVARCHAR(MAX)
-        cursor.execute("""
-            SELECT qq.id, qq.quiz_id, 
-                   CAST(qq.question_text AS NVARCHAR(MAX)) as question_text,
-                   qq.question_type, qq.points, qq.order_index,
-                   qao.id as option_id, 
-                   CAST(qao.option_text AS NVARCHAR(MAX)) as option_text, 
-                   qao.order_index as option_order
-            FROM quiz_questions qq
-            LEFT JOIN quiz_answer_options qao ON qq.id = qao.question_id
-            WHERE qq.quiz_id = ? AND qq.is_active = 1
-            ORDER BY qq.order_index, qao.order_index
-        """, quiz_id)
-        
-        rows = cursor.fetchall()
-        
-        questions_dict = {}
-        for row in rows:
-            if row.id not in questions_dict:
-                questions_dict[row.id] = {
-                    "id": row.id,
-                    "question_text": row.question_text,
-                    "question_type": row.question_type,
-                    "points": row.points,
-                    "order_index": row.order_index,
-                    "options": []
-                }
-            
-            if row.option_id:
-                questions_dict[row.id]["options"].append({
-                    "id": row.option_id,
-                    "text": row.option_text,
-                    "order_index": row.option_order
-                })
-        
-        return [QuestionResponse(**question) for question in questions_dict.values()]
-    finally:
-        conn.close()
+    # Compiled once per quiz version; only the enrollment check hits the database
+    compiled = await quiz_cache.get(conn, quiz_id)
+    
+    # Check if user has access to this quiz
+    if compiled is None or not await conn.fetchone(
+        "SELECT id FROM user_enrollments WHERE course_id = ? AND user_id = ?",
+        compiled.quiz.course_id, user_id
+    ):
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    return Response(content=compiled.questions_json, media_type="application/json")
 
 @app.post("/quizzes/submit")
 async def submit_quiz(
     request: SubmitQuizRequest,
-    current_user: dict = Depends(verify_firebase_token)
+    current_user: dict = Depends(verify_firebase_token),
+    conn: AsyncConnection = Depends(get_db)
 ):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     try:
-        cursor.execute("SELECT id FROM users WHERE firebase_uid = ?", current_user["uid"])
-        user_row = cursor.fetchone()
-        if not user_row:
+        user_id = await user_resolver.resolve(conn, current_user["uid"])
+        if user_id is None:
             raise HTTPException(status_code=404, detail="User not found")
-        user_id = user_row.id
         
-        # Get quiz details
-        cursor.execute("SELECT * FROM quizzes WHERE id = ?", request.quiz_id)
-        quiz = cursor.fetchone()
-        if not quiz:
+        # Get quiz details and answer key
+        compiled = await quiz_cache.get(conn, request.quiz_id)
+        if compiled is None:
             raise HTTPException(status_code=404, detail="Quiz not found")
+        quiz = compiled.quiz
         
-        # Check attempts
-        cursor.execute(
-            "SELECT COUNT(*) as attempts FROM user_quiz_attempts WHERE user_id = ? AND quiz_id = ?",
-            user_id, request.quiz_id
-        )
-        attempts = cursor.fetchone().attempts
+        # Grade in memory against the cached answer key
+        answer_key = compiled.answer_key
+        extra_points, extra_correct = await resolve_foreign_ids(conn, answer_key, request.answers)
+        result = grade(request.answers, answer_key, extra_points, extra_correct)
         
-        if attempts >= quiz.attempts_allowed:
+        score_percentage = result.score_percentage
+        correct_answers = result.correct_answers
+        is_passed = score_percentage >= quiz.passing_score_percentage
+        
+        # Check attempts and number this one against the user's summary row, in this transaction
+        attempt_number = await record_attempt(
+            conn, user_id, request.quiz_id, quiz.attempts_allowed, score_percentage, is_passed
+        )
+        if attempt_number is None:
             raise HTTPException(status_code=400, detail="Maximum attempts reached")
         
-        # Create new attempt
-        cursor.execute("""
+        # Create the attempt with its final results, then save all answers in one batch
+        attempt_id = (await conn.fetchone("""
             INSERT INTO user_quiz_attempts 
-            (user_id, quiz_id, attempt_number, total_questions, time_taken_seconds)
+            (user_id, quiz_id, attempt_number, total_questions, time_taken_seconds,
+             score_percentage, correct_answers, completed_at, is_passed)
             OUTPUT INSERTED.id
-            VALUES (?, ?, ?, ?, ?)
-        """, user_id, request.quiz_id, attempts + 1, quiz.total_questions, request.time_taken_seconds)
-        
-        attempt_id = cursor.fetchone().id
-        
-        # Process answers
-        correct_answers = 0
-        total_points = 0
-        earned_points = 0
+            VALUES (?, ?, ?, ?, ?, ?, ?, GETDATE(), ?)
+        """, user_id, request.quiz_id, attempt_number, quiz.total_questions, request.time_taken_seconds,
+            score_percentage, correct_answers, is_passed)).id
         
-        for answer in request.answers:
-            question_id = answer["question_id"]
-            selected_option_id = answer.get("selected_option_id")
-            answer_text = answer.get("answer_text")
-            
-            # Get question details
-            cursor.execute("SELECT * FROM quiz_questions WHERE id = ?", question_id)
-            question = cursor.fetchone()
-            if not question:
-                continue
-            
-            total_points += question.points
-            is_correct = False
-            points_earned = 0
-            
-            # Check if answer is correct
-            if selected_option_id:
-                cursor.execute(
-                    "SELECT is_correct FROM quiz_answer_options WHERE id = ?",
-                    selected_option_id
-                )
-                option = cursor.fetchone()
-                if option and option.is_correct:
-                    is_correct = True
-                    correct_answers += 1
-                    points_earned = question.points
-                    earned_points += points_earned
-            
-            # Save user answer
-            cursor.execute("""
-                INSERT INTO user_quiz_answers 
-                (attempt_id, question_id, selected_option_id, answer_text, is_correct, points_earned)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, attempt_id, question_id, selected_option_id, answer_text, is_correct, points_earned)
+        await save_answers(conn, attempt_id, result)
         
-        # Calculate final score
-        score_percentage = (earned_points / total_points * 100) if total_points > 0 else 0
-        is_passed = score_percentage >= quiz.passing_score_percentage
-        
-        # Update attempt with final results
-        cursor.execute("""
-            UPDATE user_quiz_attempts 
-            SET score_percentage = ?, correct_answers = ?, completed_at = GETDATE(), is_passed = ?
-            WHERE id = ?
-        """, score_percentage, correct_answers, is_passed, attempt_id)
-        
-        conn.commit()
+        await conn.commit()
+        versions.bump_user(user_id, "quizzes")
         
         return {
             "attempt_id": attempt_id,
@@ -989,91 +1278,168 @@ async def submit_quiz(
             "is_passed": is_passed,
             "passing_score": quiz.passing_score_percentage
         }
+    except HTTPException:
+        # Keep 400/404 (e.g. no attempts left) instead of reporting a generic failure
+        await conn.rollback()
+        raise
     except Exception as e:
-        conn.rollback()
+        await conn.rollback()
         logger.error(f"Quiz submission failed: {e}")
         raise HTTPException(status_code=500, detail="Quiz submission failed")
-    finally:
-        conn.close()
 
 @app.get("/user/enrollments", response_model=List[CourseResponse])
-async def get_user_enrollments(current_user: dict = Depends(verify_firebase_token)):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
+async def get_user_enrollments(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Page size"),
+    cursor: Optional[str] = Query(None, description="Continuation token from X-Next-Cursor"),
+    fields: Optional[str] = Query(None, description="Comma separated course fields to return"),
+    stream: Optional[str] = Query(None, description="ndjson or json: stream every enrollment after cursor instead of one page"),
+    current_user: dict = Depends(verify_firebase_token),
+    conn: AsyncConnection = Depends(get_user_read_db)
+):
     try:
-        cursor.execute("SELECT id FROM users WHERE firebase_uid = ?", current_user["uid"])
-        user_row = cursor.fetchone()
-        if not user_row:
-            raise HTTPException(status_code=404, detail="User not found")
-        user_id = user_row.id
-        
-        cursor.execute("""
-            SELECT c.*, cat.name as category_name, ue.progress_percentage, ue.enrolled_at
-            FROM user_enrollments ue
-            JOIN courses c ON ue.course_id = c.id
-            LEFT JOIN categories cat ON c.category_id = cat.id
-            WHERE ue.user_id = ? AND ue.is_active = 1 AND c.is_active = 1
-            ORDER BY ue.enrolled_at DESC
-        """, user_id)
-        
-        rows = cursor.fetchall()
-        
-        return [CourseResponse(
-            id=row.id,
-            title=row.title,
-            description=row.description,
-            thumbnail_url=row.thumbnail_url,
-            category_id=row.category_id,
-            category_name=row.category_name,
-            instructor_name=row.instructor_name,
-            duration_minutes=row.duration_minutes,
-            level=row.level,
-            price=float(row.price) if row.price else 0.0,
-            is_free=bool(row.is_free),
-            rating=float(row.rating) if row.rating else 0.0,
-            total_ratings=row.total_ratings,
-            total_enrollments=row.total_enrollments,
-            is_enrolled=True,
-            progress_percentage=float(row.progress_percentage),
-            course_url=row.course_url
-        ) for row in rows]
-    finally:
-        conn.close()
+        selected = parse_fields(fields, COURSE_COLUMNS)
+        after = decode_cursor(ENROLLMENT_ORDER, cursor, query_scope("enrollments")) if cursor else None
+        fmt = stream_format(stream, request.headers.get("accept", ""))
+    except (ValueError, InvalidCursor) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    user_id = await user_resolver.resolve(conn, current_user["uid"])
+    if user_id is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    # A streamed response has no page size; it carries everything after the cursor
+    query = f"""
+        SELECT {"" if fmt else "TOP (?) "}{course_select(selected or list(COURSE_COLUMNS))}, {ENROLLMENT_ORDER.select_list()}
+        FROM user_enrollments ue
+        JOIN courses c ON ue.course_id = c.id
+        LEFT JOIN categories cat ON c.category_id = cat.id
+        WHERE ue.user_id = ? AND ue.is_active = 1 AND c.is_active = 1
+    """
+    params = [user_id] if fmt else [limit + 1, user_id]
+    
+    if after is not None:
+        seek_sql, seek_params = ENROLLMENT_ORDER.seek(after)
+        query += f" AND {seek_sql}"
+        params.extend(seek_params)
+    
+    query += f" ORDER BY {ENROLLMENT_ORDER.order_by()}"
+    
+    if fmt:
+        return streamed_rows(conn, fmt, COURSE_MAPPER, query, params, selected)
+    
+    rows = await conn.fetchall(query, *params)
+    rows, next_cursor = trim_page(rows, limit, ENROLLMENT_ORDER, query_scope("enrollments"))
+    
+    return course_page(response, rows, selected, next_cursor)
+
+USER_QUIZ_ATTEMPTS_QUERY = """
+    SELECT * FROM user_quiz_attempts 
+    WHERE user_id = ? AND quiz_id = ?
+    ORDER BY attempt_number DESC
+"""
 
 @app.get("/user/quiz-attempts/{quiz_id}")
-async def get_user_quiz_attempts(quiz_id: int, current_user: dict = Depends(verify_firebase_token)):
-    conn = get_db_connection()
-    cursor = conn.cursor()
+async def get_user_quiz_attempts(
+    quiz_id: int,
+    request: Request,
+    response: Response,
+    stream: Optional[str] = Query(None, description="ndjson or json: stream the attempts as they are read"),
+    current_user: dict = Depends(verify_firebase_token),
+    conn: AsyncConnection = Depends(get_user_read_db)
+):
+    try:
+        fmt = stream_format(stream, request.headers.get("accept", ""))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    user_id = await user_resolver.resolve(conn, current_user["uid"])
+    if user_id is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    if fmt:
+        return streamed_rows(conn, fmt, ATTEMPT_MAPPER, USER_QUIZ_ATTEMPTS_QUERY, [user_id, quiz_id])
     
+    rows = await conn.fetchall(USER_QUIZ_ATTEMPTS_QUERY, user_id, quiz_id)
+    
+    return json_response(response, ATTEMPT_MAPPER.many(rows))
+
+# Admin endpoints
+async def refresh_catalog(quiz_id: Optional[int] = None):
+    """Make catalog changes visible now instead of after cache TTLs; the importer indexes new courses for search"""
+    catalog_cache.invalidate()
+    quiz_cache.invalidate(quiz_id)
+
+@app.post("/admin/catalog/refresh")
+async def refresh_catalog_caches(
+    quiz_id: Optional[int] = Query(None, description="Only recompile this quiz; all quizzes by default"),
+    admin: dict = Depends(require_admin)
+):
+    """Drop cached catalog lists and compiled quizzes after editing them straight in the database"""
+    await refresh_catalog(quiz_id)
+    return {"message": "Catalog caches refreshed"}
+
+@app.post("/admin/catalog/import")
+async def import_catalog(
+    request: Request,
+    import_id: str = Query(..., min_length=1, max_length=100, description="Re-send the same file with the same id to resume"),
+    format: str = Query("jsonl", description="jsonl (one course with lessons and quizzes per line) or csv (courses only)"),
+    admin: dict = Depends(require_admin)
+):
+    """Stream courses from the request body into the catalog in chunked transactions.
+
+    Progress is at /admin/catalog/imports/{import_id} while this runs.
+    """
+    if format not in CATALOG_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(CATALOG_FORMATS)}")
+
     try:
-        cursor.execute("SELECT id FROM users WHERE firebase_uid = ?", current_user["uid"])
-        user_row = cursor.fetchone()
-        if not user_row:
-            raise HTTPException(status_code=404, detail="User not found")
-        user_id = user_row.id
-        
-        cursor.execute("""
-            SELECT * FROM user_quiz_attempts 
-            WHERE user_id = ? AND quiz_id = ?
-            ORDER BY attempt_number DESC
-        """, user_id, quiz_id)
-        
-        rows = cursor.fetchall()
-        
-        return [{
-            "id": row.id,
-            "attempt_number": row.attempt_number,
-            "score_percentage": float(row.score_percentage) if row.score_percentage else 0,
-            "correct_answers": row.correct_answers,
-            "total_questions": row.total_questions,
-            "time_taken_seconds": row.time_taken_seconds,
-            "started_at": row.started_at.isoformat() if row.started_at else None,
-            "completed_at": row.completed_at.isoformat() if row.completed_at else None,
-            "is_passed": bool(row.is_passed)
-        } for row in rows]
-    finally:
-        conn.close()
+        job = await catalog_importer.run(import_id, format, request.stream())
+    except ImportInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except PoolTimeout as e:
+        logger.error(f"Database pool exhausted: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database is busy, please retry",
+            headers={"Retry-After": "1"}
+        )
+    except Exception as e:
+        logger.error(f"Catalog import {import_id} failed: {e}")
+        # Chunks committed before the failure stay imported
+        progress = await catalog_importer.status(import_id)
+        if progress and progress["inserted"].get("courses"):
+            await refresh_catalog()
+        raise HTTPException(
+            status_code=500,
+            detail=f"Import failed, re-send the file with the same import_id to resume: {e}"
+        )
+
+    if job.inserted["courses"]:
+        await refresh_catalog()
+    return job.progress()
+
+@app.get("/admin/catalog/imports/{import_id}")
+async def get_catalog_import(import_id: str, admin: dict = Depends(require_admin)):
+    progress = await catalog_importer.status(import_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return progress
+
+@app.get("/admin/catalog/export")
+async def export_catalog_file(
+    format: str = Query("jsonl", description="jsonl (courses with lessons and quizzes) or csv (courses only)"),
+    admin: dict = Depends(require_admin)
+):
+    if format not in CATALOG_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(CATALOG_FORMATS)}")
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        export_catalog(db, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="catalog.{format}"'}
+    )
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,237 @@
+import os
+import time
+import threading
+import contextvars
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34)
+ROW_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, 5000, 10000)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: Any, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = list(self._values.items())
+        lines.extend(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}" for labels, value in values)
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram; one series per label combination"""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple, list] = {}  # labels -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: Any):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(labels, list(series)) for labels, series in self._series.items()]
+        for labels, series in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(series[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Metrics plus stats() callbacks of other subsystems, rendered in Prometheus text format"""
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self._metrics: list = []
+        self._collectors: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(f"{self.prefix}_{name}", help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(f"{self.prefix}_{name}", help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, subsystem: str, stats: Callable[[], Dict[str, Any]]):
+        self._collectors[subsystem] = stats
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+
+        name = f"{self.prefix}_subsystem_stat"
+        lines.append(f"# HELP {name} Numeric values from each subsystem's stats(), as in /health")
+        lines.append(f"# TYPE {name} untyped")
+        for subsystem, stats in self._collectors.items():
+            for stat, value in stats().items():
+                # Only plain numbers; nested dicts and strings stay in /health
+                if isinstance(value, bool):
+                    value = int(value)
+                if isinstance(value, (int, float)):
+                    lines.append(f"{name}{_labels(('subsystem', 'stat'), (subsystem, stat))} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class RequestStats:
+    """Database work done on behalf of one HTTP request"""
+
+    __slots__ = ("queries", "db_seconds", "rows", "acquire_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.rows = 0
+        self.acquire_seconds = 0.0
+
+
+registry = Registry("learn_app")
+
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route", "status")
+)
+request_db_queries = registry.histogram(
+    "request_db_queries", "Statements sent to the database per request", ("route",), COUNT_BUCKETS
+)
+request_db_seconds = registry.histogram(
+    "request_db_seconds", "Time per request spent waiting on database calls", ("route",), QUERY_BUCKETS
+)
+request_db_rows = registry.histogram(
+    "request_db_rows", "Rows fetched from the database per request", ("route",), ROW_BUCKETS
+)
+db_query_duration = registry.histogram(
+    "db_query_duration_seconds", "Duration of each database call, including background work",
+    ("operation",), QUERY_BUCKETS
+)
+db_query_errors = registry.counter("db_query_errors_total", "Database calls that raised", ("operation",))
+db_rows_fetched = registry.counter("db_rows_fetched_total", "Rows fetched from the database")
+db_acquire_duration = registry.histogram(
+    "db_acquire_seconds", "Time to check a connection out of the pool", buckets=QUERY_BUCKETS
+)
+
+_current: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("request_stats", default=None)
+
+# commit/rollback and fetchmany batches count towards DB time but aren't statements
+STATEMENT_OPERATIONS = frozenset(("fetchone", "fetchall", "execute", "executemany", "run", "iterate"))
+
+
+def record_query(operation: str, seconds: float, rows: int = 0, failed: bool = False):
+    db_query_duration.observe(seconds, operation)
+    if failed:
+        db_query_errors.inc(operation)
+    if rows:
+        db_rows_fetched.inc(amount=rows)
+    stats = _current.get()
+    if stats is not None:
+        if operation in STATEMENT_OPERATIONS:
+            stats.queries += 1
+        stats.db_seconds += seconds
+        stats.rows += rows
+
+
+def record_acquire(seconds: float):
+    db_acquire_duration.observe(seconds)
+    stats = _current.get()
+    if stats is not None:
+        stats.acquire_seconds += seconds
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every request and collecting its database work.
+
+    Histograms are labelled with the route template (``/courses/{course_id}``),
+    never the raw path, so series stay bounded. With ``server_timing`` the
+    response also carries a Server-Timing header splitting DB from app time.
+    """
+
+    def __init__(self, app, server_timing: bool = True):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.server_timing:
+                    elapsed_ms = (time.perf_counter() - started) * 1000
+                    value = (
+                        f'db;dur={stats.db_seconds * 1000:.2f};desc="{stats.queries} queries", '
+                        f"acquire;dur={stats.acquire_seconds * 1000:.2f}, "
+                        f"app;dur={elapsed_ms - stats.db_seconds * 1000:.2f}"
+                    )
+                    message["headers"] = list(message.get("headers", [])) + [(b"server-timing", value.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            http_request_duration.observe(time.perf_counter() - started, scope["method"], route, status_code)
+            request_db_queries.observe(stats.queries, route)
+            request_db_seconds.observe(stats.db_seconds, route)
+            request_db_rows.observe(stats.rows, route)
+
+
+metrics_enabled = os.getenv("METRICS_ENABLED", "1") == "1"
@@ -0,0 +1,113 @@
+import json
+import base64
+import hashlib
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    """Raised when a continuation token is malformed or belongs to a different query"""
+
+
+class KeysetOrder:
+    """A descending sort over ``(expression, kind)`` keys, ending in a unique key.
+
+    ``kind`` is one of ``int``, ``float``, ``decimal`` or ``datetime`` and is
+    used to round-trip the last row's key values through the cursor token.
+    """
+
+    def __init__(self, keys: Sequence[Tuple[str, str]]):
+        self.keys = list(keys)
+
+    def order_by(self) -> str:
+        return ", ".join(f"{expr} DESC" for expr, _ in self.keys)
+
+    def select_list(self) -> str:
+        return ", ".join(f"{expr} AS sort_key_{i}" for i, (expr, _) in enumerate(self.keys))
+
+    def seek(self, values: Sequence[Any]) -> Tuple[str, List[Any]]:
+        """Predicate selecting the rows that sort strictly after ``values``"""
+        clauses, params = [], []
+        for i, (expr, _) in enumerate(self.keys):
+            equal = [f"{self.keys[j][0]} = ?" for j in range(i)]
+            clauses.append("(" + " AND ".join(equal + [f"{expr} < ?"]) + ")")
+            params.extend(values[:i])
+            params.append(values[i])
+        return "(" + " OR ".join(clauses) + ")", params
+
+    def key_of(self, row) -> List[Any]:
+        return [getattr(row, f"sort_key_{i}") for i in range(len(self.keys))]
+
+    def encode(self, values: Sequence[Any]) -> List[Any]:
+        encoded = []
+        for (_, kind), value in zip(self.keys, values):
+            if kind == "datetime":
+                encoded.append(value.isoformat())
+            elif kind == "decimal":
+                encoded.append(str(value))
+            else:
+                encoded.append(value)
+        return encoded
+
+    def decode(self, values: Sequence[Any]) -> List[Any]:
+        if len(values) != len(self.keys):
+            raise InvalidCursor("Cursor does not match sort order")
+        try:
+            decoded = []
+            for (_, kind), value in zip(self.keys, values):
+                if kind == "datetime":
+                    decoded.append(datetime.fromisoformat(value))
+                elif kind == "decimal":
+                    decoded.append(Decimal(value))
+                elif kind == "float":
+                    decoded.append(float(value))
+                else:
+                    decoded.append(int(value))
+            return decoded
+        except (TypeError, ValueError, ArithmeticError):
+            raise InvalidCursor("Malformed cursor")
+
+
+def query_scope(*parts: Any) -> str:
+    """Fingerprint of the sort and filters a cursor was issued for"""
+    return hashlib.sha256(json.dumps(parts, default=str).encode()).hexdigest()[:16]
+
+
+def encode_cursor(order: KeysetOrder, values: Sequence[Any], scope: str) -> str:
+    payload = json.dumps({"q": scope, "k": order.encode(values)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).rstrip(b"=").decode()
+
+
+def decode_cursor(order: KeysetOrder, token: str, scope: str) -> List[Any]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except ValueError:
+        raise InvalidCursor("Malformed cursor")
+    if not isinstance(payload, dict) or payload.get("q") != scope:
+        raise InvalidCursor("Cursor was issued for a different query")
+    return order.decode(payload.get("k") or [])
+
+
+def trim_page(rows: list, limit: int, order: KeysetOrder, scope: str) -> Tuple[list, Optional[str]]:
+    """Drop the look-ahead row fetched with ``TOP (limit + 1)`` and cursor past the page"""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(order, order.key_of(rows[-1]), scope)
+
+
+def parse_fields(fields: Optional[str], allowed: Iterable[str]) -> Optional[List[str]]:
+    """Validate a comma separated sparse fieldset; ``id`` is always included"""
+    if not fields:
+        return None
+    allowed = list(allowed)
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    # Keep the model's field order so responses are stable
+    return [f for f in allowed if f == "id" or f in requested]
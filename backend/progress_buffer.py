@@ -0,0 +1,275 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import pyodbc
+
+from database import db, AsyncConnection
+from progress_counters import apply_completion_changes
+from versions import versions
+
+logger = logging.getLogger(__name__)
+
+# SQL Server allows 2100 parameters per statement; each buffered row uses 5
+MERGE_CHUNK_ROWS = 400
+
+# Upserts one chunk and reports every is_completed transition it caused.
+# completed_at/last_watched_at are backdated by how long the heartbeat sat in the buffer.
+MERGE_PROGRESS = """
+    SET NOCOUNT ON;
+    DECLARE @changes TABLE (user_id INT, lesson_id INT, delta INT);
+    MERGE user_lesson_progress AS target
+    USING (VALUES {values}) AS source (user_id, lesson_id, watched_duration_seconds, is_completed, age_ms)
+    ON target.user_id = source.user_id AND target.lesson_id = source.lesson_id
+    WHEN MATCHED THEN
+        UPDATE SET watched_duration_seconds = source.watched_duration_seconds,
+                  is_completed = source.is_completed,
+                  completed_at = CASE WHEN source.is_completed = 1
+                                      THEN DATEADD(MILLISECOND, -source.age_ms, GETDATE()) ELSE NULL END,
+                  last_watched_at = DATEADD(MILLISECOND, -source.age_ms, GETDATE())
+    WHEN NOT MATCHED THEN
+        INSERT (user_id, lesson_id, watched_duration_seconds, is_completed, completed_at, last_watched_at)
+        VALUES (source.user_id, source.lesson_id, source.watched_duration_seconds,
+               source.is_completed,
+               CASE WHEN source.is_completed = 1 THEN DATEADD(MILLISECOND, -source.age_ms, GETDATE()) ELSE NULL END,
+               DATEADD(MILLISECOND, -source.age_ms, GETDATE()))
+    OUTPUT inserted.user_id, inserted.lesson_id,
+           CAST(inserted.is_completed AS INT) - ISNULL(CAST(deleted.is_completed AS INT), 0)
+    INTO @changes;
+    SELECT user_id, lesson_id, delta FROM @changes WHERE delta <> 0;
+"""
+MERGE_VALUES_ROW = "(CAST(? AS INT), CAST(? AS INT), CAST(? AS INT), CAST(? AS BIT), CAST(? AS INT))"
+
+
+class ProgressUpdate:
+    __slots__ = ("watched_duration_seconds", "is_completed", "seen_at", "sticky_key")
+
+    def __init__(self, watched_duration_seconds: int, is_completed: bool, seen_at: float,
+                 sticky_key: Optional[str] = None):
+        self.watched_duration_seconds = watched_duration_seconds
+        self.is_completed = is_completed
+        self.seen_at = seen_at
+        self.sticky_key = sticky_key
+
+
+class ProgressBuffer:
+    """Write-behind buffer for lesson progress heartbeats.
+
+    Heartbeats are coalesced per (user, lesson), keeping only the latest one,
+    and written in batches every ``flush_interval`` seconds. A completion is
+    flushed by the request that reports it, for that one lesson only. Updates
+    that are buffered or being written are visible through ``pending_for``
+    until they're committed, and their writers read from the primary for the
+    read-your-writes window after that. A lesson is never in two writes at
+    once, so an older update can't land after a newer one.
+    """
+
+    def __init__(self, database, flush_interval: float = 5.0, max_pending: int = 20000,
+                 clock=time.monotonic):
+        self._database = database
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._clock = clock
+        # user_id -> lesson_id -> latest update, so one user's entries are found without a scan
+        self._pending: Dict[int, Dict[int, ProgressUpdate]] = {}
+        self._flushing: Dict[int, Dict[int, ProgressUpdate]] = {}
+        self._size = 0
+        self._lock = asyncio.Lock()
+        self._landed = asyncio.Condition()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._recorded = 0
+        self._coalesced = 0
+        self._flushes = 0
+        self._flushed_rows = 0
+        self._failures = 0
+        self._rejected = 0
+
+    def record(self, user_id: int, lesson_id: int, watched_duration_seconds: int, is_completed: bool,
+               sticky_key: Optional[str] = None):
+        """Buffer one heartbeat; ``sticky_key`` is the writer's key for ``Database.note_write``"""
+        lessons = self._pending.setdefault(user_id, {})
+        if lesson_id in lessons:
+            self._coalesced += 1
+        else:
+            self._size += 1
+        lessons[lesson_id] = ProgressUpdate(watched_duration_seconds, is_completed, self._clock(), sticky_key)
+        self._recorded += 1
+        if self._size >= self.max_pending:
+            self._wakeup.set()
+
+    def pending_for(self, user_id: int) -> Dict[int, ProgressUpdate]:
+        """lesson_id -> latest not-yet-committed update for one user"""
+        updates = dict(self._flushing.get(user_id, {}))
+        updates.update(self._pending.get(user_id, {}))
+        return updates
+
+    async def flush(self, conn: Optional[AsyncConnection] = None) -> int:
+        """Write everything buffered so far, on ``conn`` or a connection of our own.
+
+        Lessons already being written by a ``flush_lesson`` stay buffered for the next round.
+        """
+        async with self._lock:
+            batch = self._take(None)
+            if not batch:
+                return 0
+            await self._write_taken(conn, batch)
+            return len(batch)
+
+    async def flush_lesson(self, conn: AsyncConnection, user_id: int, lesson_id: int) -> int:
+        """Write one user's buffered update for one lesson on ``conn``"""
+        async with self._landed:
+            # Wait out a periodic flush that is writing an older update for this lesson
+            await self._landed.wait_for(lambda: lesson_id not in self._flushing.get(user_id, {}))
+            batch = self._take((user_id, lesson_id))
+        if not batch:
+            return 0
+        await self._write_taken(conn, batch)
+        return 1
+
+    def _take(self, key: Optional[Tuple[int, int]]) -> Dict[Tuple[int, int], ProgressUpdate]:
+        """Move ``key`` (or everything not already being written) from pending to flushing"""
+        if key is not None:
+            user_id, lesson_id = key
+            update = self._pending.get(user_id, {}).pop(lesson_id, None)
+            taken = {key: update} if update is not None else {}
+            if not self._pending.get(user_id, True):
+                del self._pending[user_id]
+        else:
+            taken, kept = {}, {}
+            for user_id, lessons in self._pending.items():
+                flushing = self._flushing.get(user_id, {})
+                for lesson_id, update in lessons.items():
+                    if lesson_id in flushing:
+                        kept.setdefault(user_id, {})[lesson_id] = update
+                    else:
+                        taken[(user_id, lesson_id)] = update
+            self._pending = kept
+        for (user_id, lesson_id), update in taken.items():
+            self._flushing.setdefault(user_id, {})[lesson_id] = update
+        self._size -= len(taken)
+        return taken
+
+    async def _write_taken(self, conn: Optional[AsyncConnection], batch: Dict[Tuple[int, int], ProgressUpdate]):
+        failed = True
+        try:
+            if conn is not None:
+                await self._write_batch(conn, batch)
+            else:
+                own = await self._database.acquire()
+                try:
+                    await self._write_batch(own, batch)
+                finally:
+                    await own.release()
+            failed = False
+        except BaseException:
+            self._failures += 1
+            raise
+        finally:
+            for (user_id, lesson_id), update in batch.items():
+                lessons = self._flushing[user_id]
+                del lessons[lesson_id]
+                if not lessons:
+                    del self._flushing[user_id]
+                # Newer heartbeats that arrived meanwhile win over the failed batch
+                if failed and lesson_id not in self._pending.get(user_id, {}):
+                    self._pending.setdefault(user_id, {})[lesson_id] = update
+                    self._size += 1
+            async with self._landed:
+                self._landed.notify_all()
+        # The update left the buffer, so pending_for no longer covers a replica that hasn't caught up
+        for sticky_key in {update.sticky_key for update in batch.values()}:
+            self._database.note_write(sticky_key)
+        self._flushes += 1
+        self._flushed_rows += len(batch)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush loop and drain whatever is still buffered"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            flushed = await self.flush()
+            logger.info(f"Progress buffer drained: {flushed} updates")
+        except Exception as e:
+            logger.error(f"Failed to drain progress buffer, {self._size} updates lost: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": self._size,
+            "recorded": self._recorded,
+            "coalesced": self._coalesced,
+            "flushes": self._flushes,
+            "flushed_rows": self._flushed_rows,
+            "failures": self._failures,
+            "rejected": self._rejected,
+        }
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Progress flush failed, will retry: {e}")
+
+    async def _write_batch(self, conn: AsyncConnection, batch: Dict[Tuple[int, int], ProgressUpdate]):
+        try:
+            await self._write(conn, batch)
+            return
+        except (pyodbc.IntegrityError, pyodbc.DataError) as e:
+            logger.warning(f"Progress batch rejected, writing {len(batch)} updates one by one: {e}")
+
+        # One bad heartbeat (e.g. an unknown lesson) must not hold back everybody else's
+        for key, update in batch.items():
+            try:
+                await self._write(conn, {key: update})
+            except (pyodbc.IntegrityError, pyodbc.DataError) as e:
+                self._rejected += 1
+                logger.error(f"Dropping progress update for user {key[0]} lesson {key[1]}: {e}")
+
+    async def _write(self, conn: AsyncConnection, batch: Dict[Tuple[int, int], ProgressUpdate]):
+        now = self._clock()
+        rows: List[tuple] = [
+            (user_id, lesson_id, update.watched_duration_seconds, update.is_completed,
+             max(0, int((now - update.seen_at) * 1000)))
+            for (user_id, lesson_id), update in batch.items()
+        ]
+        try:
+            changes = []
+            for i in range(0, len(rows), MERGE_CHUNK_ROWS):
+                chunk = rows[i:i + MERGE_CHUNK_ROWS]
+                sql = MERGE_PROGRESS.format(values=", ".join(MERGE_VALUES_ROW for _ in chunk))
+                changes.extend(await conn.fetchall(sql, *[value for row in chunk for value in row]))
+            # Course progress only moves when a lesson's completion state actually flipped
+            await apply_completion_changes(conn, ((c.user_id, c.lesson_id, c.delta) for c in changes))
+            await conn.commit()
+        except Exception:
+            await conn.rollback()
+            raise
+        # Course progress of these users just changed under their cached ETags
+        for user_id in {change.user_id for change in changes}:
+            versions.bump_user(user_id, "courses")
+
+
+progress_buffer = ProgressBuffer(
+    db,
+    flush_interval=float(os.getenv("PROGRESS_FLUSH_INTERVAL", "5")),
+    max_pending=int(os.getenv("PROGRESS_MAX_PENDING", "20000")),
+)
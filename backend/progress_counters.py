@@ -0,0 +1,230 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from database import AsyncConnection
+from versions import versions
+
+logger = logging.getLogger(__name__)
+
+# Completed active lessons per enrollment, kept next to progress_percentage
+ENSURE_COMPLETED_LESSONS_COLUMN = """
+    IF COL_LENGTH('user_enrollments', 'completed_lessons') IS NULL
+        ALTER TABLE user_enrollments ADD completed_lessons INT NOT NULL
+            CONSTRAINT DF_user_enrollments_completed_lessons DEFAULT 0
+"""
+
+APPLY_COMPLETION_DELTA = """
+    UPDATE user_enrollments
+    SET completed_lessons = completed_lessons + ?,
+        progress_percentage = CASE
+            WHEN ? > 0 THEN CAST(completed_lessons + ? AS FLOAT) / ? * 100
+            ELSE progress_percentage
+        END
+    WHERE user_id = ? AND course_id = ?
+"""
+
+# Recount every enrollment from user_lesson_progress and fix the ones that drifted
+RECONCILE_PROGRESS = """
+    UPDATE ue
+    SET completed_lessons = ISNULL(done.completed, 0),
+        progress_percentage = CASE
+            WHEN totals.lessons > 0 THEN CAST(ISNULL(done.completed, 0) AS FLOAT) / totals.lessons * 100
+            ELSE ue.progress_percentage
+        END
+    FROM user_enrollments ue
+    LEFT JOIN (
+        SELECT course_id, COUNT(*) AS lessons
+        FROM course_lessons
+        WHERE is_active = 1
+        GROUP BY course_id
+    ) totals ON totals.course_id = ue.course_id
+    LEFT JOIN (
+        SELECT ulp.user_id, cl.course_id, COUNT(*) AS completed
+        FROM user_lesson_progress ulp
+        JOIN course_lessons cl ON cl.id = ulp.lesson_id AND cl.is_active = 1
+        WHERE ulp.is_completed = 1
+        GROUP BY ulp.user_id, cl.course_id
+    ) done ON done.user_id = ue.user_id AND done.course_id = ue.course_id
+    WHERE ue.completed_lessons <> ISNULL(done.completed, 0)
+       OR (totals.lessons > 0 AND ABS(ISNULL(ue.progress_percentage, 0)
+           - CAST(ISNULL(done.completed, 0) AS FLOAT) / totals.lessons * 100) > 0.001)
+"""
+
+
+class LessonCounts:
+    """Cached lesson -> course mapping and active lesson count per course.
+
+    Lessons are only edited outside the API (or by the catalog import, which
+    invalidates the courses it wrote), so entries expire after ``ttl`` seconds;
+    ``invalidate`` drops them immediately after a known change.
+    """
+
+    def __init__(self, ttl: float = 600.0, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._lessons: Dict[int, Tuple[int, bool, float]] = {}  # lesson_id -> (course_id, is_active, expires_at)
+        self._courses: Dict[int, Tuple[int, float]] = {}  # course_id -> (active lessons, expires_at)
+        self._hits = 0
+        self._misses = 0
+
+    async def lessons(self, conn: AsyncConnection, lesson_ids: Iterable[int]) -> Dict[int, Tuple[int, bool]]:
+        """lesson_id -> (course_id, is_active); unknown lessons are left out"""
+        now = self._clock()
+        found, missing = {}, []
+        for lesson_id in set(lesson_ids):
+            entry = self._lessons.get(lesson_id)
+            if entry is not None and now < entry[2]:
+                found[lesson_id] = entry[:2]
+            else:
+                missing.append(lesson_id)
+        self._hits += len(found)
+        self._misses += len(missing)
+
+        if missing:
+            rows = await conn.fetchall(
+                f"SELECT id, course_id, is_active FROM course_lessons "
+                f"WHERE id IN ({', '.join('?' for _ in missing)})",
+                *missing
+            )
+            expires_at = now + self.ttl
+            for row in rows:
+                found[row.id] = (row.course_id, bool(row.is_active))
+                self._lessons[row.id] = (row.course_id, bool(row.is_active), expires_at)
+        return found
+
+    async def active_counts(self, conn: AsyncConnection, course_ids: Iterable[int]) -> Dict[int, int]:
+        now = self._clock()
+        counts, missing = {}, []
+        for course_id in set(course_ids):
+            entry = self._courses.get(course_id)
+            if entry is not None and now < entry[1]:
+                counts[course_id] = entry[0]
+            else:
+                missing.append(course_id)
+        self._hits += len(counts)
+        self._misses += len(missing)
+
+        if missing:
+            rows = await conn.fetchall(
+                f"SELECT course_id, COUNT(*) AS lessons FROM course_lessons "
+                f"WHERE is_active = 1 AND course_id IN ({', '.join('?' for _ in missing)}) "
+                f"GROUP BY course_id",
+                *missing
+            )
+            loaded = {row.course_id: row.lessons for row in rows}
+            expires_at = now + self.ttl
+            for course_id in missing:
+                counts[course_id] = loaded.get(course_id, 0)
+                self._courses[course_id] = (counts[course_id], expires_at)
+        return counts
+
+    def invalidate(self, course_id: Optional[int] = None):
+        """Forget one course's lessons (or every course's) after they change"""
+        if course_id is None:
+            self._lessons.clear()
+            self._courses.clear()
+            return
+        self.invalidate_courses([course_id])
+
+    def invalidate_courses(self, course_ids: Iterable[int]):
+        """Forget the lessons of several courses in one pass, e.g. after an import added lessons"""
+        course_ids = set(course_ids)
+        if not course_ids:
+            return
+        for course_id in course_ids:
+            self._courses.pop(course_id, None)
+        for lesson_id in [l for l, entry in self._lessons.items() if entry[0] in course_ids]:
+            del self._lessons[lesson_id]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._hits + self._misses
+        return {
+            "lessons": len(self._lessons),
+            "courses": len(self._courses),
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+async def apply_completion_changes(conn: AsyncConnection, changes: Iterable[Tuple[int, int, int]]) -> int:
+    """Adjust enrollment counters for ``(user_id, lesson_id, delta)`` completion transitions.
+
+    Runs inside the caller's transaction; only active lessons count, as they
+    always have for progress_percentage.
+    """
+    changes = list(changes)
+    if not changes:
+        return 0
+
+    lessons = await lesson_counts.lessons(conn, (lesson_id for _, lesson_id, _ in changes))
+    deltas: Dict[Tuple[int, int], int] = {}
+    for user_id, lesson_id, delta in changes:
+        lesson = lessons.get(lesson_id)
+        if lesson is None or not lesson[1]:
+            continue
+        key = (user_id, lesson[0])
+        deltas[key] = deltas.get(key, 0) + delta
+
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return 0
+
+    totals = await lesson_counts.active_counts(conn, (course_id for _, course_id in deltas))
+    await conn.executemany(APPLY_COMPLETION_DELTA, [
+        (delta, totals[course_id], delta, totals[course_id], user_id, course_id)
+        for (user_id, course_id), delta in deltas.items()
+    ])
+    return len(deltas)
+
+
+async def ensure_progress_schema(database):
+    """Add the completed_lessons counter column on first start"""
+    conn = await database.acquire()
+    try:
+        await conn.execute(ENSURE_COMPLETED_LESSONS_COLUMN)
+        await conn.commit()
+    finally:
+        await conn.release()
+
+
+async def reconcile_progress(conn: AsyncConnection) -> int:
+    """Repair every enrollment whose counters drifted; returns how many were fixed"""
+    try:
+        repaired = await conn.execute(RECONCILE_PROGRESS)
+        await conn.commit()
+    except Exception:
+        await conn.rollback()
+        raise
+    # Lesson counts may have been what drifted
+    lesson_counts.invalidate()
+    if repaired:
+        versions.bump("progress")
+    return repaired
+
+
+async def reconcile_periodically(database, interval: float):
+    """Reconcile now and then every ``interval`` seconds"""
+    while True:
+        try:
+            conn = await database.acquire()
+            try:
+                started = time.perf_counter()
+                repaired = await reconcile_progress(conn)
+            finally:
+                await conn.release()
+            logger.info(
+                f"Progress reconciliation repaired {repaired} enrollments "
+                f"in {time.perf_counter() - started:.2f}s"
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Progress reconciliation failed: {e}")
+        await asyncio.sleep(interval)
+
+
+lesson_counts = LessonCounts(ttl=float(os.getenv("LESSON_COUNT_TTL", "600")))
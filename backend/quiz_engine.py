@@ -0,0 +1,434 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from database import AsyncConnection
+
+logger = logging.getLogger(__name__)
+
+QUIZ_HEADER_QUERY = """
+    SELECT id, course_id, total_questions, passing_score_percentage, attempts_allowed
+    FROM quizzes
+    WHERE id = ?
+"""
+
+# One pass over questions and options feeds both the delivery payload and the answer key
+QUIZ_CONTENT_QUERY = """
+    SELECT qq.id, qq.is_active,
+           CAST(qq.question_text AS NVARCHAR(MAX)) as question_text,
+           qq.question_type, qq.points, qq.order_index,
+           qao.id as option_id,
+           CAST(qao.option_text AS NVARCHAR(MAX)) as option_text,
+           qao.order_index as option_order, qao.is_correct
+    FROM quiz_questions qq
+    LEFT JOIN quiz_answer_options qao ON qq.id = qao.question_id
+    WHERE qq.quiz_id = ?
+    ORDER BY qq.order_index, qao.order_index
+"""
+
+# Attempt count, best score and passed flag per (user, quiz), maintained by submissions;
+# created on first start from the attempts recorded so far
+ENSURE_QUIZ_SUMMARY_TABLE = """
+    IF OBJECT_ID('user_quiz_summaries', 'U') IS NULL
+    BEGIN
+        CREATE TABLE user_quiz_summaries (
+            user_id INT NOT NULL,
+            quiz_id INT NOT NULL,
+            attempts INT NOT NULL,
+            best_score DECIMAL(5, 2) NULL,
+            is_passed BIT NOT NULL CONSTRAINT DF_user_quiz_summaries_is_passed DEFAULT 0,
+            last_attempt_at DATETIME NULL,
+            CONSTRAINT PK_user_quiz_summaries PRIMARY KEY (user_id, quiz_id)
+        );
+        INSERT INTO user_quiz_summaries (user_id, quiz_id, attempts, best_score, is_passed, last_attempt_at)
+        SELECT user_id, quiz_id, COUNT(*), MAX(score_percentage), MAX(CAST(is_passed AS INT)), MAX(started_at)
+        FROM user_quiz_attempts
+        GROUP BY user_id, quiz_id;
+    END
+"""
+
+# Claims the next attempt number only while under the limit; the row stays locked
+# until the submission commits, so concurrent submissions are numbered in turn
+RECORD_ATTEMPT = """
+    UPDATE user_quiz_summaries
+    SET attempts = attempts + 1,
+        best_score = CASE WHEN best_score IS NULL OR best_score < ? THEN ? ELSE best_score END,
+        is_passed = CASE WHEN ? = 1 THEN 1 ELSE is_passed END,
+        last_attempt_at = GETDATE()
+    OUTPUT INSERTED.attempts
+    WHERE user_id = ? AND quiz_id = ? AND attempts < ?
+"""
+
+# Locks the summary row, or the key range it would go in, until the submission commits
+LOCK_SUMMARY = """
+    SELECT attempts FROM user_quiz_summaries WITH (UPDLOCK, HOLDLOCK)
+    WHERE user_id = ? AND quiz_id = ?
+"""
+
+RECORD_FIRST_ATTEMPT = """
+    INSERT INTO user_quiz_summaries (user_id, quiz_id, attempts, best_score, is_passed, last_attempt_at)
+    VALUES (?, ?, 1, ?, ?, GETDATE())
+"""
+
+# Recount the summaries of a range of quizzes from user_quiz_attempts: fix drifted rows,
+# add missing ones and drop those whose attempts are gone
+RECONCILE_QUIZ_SUMMARIES = """
+    SET NOCOUNT ON;
+    WITH counted AS (
+        SELECT user_id, quiz_id, COUNT(*) AS attempts, MAX(score_percentage) AS best_score,
+               MAX(CAST(is_passed AS INT)) AS is_passed, MAX(started_at) AS last_attempt_at
+        FROM user_quiz_attempts
+        WHERE quiz_id BETWEEN ? AND ?
+        GROUP BY user_id, quiz_id
+    )
+    MERGE user_quiz_summaries WITH (HOLDLOCK) AS target
+    USING counted AS source
+    ON target.user_id = source.user_id AND target.quiz_id = source.quiz_id
+    WHEN MATCHED AND (target.attempts <> source.attempts
+                      OR ISNULL(target.best_score, -1) <> ISNULL(source.best_score, -1)
+                      OR target.is_passed <> source.is_passed) THEN
+        UPDATE SET attempts = source.attempts, best_score = source.best_score,
+                   is_passed = source.is_passed, last_attempt_at = source.last_attempt_at
+    WHEN NOT MATCHED BY TARGET THEN
+        INSERT (user_id, quiz_id, attempts, best_score, is_passed, last_attempt_at)
+        VALUES (source.user_id, source.quiz_id, source.attempts, source.best_score,
+                source.is_passed, source.last_attempt_at)
+    WHEN NOT MATCHED BY SOURCE AND target.quiz_id BETWEEN ? AND ? THEN
+        DELETE;
+    SELECT @@ROWCOUNT AS repaired;
+"""
+
+# Quizzes per reconciliation transaction, so locks are held briefly
+RECONCILE_QUIZ_BATCH = 500
+
+
+class AnswerKey:
+    """Points per question and correctness per answer option for one quiz"""
+
+    def __init__(self, quiz_id: int):
+        self.quiz_id = quiz_id
+        self.points: Dict[int, int] = {}
+        self.correct: Dict[int, bool] = {}
+
+    def add_row(self, row):
+        self.points[row.id] = row.points or 0
+        if row.option_id is not None:
+            self.correct[row.option_id] = bool(row.is_correct)
+
+
+class CompiledQuiz:
+    """Everything needed to deliver and grade one quiz, built once per version"""
+
+    __slots__ = ("quiz_id", "version", "quiz", "answer_key", "questions_json", "compiled_at")
+
+    def __init__(self, quiz_id: int, version: int, quiz, answer_key: AnswerKey, questions_json: bytes):
+        self.quiz_id = quiz_id
+        self.version = version
+        self.quiz = quiz
+        self.answer_key = answer_key
+        self.questions_json = questions_json
+        self.compiled_at = time.time()
+
+
+async def compile_quiz(conn: AsyncConnection, quiz_id: int, version: int = 0) -> Optional[CompiledQuiz]:
+    quiz = await conn.fetchone(QUIZ_HEADER_QUERY, quiz_id)
+    if not quiz:
+        return None
+    rows = await conn.fetchall(QUIZ_CONTENT_QUERY, quiz_id)
+
+    # Grading has always accepted inactive questions; delivery only shows active ones
+    answer_key = AnswerKey(quiz_id)
+    questions_dict = {}
+    for row in rows:
+        answer_key.add_row(row)
+        if not row.is_active:
+            continue
+        if row.id not in questions_dict:
+            questions_dict[row.id] = {
+                "id": row.id,
+                "question_text": row.question_text,
+                "question_type": row.question_type,
+                "points": row.points,
+                "order_index": row.order_index,
+                "options": []
+            }
+
+        if row.option_id:
+            questions_dict[row.id]["options"].append({
+                "id": row.option_id,
+                "text": row.option_text,
+                "order_index": row.option_order
+            })
+
+    # Serialized the way JSONResponse would, so cached hits are a plain byte copy
+    questions_json = json.dumps(
+        list(questions_dict.values()), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+    return CompiledQuiz(quiz_id, version, quiz, answer_key, questions_json)
+
+
+class QuizCache:
+    """LRU of compiled quizzes with per-quiz version invalidation.
+
+    Published quizzes don't change, so entries live until ``invalidate`` bumps
+    the quiz's version: after a catalog import, or through
+    POST /admin/catalog/refresh once a quiz was edited straight in the
+    database. The TTL bounds staleness for edits nobody announced.
+    """
+
+    def __init__(self, max_size: int = 1000, ttl: float = 3600.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[int, Tuple[CompiledQuiz, float]]" = OrderedDict()
+        self._inflight: Dict[int, asyncio.Future] = {}
+        self._versions: Dict[int, int] = {}
+        self._hits = 0
+        self._misses = 0
+        self._compiles = 0
+        self._evictions = 0
+
+    def version(self, quiz_id: int) -> int:
+        return self._versions.get(quiz_id, 0)
+
+    async def get(self, conn: AsyncConnection, quiz_id: int) -> Optional[CompiledQuiz]:
+        entry = self._entries.get(quiz_id)
+        if entry is not None:
+            compiled, expires_at = entry
+            if compiled.version == self.version(quiz_id) and self._clock() < expires_at:
+                self._entries.move_to_end(quiz_id)
+                self._hits += 1
+                return compiled
+            del self._entries[quiz_id]
+
+        self._misses += 1
+
+        pending = self._inflight.get(quiz_id)
+        if pending is not None:
+            await asyncio.wait([pending])
+            if not pending.cancelled():
+                return pending.result()
+            return await self.get(conn, quiz_id)
+
+        pending = asyncio.get_running_loop().create_future()
+        self._inflight[quiz_id] = pending
+        version = self.version(quiz_id)
+        try:
+            compiled = await compile_quiz(conn, quiz_id, version)
+            self._compiles += 1
+            # Unknown quizzes aren't cached so one published later shows up right away
+            if compiled is not None and version == self.version(quiz_id):
+                self._store(quiz_id, compiled)
+            pending.set_result(compiled)
+            return compiled
+        finally:
+            if not pending.done():
+                pending.cancel()
+            del self._inflight[quiz_id]
+
+    def invalidate(self, quiz_id: Optional[int] = None):
+        """Recompile one quiz (or all of them) on next use"""
+        if quiz_id is None:
+            for key in set(self._versions) | set(self._entries):
+                self._versions[key] = self.version(key) + 1
+            self._entries.clear()
+        else:
+            self._versions[quiz_id] = self.version(quiz_id) + 1
+            self._entries.pop(quiz_id, None)
+        logger.info(f"Quiz cache invalidated: {quiz_id if quiz_id is not None else 'all'}")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._hits + self._misses
+        return {
+            "entries": len(self._entries),
+            "hits": self._hits,
+            "misses": self._misses,
+            "compiles": self._compiles,
+            "evictions": self._evictions,
+            "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def _store(self, quiz_id: int, compiled: CompiledQuiz):
+        self._entries[quiz_id] = (compiled, self._clock() + self.ttl)
+        self._entries.move_to_end(quiz_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+
+class GradingResult:
+    def __init__(self):
+        self.correct_answers = 0
+        self.total_points = 0
+        self.earned_points = 0
+        # (question_id, selected_option_id, answer_text, is_correct, points_earned)
+        self.answer_rows: List[Tuple[Any, Any, Any, bool, int]] = []
+
+    @property
+    def score_percentage(self) -> float:
+        return (self.earned_points / self.total_points * 100) if self.total_points > 0 else 0
+
+
+def _as_id(value) -> Optional[int]:
+    # Ids arrive as untyped JSON; SQL Server used to convert "12" to 12 implicitly
+    return int(value) if value is not None else None
+
+
+async def resolve_foreign_ids(conn: AsyncConnection, key: AnswerKey,
+                              answers: Iterable[Dict[str, Any]]) -> Tuple[Dict[int, int], Dict[int, bool]]:
+    """Look up questions/options an answer references outside the quiz's own key.
+
+    Grading has always looked questions and options up by id alone, so a
+    well-formed client never takes this path but odd submissions still grade
+    exactly as before.
+    """
+    question_ids, option_ids = set(), set()
+    for answer in answers:
+        question_id = _as_id(answer["question_id"])
+        if question_id not in key.points:
+            question_ids.add(question_id)
+        option_id = answer.get("selected_option_id")
+        if option_id and _as_id(option_id) not in key.correct:
+            option_ids.add(_as_id(option_id))
+
+    points, correct = {}, {}
+    if question_ids:
+        rows = await conn.fetchall(
+            f"SELECT id, points FROM quiz_questions WHERE id IN ({', '.join('?' for _ in question_ids)})",
+            *question_ids
+        )
+        points = {row.id: row.points or 0 for row in rows}
+    if option_ids:
+        rows = await conn.fetchall(
+            f"SELECT id, is_correct FROM quiz_answer_options WHERE id IN ({', '.join('?' for _ in option_ids)})",
+            *option_ids
+        )
+        correct = {row.id: bool(row.is_correct) for row in rows}
+    return points, correct
+
+
+def grade(answers: Iterable[Dict[str, Any]], key: AnswerKey,
+          extra_points: Optional[Dict[int, int]] = None,
+          extra_correct: Optional[Dict[int, bool]] = None) -> GradingResult:
+    """Grade a submission in memory, answer by answer, as submit_quiz always has"""
+    points = {**(extra_points or {}), **key.points}
+    correct = {**(extra_correct or {}), **key.correct}
+    result = GradingResult()
+
+    for answer in answers:
+        question_id = answer["question_id"]
+        selected_option_id = answer.get("selected_option_id")
+        answer_text = answer.get("answer_text")
+
+        question_points = points.get(_as_id(question_id))
+        if question_points is None:
+            continue
+
+        result.total_points += question_points
+        is_correct = False
+        points_earned = 0
+
+        if selected_option_id and correct.get(_as_id(selected_option_id)):
+            is_correct = True
+            result.correct_answers += 1
+            points_earned = question_points
+            result.earned_points += points_earned
+
+        result.answer_rows.append((question_id, selected_option_id, answer_text, is_correct, points_earned))
+
+    return result
+
+
+async def save_answers(conn: AsyncConnection, attempt_id: int, result: GradingResult):
+    """Persist every graded answer with a single batched insert"""
+    if not result.answer_rows:
+        return
+    await conn.executemany("""
+        INSERT INTO user_quiz_answers
+        (attempt_id, question_id, selected_option_id, answer_text, is_correct, points_earned)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, [(attempt_id, *row) for row in result.answer_rows])
+
+
+async def record_attempt(conn: AsyncConnection, user_id: int, quiz_id: int, attempts_allowed: int,
+                         score_percentage: float, is_passed: bool) -> Optional[int]:
+    """Count an attempt in the user's quiz summary inside the caller's transaction.
+
+    Returns the attempt's number, or None when ``attempts_allowed`` is used up.
+    """
+    params = (score_percentage, score_percentage, int(is_passed), user_id, quiz_id, attempts_allowed)
+    row = await conn.fetchone(RECORD_ATTEMPT, *params)
+    if row is not None:
+        return row.attempts
+
+    # Nothing updated: either there is no summary yet or the limit is used up
+    summary = await conn.fetchone(LOCK_SUMMARY, user_id, quiz_id)
+    if summary is None:
+        if attempts_allowed < 1:
+            return None
+        # The range lock keeps a concurrent first attempt waiting until this one commits
+        await conn.execute(RECORD_FIRST_ATTEMPT, user_id, quiz_id, score_percentage, int(is_passed))
+        return 1
+    if summary.attempts < attempts_allowed:
+        # A concurrent first attempt committed the row after the update looked; it's locked now
+        row = await conn.fetchone(RECORD_ATTEMPT, *params)
+        return row.attempts
+    return None
+
+
+async def ensure_quiz_summary_schema(database):
+    """Create and backfill user_quiz_summaries on first start"""
+    conn = await database.acquire()
+    try:
+        await conn.execute(ENSURE_QUIZ_SUMMARY_TABLE)
+        await conn.commit()
+    finally:
+        await conn.release()
+
+
+async def reconcile_quiz_summaries(conn: AsyncConnection) -> int:
+    """Repair every summary that drifted from user_quiz_attempts; returns how many were fixed"""
+    last = (await conn.fetchone("SELECT ISNULL(MAX(id), 0) AS last_id FROM quizzes")).last_id
+    repaired = 0
+    for first in range(1, last + 1, RECONCILE_QUIZ_BATCH):
+        bounds = (first, first + RECONCILE_QUIZ_BATCH - 1)
+        try:
+            row = await conn.fetchone(RECONCILE_QUIZ_SUMMARIES, *bounds, *bounds)
+            await conn.commit()
+        except Exception:
+            await conn.rollback()
+            raise
+        repaired += row.repaired
+    return repaired
+
+
+async def reconcile_summaries_periodically(database, interval: float):
+    """Reconcile quiz summaries now and then every ``interval`` seconds"""
+    while True:
+        try:
+            conn = await database.acquire()
+            try:
+                started = time.perf_counter()
+                repaired = await reconcile_quiz_summaries(conn)
+            finally:
+                await conn.release()
+            logger.info(
+                f"Quiz summary reconciliation repaired {repaired} summaries "
+                f"in {time.perf_counter() - started:.2f}s"
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Quiz summary reconciliation failed: {e}")
+        await asyncio.sleep(interval)
+
+
+quiz_cache = QuizCache(
+    max_size=int(os.getenv("QUIZ_CACHE_MAX_SIZE", "1000")),
+    ttl=float(os.getenv("QUIZ_CACHE_TTL", "3600")),
+)
@@ -0,0 +1,224 @@
+import os
+import time
+import asyncio
+import logging
+from array import array
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # pragma: no cover - without them /courses/recommended serves popular courses
+    np = sparse = None
+
+logger = logging.getLogger(__name__)
+
+# One row per active enrollment; completed_lessons is maintained from user_lesson_progress
+ENGAGEMENT_QUERY = """
+    SELECT ue.user_id, ue.course_id, ue.completed_lessons
+    FROM user_enrollments ue
+    JOIN courses c ON c.id = ue.course_id
+    WHERE ue.is_active = 1 AND c.is_active = 1
+"""
+
+# Rows fetched per round trip while loading enrollments
+FETCH_BATCH = 10000
+
+# Upper bound on the dense similarity block held while building, in cells
+BLOCK_CELLS = 4_000_000
+
+
+def load_engagement(conn) -> Tuple[array, array, array]:
+    """Stream every active enrollment into compact (user_id, course_id, completed_lessons) arrays.
+
+    Runs on the database executor via ``AsyncConnection.run``; rows are
+    fetched in batches so millions of enrollments never exist as row objects.
+    """
+    user_ids, course_ids, completed = array("i"), array("i"), array("i")
+    cursor = conn.cursor()
+    try:
+        cursor.execute(ENGAGEMENT_QUERY)
+        while True:
+            rows = cursor.fetchmany(FETCH_BATCH)
+            if not rows:
+                break
+            for row in rows:
+                user_ids.append(row.user_id)
+                course_ids.append(row.course_id)
+                completed.append(row.completed_lessons or 0)
+    finally:
+        cursor.close()
+    return user_ids, course_ids, completed
+
+
+class CourseRecommender:
+    """Item-item course similarity from co-enrollment, with top-K neighbours per course.
+
+    ``build`` turns enrollments into a sparse user x course matrix, weighted
+    up by lessons completed and down for users enrolled in many courses, and
+    computes cosine similarity block by block so memory stays bounded by the
+    catalog size rather than the number of enrollments. Only the ``neighbors``
+    best matches per course are kept; per-user recommendations add up the
+    neighbours of the user's courses.
+    """
+
+    def __init__(self, neighbors: int = 50):
+        self.neighbors = neighbors
+        # (course ids, neighbour positions, neighbour scores), swapped in whole on every build
+        self._model: Optional[Tuple["np.ndarray", "np.ndarray", "np.ndarray"]] = None
+        self._ready = False
+        self._enrollments = 0
+        self._users = 0
+        self.built_at: Optional[datetime] = None
+        self.build_seconds = 0.0
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def build(self, user_ids: Iterable[int], course_ids: Iterable[int], completed_lessons: Iterable[int]):
+        started = time.perf_counter()
+        users = np.asarray(user_ids, dtype=np.int64)
+        courses = np.asarray(course_ids, dtype=np.int64)
+        completed = np.asarray(completed_lessons, dtype=np.float32)
+
+        course_list, course_pos = np.unique(courses, return_inverse=True)
+        _, user_pos = np.unique(users, return_inverse=True)
+        n_users, n_courses = int(user_pos.max(initial=-1)) + 1, len(course_list)
+
+        # Finishing lessons says more than enrolling; users enrolled in everything say less
+        per_user = np.bincount(user_pos, minlength=n_users).astype(np.float32)
+        weights = (1.0 + np.log1p(completed)) / np.log2(1.0 + per_user[user_pos])
+        matrix = sparse.csr_matrix(
+            (weights.astype(np.float32), (user_pos, course_pos)), shape=(n_users, n_courses)
+        )
+        del users, courses, completed, user_pos, course_pos, weights
+
+        neighbor_index, neighbor_scores = self._top_neighbors(matrix.tocsc(), n_courses)
+
+        # Only publish the new arrays once complete, so readers never see a half-built model
+        self._model = (course_list, neighbor_index, neighbor_scores)
+        self._enrollments = matrix.nnz
+        self._users = n_users
+        self._ready = True
+        self.built_at = datetime.now()
+        self.build_seconds = time.perf_counter() - started
+        logger.info(
+            f"Recommendations built: {n_courses} courses, {matrix.nnz} enrollments "
+            f"in {self.build_seconds:.2f}s"
+        )
+
+    def _top_neighbors(self, matrix: "sparse.csc_matrix", n_courses: int) -> Tuple["np.ndarray", "np.ndarray"]:
+        k = self.neighbors
+        neighbor_index = np.full((n_courses, k), -1, dtype=np.int32)
+        neighbor_scores = np.zeros((n_courses, k), dtype=np.float32)
+        if n_courses == 0:
+            return neighbor_index, neighbor_scores
+
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel()).astype(np.float32)
+        norms[norms == 0] = 1.0
+        transposed = matrix.T.tocsr()
+        block = max(1, BLOCK_CELLS // n_courses)
+        width = min(k, n_courses - 1)
+
+        for start in range(0, n_courses, block):
+            stop = min(start + block, n_courses)
+            # Co-enrollment of every course with this block of courses, as cosine similarity
+            similarity = (transposed @ matrix[:, start:stop]).toarray().T
+            similarity /= norms[start:stop, None]
+            similarity /= norms[None, :]
+            similarity[np.arange(stop - start), np.arange(start, stop)] = 0.0
+            if width <= 0:
+                continue
+
+            top = np.argpartition(-similarity, width - 1, axis=1)[:, :width]
+            scores = np.take_along_axis(similarity, top, axis=1)
+            order = np.argsort(-scores, axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+            scores = np.take_along_axis(scores, order, axis=1)
+            top[scores <= 0] = -1
+            neighbor_index[start:stop, :width] = top
+            neighbor_scores[start:stop, :width] = np.maximum(scores, 0.0)
+        return neighbor_index, neighbor_scores
+
+    def similar(self, course_id: int, limit: int) -> List[Tuple[int, float]]:
+        """Courses most often taken together with ``course_id``, best first"""
+        if self._model is None:
+            return []
+        course_ids, neighbor_index, neighbor_scores = self._model
+        position = self._position(course_ids, course_id)
+        if position is None:
+            return []
+        index = neighbor_index[position]
+        valid = index >= 0
+        return list(zip(
+            course_ids[index[valid]][:limit].tolist(),
+            neighbor_scores[position][valid][:limit].tolist(),
+        ))
+
+    def recommend(self, enrolled: Iterable[int], limit: int) -> List[Tuple[int, float]]:
+        """Best courses for someone enrolled in ``enrolled``, leaving those out"""
+        if self._model is None:
+            return []
+        course_ids, neighbor_index, neighbor_scores = self._model
+        positions = [p for p in (self._position(course_ids, course_id) for course_id in enrolled) if p is not None]
+        if not positions:
+            return []
+        candidates = neighbor_index[positions].ravel()
+        scores = neighbor_scores[positions].ravel()
+        keep = (candidates >= 0) & ~np.isin(candidates, positions)
+        candidates, scores = candidates[keep], scores[keep]
+        if not len(candidates):
+            return []
+
+        unique, inverse = np.unique(candidates, return_inverse=True)
+        totals = np.bincount(inverse, weights=scores)
+        if len(unique) > limit:
+            best = np.argpartition(-totals, limit - 1)[:limit]
+        else:
+            best = np.arange(len(unique))
+        best = best[np.argsort(-totals[best], kind="stable")]
+        return list(zip(course_ids[unique[best]].tolist(), totals[best].tolist()))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self._ready,
+            "courses": len(self._model[0]) if self._model is not None else 0,
+            "users": self._users,
+            "enrollments": self._enrollments,
+            "neighbors": self.neighbors,
+            "memory_bytes": sum(part.nbytes for part in self._model) if self._model is not None else 0,
+            "built_at": self.built_at.isoformat() if self.built_at else None,
+            "build_seconds": round(self.build_seconds, 3),
+        }
+
+    @staticmethod
+    def _position(course_ids: "np.ndarray", course_id: int) -> Optional[int]:
+        position = int(np.searchsorted(course_ids, course_id))
+        if position < len(course_ids) and course_ids[position] == course_id:
+            return position
+        return None
+
+
+async def rebuild_periodically(recommender: CourseRecommender, database, interval: float):
+    """Build recommendations from current enrollments now, then every ``interval`` seconds"""
+    if np is None:
+        logger.warning("numpy/scipy are not installed; recommendations fall back to popular courses")
+        return
+    while True:
+        try:
+            conn = await database.acquire(read_only=True)
+            try:
+                engagement = await conn.run(load_engagement)
+            finally:
+                await conn.release()
+            await asyncio.get_running_loop().run_in_executor(None, recommender.build, *engagement)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Recommendation build failed: {e}")
+        await asyncio.sleep(interval)
+
+
+recommender = CourseRecommender(neighbors=int(os.getenv("RECOMMENDATION_NEIGHBORS", "50")))
@@ -0,0 +1,336 @@
+import re
+import math
+import time
+import asyncio
+import logging
+import threading
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+FUZZY_ALPHABET = "abcdefghijklmnopqrstuvwxyz0123456789"
+
+# Relative weight of a term found in each indexed column
+FIELD_WEIGHTS = (("title", 3.0), ("instructor_name", 2.0), ("description", 1.0))
+
+# How much a prefix or one-typo match counts compared to an exact token match
+EXACT_MATCH, PREFIX_MATCH, FUZZY_MATCH = 1.0, 0.6, 0.4
+
+# Short prefixes can match a large part of the vocabulary; only the first ones count
+MAX_PREFIX_EXPANSIONS = 50
+
+# Course ids per lookup when indexing written courses, under SQL Server's 2100 parameters
+MAX_LOOKUP_IDS = 2000
+
+COURSE_INDEX_QUERY = """
+    SELECT id, title, CAST(description AS NVARCHAR(MAX)) AS description, instructor_name,
+           category_id, level, is_free, rating, total_ratings, total_enrollments, created_at
+    FROM courses
+    WHERE is_active = 1
+"""
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return TOKEN_RE.findall(text.casefold()) if text else []
+
+
+class CourseDoc:
+    """Filter and sort attributes of one indexed course"""
+
+    __slots__ = (
+        "id", "category_id", "level", "is_free", "rating",
+        "total_ratings", "total_enrollments", "created_at",
+    )
+
+    def __init__(self, row):
+        self.id = row.id
+        self.category_id = row.category_id
+        self.level = row.level.casefold() if row.level else None
+        self.is_free = bool(row.is_free)
+        self.rating = row.rating
+        self.total_ratings = row.total_ratings or 0
+        self.total_enrollments = row.total_enrollments or 0
+        self.created_at = row.created_at
+
+
+class SearchHit:
+    __slots__ = ("course_id", "score", "doc")
+
+    def __init__(self, course_id: int, score: float, doc: CourseDoc):
+        self.course_id = course_id
+        self.score = score
+        self.doc = doc
+
+
+class CourseSearchIndex:
+    """In-memory inverted index over course title, description and instructor.
+
+    A full build produces compact per-token posting arrays. Courses written
+    afterwards (see ``index_courses``) go to a small overlay, and their old
+    postings are masked, until the next rebuild folds them back in. All of it
+    is one snapshot tuple that is replaced whole and never changed in place,
+    so a search works on a single consistent version from start to end.
+    """
+
+    def __init__(self):
+        # (docs, postings, sorted vocabulary, overlay, stale course ids)
+        self._snapshot: Tuple[Dict[int, CourseDoc], Dict[str, Tuple[array, array]], List[str],
+                              Dict[str, Dict[int, float]], frozenset] = ({}, {}, [], {}, frozenset())
+        self._lock = threading.Lock()
+        # Upserts since the running rebuild started reading courses, replayed onto its result
+        self._journal: Optional[List[list]] = None
+        self._ready = False
+        self.built_at: Optional[datetime] = None
+        self.updated_at: Optional[datetime] = None
+        self.build_seconds = 0.0
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    @property
+    def building(self) -> bool:
+        return self._journal is not None
+
+    def begin_build(self):
+        """Start journaling upserts; call before reading the rows for ``build``"""
+        with self._lock:
+            self._journal = []
+
+    def build(self, rows: Iterable[Any]):
+        started = time.perf_counter()
+        docs = {}
+        postings = defaultdict(lambda: (array("i"), array("f")))
+
+        for row in rows:
+            docs[row.id] = CourseDoc(row)
+            for token, weight in self._weighted_tokens(row).items():
+                ids, weights = postings[token]
+                ids.append(row.id)
+                weights.append(weight)
+
+        snapshot = (docs, dict(postings), sorted(postings), {}, frozenset())
+        with self._lock:
+            # Courses written while the rows were being read may be missing from them
+            for upserted in self._journal or []:
+                snapshot = self._with_upserts(snapshot, upserted)
+            self._snapshot = snapshot
+            self._journal = None
+        self._ready = True
+        self.built_at = self.updated_at = datetime.now()
+        self.build_seconds = time.perf_counter() - started
+        logger.info(
+            f"Search index built: {len(docs)} courses, {len(snapshot[2])} terms "
+            f"in {self.build_seconds:.2f}s"
+        )
+
+    def upsert(self, rows: List[Any]):
+        """Index new or changed courses without rebuilding"""
+        if not rows:
+            return
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append(rows)
+            self._snapshot = self._with_upserts(self._snapshot, rows)
+        self.updated_at = datetime.now()
+
+    def search(
+        self,
+        query: str,
+        category_id: Optional[int] = None,
+        level: Optional[str] = None,
+        is_free: Optional[bool] = None,
+        min_rating: Optional[float] = None,
+    ) -> List[SearchHit]:
+        """Rank courses matching every query term, applying the /courses filters"""
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        level = level.casefold() if level else None
+        snapshot = self._snapshot
+        docs = snapshot[0]
+
+        # Intersect starting from the most selective term to keep the working set small
+        per_term = sorted((self._score_term(snapshot, term) for term in terms), key=len)
+        scores = per_term[0]
+        for term_scores in per_term[1:]:
+            if not scores:
+                break
+            scores = {
+                course_id: score + term_scores[course_id]
+                for course_id, score in scores.items()
+                if course_id in term_scores
+            }
+
+        hits = []
+        for course_id, score in scores.items():
+            doc = docs.get(course_id)
+            if doc is None:
+                continue
+            if category_id and doc.category_id != category_id:
+                continue
+            if level and doc.level != level:
+                continue
+            if is_free is not None and doc.is_free != is_free:
+                continue
+            if min_rating and (doc.rating is None or doc.rating < min_rating):
+                continue
+            hits.append(SearchHit(course_id, score, doc))
+        return hits
+
+    def stats(self) -> Dict[str, Any]:
+        docs, _, vocabulary, overlay, stale = self._snapshot
+        return {
+            "ready": self._ready,
+            "courses": len(docs),
+            "terms": len(vocabulary),
+            "overlay_terms": len(overlay),
+            "stale_courses": len(stale),
+            "built_at": self.built_at.isoformat() if self.built_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+            "build_seconds": round(self.build_seconds, 3),
+        }
+
+    def _with_upserts(self, snapshot, rows: List[Any]):
+        """A copy of ``snapshot`` with ``rows`` in the overlay and their built postings masked"""
+        docs, postings, vocabulary, overlay, stale = snapshot
+        course_ids = {row.id for row in rows}
+        docs = {**docs, **{row.id: CourseDoc(row) for row in rows}}
+        overlay = {
+            token: kept
+            for token, kept in (
+                (token, {c: w for c, w in entries.items() if c not in course_ids})
+                for token, entries in overlay.items()
+            )
+            if kept
+        }
+        for row in rows:
+            for token, weight in self._weighted_tokens(row).items():
+                overlay.setdefault(token, {})[row.id] = weight
+        return docs, postings, vocabulary, overlay, stale | course_ids
+
+    def _weighted_tokens(self, row) -> Dict[str, float]:
+        weights = defaultdict(float)
+        for field, field_weight in FIELD_WEIGHTS:
+            counts = defaultdict(int)
+            for token in tokenize(getattr(row, field)):
+                counts[token] += 1
+            for token, count in counts.items():
+                weights[token] += field_weight * (1.0 + math.log(count))
+        return weights
+
+    def _score_term(self, snapshot, term: str) -> Dict[int, float]:
+        """Best match per course for one query term, across exact/prefix/typo expansions"""
+        scores: Dict[int, float] = {}
+        for token, match_weight in self._expand(snapshot, term):
+            postings = self._collect(snapshot, token)
+            if not postings:
+                continue
+            factor = match_weight * math.log(1.0 + len(snapshot[0]) / len(postings))
+            if not scores:
+                scores = {course_id: weight * factor for course_id, weight in postings.items()}
+                continue
+            for course_id, weight in postings.items():
+                score = weight * factor
+                if score > scores.get(course_id, 0.0):
+                    scores[course_id] = score
+        return scores
+
+    def _expand(self, snapshot, term: str) -> List[Tuple[str, float]]:
+        matches = {}
+        if self._has_token(snapshot, term):
+            matches[term] = EXACT_MATCH
+
+        if len(term) >= 2:
+            for i, token in enumerate(self._prefixed(snapshot, term)):
+                if i >= MAX_PREFIX_EXPANSIONS:
+                    break
+                matches.setdefault(token, PREFIX_MATCH)
+
+        # Only fall back to typo matching when the term matched nothing as typed
+        if not matches and len(term) >= 4:
+            for token in self._edits1(term):
+                if self._has_token(snapshot, token):
+                    matches.setdefault(token, FUZZY_MATCH)
+
+        return list(matches.items())
+
+    @staticmethod
+    def _prefixed(snapshot, prefix: str) -> Iterable[str]:
+        _, postings, vocabulary, overlay, _ = snapshot
+        start = bisect_left(vocabulary, prefix)
+        for token in vocabulary[start:]:
+            if not token.startswith(prefix):
+                break
+            yield token
+        for token in overlay:
+            if token.startswith(prefix) and token not in postings:
+                yield token
+
+    @staticmethod
+    def _has_token(snapshot, token: str) -> bool:
+        return token in snapshot[1] or token in snapshot[3]
+
+    @staticmethod
+    def _collect(snapshot, token: str) -> Dict[int, float]:
+        _, postings, _, overlay, stale = snapshot
+        base = postings.get(token)
+        collected = dict(zip(*base)) if base is not None else {}
+        if base is not None and stale:
+            for course_id in stale.intersection(collected):
+                del collected[course_id]
+        collected.update(overlay.get(token, ()))
+        return collected
+
+    @staticmethod
+    def _edits1(term: str) -> set:
+        splits = [(term[:i], term[i:]) for i in range(len(term) + 1)]
+        deletes = [a + b[1:] for a, b in splits if b]
+        transposes = [a + b[1] + b[0] + b[2:] for a, b in splits if len(b) > 1]
+        replaces = [a + c + b[1:] for a, b in splits if b for c in FUZZY_ALPHABET]
+        inserts = [a + c + b for a, b in splits for c in FUZZY_ALPHABET]
+        return set(deletes + transposes + replaces + inserts) - {term}
+
+
+async def rebuild(index: CourseSearchIndex, database):
+    """Build the index from the courses table"""
+    index.begin_build()
+    conn = await database.acquire(read_only=True)
+    try:
+        rows = await conn.fetchall(COURSE_INDEX_QUERY)
+    finally:
+        await conn.release()
+    await asyncio.get_running_loop().run_in_executor(None, index.build, rows)
+
+
+async def index_courses(index: CourseSearchIndex, conn, course_ids: List[int]):
+    """Fold courses just written on ``conn`` into the index, read back on the same connection"""
+    if not course_ids or not (index.ready or index.building):
+        return
+    rows = []
+    for start in range(0, len(course_ids), MAX_LOOKUP_IDS):
+        chunk = course_ids[start:start + MAX_LOOKUP_IDS]
+        placeholders = ", ".join("?" for _ in chunk)
+        rows.extend(await conn.fetchall(f"{COURSE_INDEX_QUERY} AND id IN ({placeholders})", *chunk))
+    index.upsert(rows)
+
+
+async def rebuild_periodically(index: CourseSearchIndex, database, interval: float):
+    """Build the index now, then refresh it every ``interval`` seconds"""
+    while True:
+        try:
+            await rebuild(index, database)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Search index build failed: {e}")
+        await asyncio.sleep(interval)
+
+
+search_index = CourseSearchIndex()
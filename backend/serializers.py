@@ -0,0 +1,156 @@
+import json
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+from fastapi.responses import JSONResponse, StreamingResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional, json is the fallback
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# ?stream= values: one JSON document per line, or one JSON array written as rows arrive
+STREAM_FORMATS = ("ndjson", "json")
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response for rows already shaped by a RowMapper.
+
+    Returning it from a handler skips response_model validation and
+    jsonable_encoder, so trusted rows are encoded exactly once (with orjson
+    when it is installed).
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+# Coercions for columns whose SQL type doesn't match the response field
+def as_float(value) -> float:
+    return float(value)
+
+
+def as_float_or_zero(value) -> float:
+    return float(value) if value else 0.0
+
+
+def as_optional_float(value) -> Optional[float]:
+    return float(value) if value else None
+
+
+def as_bool(value) -> bool:
+    return bool(value)
+
+
+def as_int_or_zero(value) -> int:
+    return value or 0
+
+
+Field = Union[str, Tuple[str, Callable[[Any], Any]]]
+
+
+class RowMapper:
+    """Declarative row -> dict mapping for one response model.
+
+    ``fields`` maps each output field to a row attribute, or to an
+    ``(attribute, coercion)`` pair. Mapping a subset of fields serves sparse
+    fieldsets with the same definitions.
+    """
+
+    def __init__(self, fields: Mapping[str, Field]):
+        self.fields: Dict[str, Tuple[str, Optional[Callable[[Any], Any]]]] = {
+            name: (spec, None) if isinstance(spec, str) else spec for name, spec in fields.items()
+        }
+        self._plans: Dict[Tuple[str, ...], list] = {}
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.fields)
+
+    def one(self, row, fields: Optional[Sequence[str]] = None, **overrides) -> Dict[str, Any]:
+        data = {name: (getattr(row, attr) if coerce is None else coerce(getattr(row, attr)))
+                for name, attr, coerce in self._plan(fields)}
+        if overrides:
+            data.update(overrides)
+        return data
+
+    def many(self, rows: Iterable[Any], fields: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        plan = self._plan(fields)
+        return [
+            {name: (getattr(row, attr) if coerce is None else coerce(getattr(row, attr)))
+             for name, attr, coerce in plan}
+            for row in rows
+        ]
+
+    def _plan(self, fields: Optional[Sequence[str]]) -> list:
+        key = tuple(fields) if fields is not None else ()
+        plan = self._plans.get(key)
+        if plan is None:
+            names = fields if fields is not None else self.fields
+            plan = [(name,) + self.fields[name] for name in names]
+            self._plans[key] = plan
+        return plan
+
+
+def stream_format(stream: Optional[str], accept: str) -> Optional[str]:
+    """The streamed format asked for with ``?stream=`` or an NDJSON Accept header, else None"""
+    if stream is not None:
+        if stream not in STREAM_FORMATS:
+            raise ValueError(f"stream must be one of {', '.join(STREAM_FORMATS)}")
+        return stream
+    return "ndjson" if NDJSON_MEDIA_TYPE in accept else None
+
+
+def streaming_json_response(batches: AsyncIterator[list], mapper: RowMapper, fmt: str,
+                            fields: Optional[Sequence[str]] = None,
+                            headers: Optional[Dict[str, str]] = None) -> StreamingResponse:
+    """Encode and send each batch of rows as it is fetched, so memory is bounded by one batch.
+
+    The status is sent before the first row; a failure part way through is
+    logged and ends the body early.
+    """
+    async def body():
+        separator = b""
+        if fmt == "json":
+            yield b"["
+        try:
+            async for rows in batches:
+                items = mapper.many(rows, fields)
+                if not items:
+                    continue
+                if fmt == "ndjson":
+                    yield b"".join(dumps(item) + b"\n" for item in items)
+                else:
+                    yield separator + b",".join(dumps(item) for item in items)
+                    separator = b","
+        except Exception as e:
+            logger.error(f"Streamed response failed part way: {e}")
+            return
+        finally:
+            # Release the rows' statement and connection now, not when the generator is collected
+            await batches.aclose()
+        if fmt == "json":
+            yield b"]"
+
+    media_type = NDJSON_MEDIA_TYPE if fmt == "ndjson" else "application/json"
+    return StreamingResponse(body(), media_type=media_type, headers=headers)
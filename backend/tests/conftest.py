@@ -0,0 +1,52 @@
+"""Shared fixtures: every test runs against the SQLite stand-ins from benchmarks/standins.py.
+
+Run from backend/ with ``python -m pytest -q``.
+"""
+import os
+import sys
+from functools import partial
+
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND, "benchmarks"))
+sys.path.insert(0, BACKEND)
+
+# Imported before any app module, since it stands in for pyodbc where no driver is installed
+import standins  # noqa: E402
+
+from database import ConnectionPool, Database, RecentWriters  # noqa: E402
+
+
+@pytest.fixture
+def standin_db(tmp_path):
+    """Path of a small seeded stand-in database"""
+    path = str(tmp_path / "standin.db")
+    standins.seed(path, standins.Scale(courses=40, users=6, enrollments_per_user=3))
+    return path
+
+
+@pytest.fixture
+def round_trips():
+    standins.round_trips.reset()
+    yield standins.round_trips
+    standins.round_trips.reset()
+
+
+@pytest.fixture
+def make_database(standin_db):
+    """Factory for a Database over ``standin_db``; pools and executors are closed after the test"""
+    made = []
+
+    def make(min_size: int = 0, max_size: int = 2, acquire_timeout: float = 2.0, **kwargs) -> Database:
+        pool = ConnectionPool(partial(standins.connect, standin_db), min_size=min_size, max_size=max_size,
+                              acquire_timeout=acquire_timeout)
+        database = Database(pool, recent_writers=RecentWriters(window=60.0), **kwargs)
+        made.append(database)
+        return database
+
+    yield make
+    for database in made:
+        database.pool.close()
+        database.executor.shutdown()
+        database.pool_executor.shutdown()
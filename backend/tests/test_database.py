@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+
+from database import PoolTimeout
+
+
+def test_release_returns_connection_for_reuse(make_database):
+    database = make_database(max_size=2)
+
+    async def scenario():
+        first = await database.acquire()
+        raw = first._conn
+        await first.release()
+        second = await database.acquire()
+        try:
+            return raw, second._conn
+        finally:
+            await second.release()
+
+    released, reacquired = asyncio.run(scenario())
+    assert reacquired is released
+    stats = database.pool.stats()
+    assert stats["created"] == 1
+    assert stats["acquired"] == 2
+    assert stats["in_use"] == 0
+
+
+def test_release_skips_rollback_for_unused_connection(make_database, round_trips):
+    database = make_database()
+
+    async def scenario():
+        conn = await database.acquire(read_only=True)
+        await conn.release()
+
+    asyncio.run(scenario())
+    assert sum(round_trips.snapshot().values()) == 0
+
+
+def test_release_rolls_back_uncommitted_work(make_database, round_trips):
+    database = make_database(max_size=1)
+
+    async def scenario():
+        conn = await database.acquire()
+        try:
+            await conn.execute("UPDATE categories SET name = ? WHERE id = ?", "Renamed", 1)
+        finally:
+            await conn.release()
+        conn = await database.acquire()
+        try:
+            return (await conn.fetchone("SELECT name FROM categories WHERE id = ?", 1)).name
+        finally:
+            await conn.release()
+
+    assert asyncio.run(scenario()) != "Renamed"
+    # UPDATE, rollback on release, SELECT, rollback on release
+    assert sum(round_trips.snapshot().values()) == 4
+
+
+def test_commit_leaves_nothing_to_roll_back(make_database, round_trips):
+    database = make_database()
+
+    async def scenario():
+        conn = await database.acquire()
+        try:
+            await conn.execute("UPDATE categories SET name = ? WHERE id = ?", "Renamed", 1)
+            await conn.commit()
+        finally:
+            await conn.release()
+
+    asyncio.run(scenario())
+    assert sum(round_trips.snapshot().values()) == 2
+
+
+def test_concurrent_requests_never_exceed_pool_size(make_database):
+    database = make_database(max_size=2)
+    in_use, peak = 0, 0
+
+    async def request():
+        nonlocal in_use, peak
+        conn = await database.acquire()
+        try:
+            in_use += 1
+            peak = max(peak, in_use)
+            await conn.fetchone("SELECT COUNT(*) AS total FROM courses")
+            await asyncio.sleep(0.01)
+        finally:
+            in_use -= 1
+            await conn.release()
+
+    async def scenario():
+        await asyncio.gather(*(request() for _ in range(20)))
+
+    asyncio.run(scenario())
+    stats = database.pool.stats()
+    assert peak == 2
+    assert stats["created"] == 2
+    assert stats["acquired"] == 20
+    assert stats["waits"] > 0
+    assert stats["in_use"] == 0
+
+
+def test_acquire_times_out_when_pool_is_exhausted(make_database):
+    database = make_database(max_size=1, acquire_timeout=0.1)
+
+    async def scenario():
+        held = await database.acquire()
+        try:
+            with pytest.raises(PoolTimeout):
+                await database.acquire()
+        finally:
+            await held.release()
+        # The slot is free again once the holder is done
+        conn = await database.acquire()
+        await conn.release()
+
+    asyncio.run(scenario())
+    assert database.pool.stats()["timeouts"] == 1
+
+
+def test_cancelled_waiter_does_not_leak_a_slot(make_database):
+    database = make_database(max_size=1)
+
+    async def scenario():
+        held = await database.acquire()
+        waiter = asyncio.create_task(database.acquire())
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await held.release()
+        conn = await asyncio.wait_for(database.acquire(), 1)
+        await conn.release()
+
+    asyncio.run(scenario())
+    assert database.pool.stats()["in_use"] == 0
+
@@ -0,0 +1,90 @@
+import asyncio
+import sqlite3
+from collections import namedtuple
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from pagination import KeysetOrder, InvalidCursor, query_scope, encode_cursor, decode_cursor, trim_page
+
+NEWEST = KeysetOrder([("c.created_at", "datetime"), ("c.id", "int")])
+POPULAR = KeysetOrder([("c.total_enrollments", "int"), ("c.id", "int")])
+RATING = KeysetOrder([("ISNULL(c.rating, 0)", "decimal"), ("c.total_ratings", "int"), ("c.id", "int")])
+
+
+@pytest.mark.parametrize("order, values", [
+    (NEWEST, [datetime(2024, 5, 1, 12, 30, 15, 250000), 42]),
+    (POPULAR, [0, 7]),
+    (RATING, [Decimal("4.35"), 120, 9]),
+    (KeysetOrder([("relevance", "float"), ("c.id", "int")]), [0.8125, 3]),
+])
+def test_cursor_round_trips_key_values(order, values):
+    scope = query_scope("courses", "test")
+    token = encode_cursor(order, values, scope)
+    assert "=" not in token
+    assert decode_cursor(order, token, scope) == values
+
+
+def test_cursor_from_another_query_is_rejected():
+    token = encode_cursor(POPULAR, [10, 3], query_scope("courses", "popular", None))
+    with pytest.raises(InvalidCursor):
+        decode_cursor(POPULAR, token, query_scope("courses", "popular", 2))
+
+
+@pytest.mark.parametrize("token", ["not base64!", "bm90IGpzb24", encode_cursor(POPULAR, [1, 2], "s")[:-4]])
+def test_malformed_cursor_is_rejected(token):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(POPULAR, token, "s")
+
+
+def test_cursor_with_wrong_key_count_is_rejected():
+    token = encode_cursor(POPULAR, [1, 2], "s")
+    with pytest.raises(InvalidCursor):
+        decode_cursor(KeysetOrder([("c.id", "int")]), token, "s")
+
+
+def test_trim_page_drops_look_ahead_row():
+    Row = namedtuple("Row", "id sort_key_0 sort_key_1")
+    rows = [Row(i, 100 - i, i) for i in range(4)]
+    page, token = trim_page(rows, 3, POPULAR, "s")
+    assert page == rows[:3]
+    assert decode_cursor(POPULAR, token, "s") == [98, 2]
+    assert trim_page(rows, 4, POPULAR, "s") == (rows, None)
+
+
+@pytest.mark.parametrize("order", [NEWEST, POPULAR, RATING], ids=["newest", "popular", "rating"])
+def test_keyset_walk_visits_every_row_once(standin_db, make_database, order):
+    # Ties on the leading keys force page boundaries inside a run of equal values
+    raw = sqlite3.connect(standin_db)
+    raw.execute("UPDATE courses SET created_at = '2024-01-01 00:00:00', total_enrollments = 5, "
+                "rating = 4.5, total_ratings = 10 WHERE id % 3 = 0")
+    raw.commit()
+    total = raw.execute("SELECT COUNT(*) FROM courses").fetchone()[0]
+    raw.close()
+    database = make_database()
+    scope = query_scope("courses", order.order_by())
+
+    async def walk():
+        seen, cursor = [], None
+        conn = await database.acquire(read_only=True)
+        try:
+            while True:
+                where, params = "1 = 1", []
+                if cursor:
+                    where, params = order.seek(decode_cursor(order, cursor, scope))
+                rows = await conn.fetchall(
+                    f"SELECT TOP (?) c.id, {order.select_list()} FROM courses c "
+                    f"WHERE {where} ORDER BY {order.order_by()}",
+                    7 + 1, *params
+                )
+                page, cursor = trim_page(rows, 7, order, scope)
+                seen.extend(row.id for row in page)
+                if cursor is None:
+                    return seen
+        finally:
+            await conn.release()
+
+    seen = asyncio.run(walk())
+    assert len(seen) == total
+    assert len(set(seen)) == total
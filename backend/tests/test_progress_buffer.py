@@ -0,0 +1,113 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from progress_buffer import ProgressBuffer
+from progress_counters import lesson_counts
+
+
+@pytest.fixture
+def enrollment(standin_db):
+    """(user_id, firebase uid, course_id, active lesson ids) of one seeded enrollment, with no progress yet"""
+    raw = sqlite3.connect(standin_db)
+    user_id, uid, course_id = raw.execute(
+        "SELECT u.id, u.firebase_uid, ue.course_id FROM user_enrollments ue JOIN users u ON u.id = ue.user_id "
+        "ORDER BY ue.id LIMIT 1"
+    ).fetchone()
+    lesson_ids = [row[0] for row in raw.execute(
+        "SELECT id FROM course_lessons WHERE course_id = ? AND is_active = 1 ORDER BY order_index", (course_id,)
+    )]
+    raw.execute("DELETE FROM user_lesson_progress WHERE user_id = ?", (user_id,))
+    raw.execute("UPDATE user_enrollments SET completed_lessons = 0, progress_percentage = 0 "
+                "WHERE user_id = ? AND course_id = ?", (user_id, course_id))
+    raw.commit()
+    raw.close()
+    lesson_counts.invalidate()
+    return user_id, uid, course_id, lesson_ids
+
+
+def stored_progress(path: str, user_id: int, course_id: int):
+    raw = sqlite3.connect(path)
+    try:
+        lessons = dict(raw.execute(
+            "SELECT lesson_id, is_completed FROM user_lesson_progress WHERE user_id = ?", (user_id,)
+        ).fetchall())
+        completed = raw.execute("SELECT completed_lessons FROM user_enrollments WHERE user_id = ? AND course_id = ?",
+                                (user_id, course_id)).fetchone()[0]
+        return lessons, completed
+    finally:
+        raw.close()
+
+
+def test_flush_merges_heartbeats_and_counts_completions(standin_db, make_database, enrollment):
+    user_id, uid, course_id, lesson_ids = enrollment
+    database = make_database()
+    buffer = ProgressBuffer(database)
+    buffer.record(user_id, lesson_ids[0], 30, False, sticky_key=uid)
+    buffer.record(user_id, lesson_ids[0], 90, True, sticky_key=uid)
+    buffer.record(user_id, lesson_ids[1], 10, False, sticky_key=uid)
+    assert set(buffer.pending_for(user_id)) == {lesson_ids[0], lesson_ids[1]}
+
+    assert asyncio.run(buffer.flush()) == 2
+
+    lessons, completed = stored_progress(standin_db, user_id, course_id)
+    assert lessons == {lesson_ids[0]: 1, lesson_ids[1]: 0}
+    assert completed == 1
+    assert buffer.pending_for(user_id) == {}
+    assert buffer.stats()["coalesced"] == 1
+    # Reads right after the flush must not go to a replica that hasn't caught up
+    assert database.recent_writers.is_recent(uid)
+
+
+def test_repeated_completion_is_counted_once(standin_db, make_database, enrollment):
+    user_id, uid, course_id, lesson_ids = enrollment
+    buffer = ProgressBuffer(make_database())
+
+    async def scenario():
+        for watched in (60, 120):
+            buffer.record(user_id, lesson_ids[0], watched, True, sticky_key=uid)
+            await buffer.flush()
+        buffer.record(user_id, lesson_ids[0], 130, False, sticky_key=uid)
+        await buffer.flush()
+
+    asyncio.run(scenario())
+    lessons, completed = stored_progress(standin_db, user_id, course_id)
+    assert lessons == {lesson_ids[0]: 0}
+    assert completed == 0
+
+
+def test_flush_lesson_writes_only_that_lesson(standin_db, make_database, enrollment):
+    user_id, uid, course_id, lesson_ids = enrollment
+    database = make_database()
+    buffer = ProgressBuffer(database)
+    buffer.record(user_id, lesson_ids[0], 90, True, sticky_key=uid)
+    buffer.record(user_id, lesson_ids[1], 10, False, sticky_key=uid)
+
+    async def scenario():
+        conn = await database.acquire()
+        try:
+            return await buffer.flush_lesson(conn, user_id, lesson_ids[0])
+        finally:
+            await conn.release()
+
+    assert asyncio.run(scenario()) == 1
+    lessons, completed = stored_progress(standin_db, user_id, course_id)
+    assert lessons == {lesson_ids[0]: 1}
+    assert completed == 1
+    assert set(buffer.pending_for(user_id)) == {lesson_ids[1]}
+
+
+def test_rejected_update_does_not_hold_back_the_batch(standin_db, make_database, enrollment):
+    user_id, uid, course_id, lesson_ids = enrollment
+    buffer = ProgressBuffer(make_database())
+    buffer.record(user_id, lesson_ids[0], 90, True, sticky_key=uid)
+    buffer.record(user_id, 10 ** 9, 5, False, sticky_key=uid)
+
+    asyncio.run(buffer.flush())
+
+    lessons, completed = stored_progress(standin_db, user_id, course_id)
+    assert lessons == {lesson_ids[0]: 1}
+    assert completed == 1
+    assert buffer.stats()["rejected"] == 1
+    assert buffer.pending_for(user_id) == {}
@@ -0,0 +1,120 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from quiz_engine import record_attempt, reconcile_quiz_summaries
+
+USER_ID, QUIZ_ID, ATTEMPTS_ALLOWED = 1, 1, 3
+
+
+def prepare_summary(path: str, attempts: int):
+    raw = sqlite3.connect(path)
+    raw.execute("DELETE FROM user_quiz_summaries WHERE user_id = ? AND quiz_id = ?", (USER_ID, QUIZ_ID))
+    if attempts:
+        raw.execute("INSERT INTO user_quiz_summaries (user_id, quiz_id, attempts, best_score, is_passed) "
+                    "VALUES (?, ?, ?, 50, 0)", (USER_ID, QUIZ_ID, attempts))
+    raw.commit()
+    raw.close()
+
+
+def stored_summary(path: str):
+    raw = sqlite3.connect(path)
+    try:
+        return raw.execute("SELECT attempts, best_score, is_passed FROM user_quiz_summaries "
+                           "WHERE user_id = ? AND quiz_id = ?", (USER_ID, QUIZ_ID)).fetchone()
+    finally:
+        raw.close()
+
+
+def submit_concurrently(database, submissions: int):
+    async def submit(score: float):
+        conn = await database.acquire()
+        try:
+            number = await record_attempt(conn, USER_ID, QUIZ_ID, ATTEMPTS_ALLOWED, score, score >= 70)
+            if number is None:
+                await conn.rollback()
+            else:
+                await conn.commit()
+            return number
+        finally:
+            await conn.release()
+
+    async def scenario():
+        return await asyncio.gather(*(submit(60.0 + i) for i in range(submissions)))
+
+    return asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("existing", [0, 1, 2], ids=["first-attempt", "one-used", "one-left"])
+def test_concurrent_submissions_respect_attempt_limit(standin_db, make_database, existing):
+    prepare_summary(standin_db, existing)
+    database = make_database(max_size=6)
+
+    numbers = submit_concurrently(database, 6)
+
+    granted = sorted(number for number in numbers if number is not None)
+    assert granted == list(range(existing + 1, ATTEMPTS_ALLOWED + 1))
+    assert stored_summary(standin_db)[0] == ATTEMPTS_ALLOWED
+
+
+def test_summary_keeps_best_score_and_pass(standin_db, make_database):
+    prepare_summary(standin_db, 0)
+    database = make_database(max_size=1)
+
+    async def scenario():
+        conn = await database.acquire()
+        try:
+            for score in (80.0, 40.0):
+                await record_attempt(conn, USER_ID, QUIZ_ID, ATTEMPTS_ALLOWED, score, score >= 70)
+                await conn.commit()
+        finally:
+            await conn.release()
+
+    asyncio.run(scenario())
+    attempts, best_score, is_passed = stored_summary(standin_db)
+    assert (attempts, float(best_score), is_passed) == (2, 80.0, 1)
+
+
+def test_no_attempts_allowed_records_nothing(standin_db, make_database):
+    prepare_summary(standin_db, 0)
+    database = make_database(max_size=1)
+
+    async def scenario():
+        conn = await database.acquire()
+        try:
+            return await record_attempt(conn, USER_ID, QUIZ_ID, 0, 90.0, True)
+        finally:
+            await conn.release()
+
+    assert asyncio.run(scenario()) is None
+    assert stored_summary(standin_db) is None
+
+
+def test_reconcile_repairs_drifted_summaries(standin_db, make_database):
+    raw = sqlite3.connect(standin_db)
+    raw.execute("DELETE FROM user_quiz_answers")
+    raw.execute("DELETE FROM user_quiz_attempts")
+    raw.execute("DELETE FROM user_quiz_summaries")
+    raw.execute("INSERT INTO user_quiz_attempts (user_id, quiz_id, attempt_number, score_percentage, is_passed) "
+                "VALUES (?, ?, 1, 75, 1)", (USER_ID, QUIZ_ID))
+    # Drifted counter, plus a summary with no attempts behind it
+    raw.execute("INSERT INTO user_quiz_summaries (user_id, quiz_id, attempts, is_passed) VALUES (?, ?, 5, 0)",
+                (USER_ID, QUIZ_ID))
+    raw.execute("INSERT INTO user_quiz_summaries (user_id, quiz_id, attempts, is_passed) VALUES (2, 2, 4, 0)")
+    raw.commit()
+    raw.close()
+    database = make_database(max_size=1)
+
+    async def scenario():
+        conn = await database.acquire()
+        try:
+            return await reconcile_quiz_summaries(conn), await reconcile_quiz_summaries(conn)
+        finally:
+            await conn.release()
+
+    first, second = asyncio.run(scenario())
+    assert first == 2
+    assert second == 0
+    attempts, best_score, is_passed = stored_summary(standin_db)
+    assert (attempts, float(best_score), is_passed) == (1, 75.0, 1)
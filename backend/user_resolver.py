@@ -0,0 +1,147 @@
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+import pyodbc
+
+from database import AsyncConnection
+
+logger = logging.getLogger(__name__)
+
+
+class UserResolver:
+    """Maps Firebase UIDs to users.id with an in-process TTL/LRU cache.
+
+    Concurrent lookups (or creations) for the same UID are collapsed into a
+    single query; the other callers wait for its result.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 3600.0,
+        max_size: int = 100000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._clock = clock
+        self._entries = OrderedDict()  # firebase_uid -> (user_id, expires_at)
+        self._inflight = {}
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "created": 0, "evictions": 0}
+
+    async def resolve(self, conn: AsyncConnection, firebase_uid: str) -> Optional[int]:
+        """Return the user's id, or None if no users row exists yet"""
+        user_id = self._get(firebase_uid)
+        if user_id is not None:
+            self._stats["hits"] += 1
+            return user_id
+
+        self._stats["misses"] += 1
+        return await self._single_flight(("lookup", firebase_uid), self._lookup, conn, firebase_uid)
+
+    async def get_or_create(self, conn: AsyncConnection, claims: Dict[str, Any]) -> int:
+        """Resolve the token's user, inserting the users row on first sight"""
+        firebase_uid = claims["uid"]
+        user_id = await self.resolve(conn, firebase_uid)
+        if user_id is not None:
+            return user_id
+        return await self._single_flight(("create", firebase_uid), self._create, conn, claims)
+
+    def remember(self, firebase_uid: str, user_id: int):
+        self._entries[firebase_uid] = (user_id, self._clock() + self.ttl)
+        self._entries.move_to_end(firebase_uid)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def invalidate(self, firebase_uid: Optional[str] = None):
+        if firebase_uid is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(firebase_uid, None)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+            **self._stats,
+        }
+
+    def _get(self, firebase_uid: str) -> Optional[int]:
+        entry = self._entries.get(firebase_uid)
+        if entry is None:
+            return None
+        user_id, expires_at = entry
+        if self._clock() >= expires_at:
+            del self._entries[firebase_uid]
+            return None
+        self._entries.move_to_end(firebase_uid)
+        return user_id
+
+    async def _single_flight(self, key, fn, *args):
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self._stats["coalesced"] += 1
+            await asyncio.wait([pending])
+            if not pending.cancelled():
+                return pending.result()
+            # The leading request failed or was cancelled; run our own query
+            return await self._single_flight(key, fn, *args)
+
+        pending = asyncio.get_running_loop().create_future()
+        self._inflight[key] = pending
+        try:
+            result = await fn(*args)
+            pending.set_result(result)
+            return result
+        finally:
+            if not pending.done():
+                pending.cancel()
+            del self._inflight[key]
+
+    async def _lookup(self, conn: AsyncConnection, firebase_uid: str) -> Optional[int]:
+        row = await conn.fetchone("SELECT id FROM users WHERE firebase_uid = ?", firebase_uid)
+        if row is None:
+            return None
+        self.remember(firebase_uid, row.id)
+        return row.id
+
+    async def _create(self, conn: AsyncConnection, claims: Dict[str, Any]) -> int:
+        firebase_uid = claims["uid"]
+        email = claims.get("email", f"{firebase_uid}@unknown.com")
+        display_name = claims.get("name", "Unknown User")
+
+        try:
+            # UPDLOCK/HOLDLOCK range-locks the uid so parallel first requests
+            # from other workers wait here instead of inserting a duplicate
+            row = await conn.fetchone("""
+                INSERT INTO users (firebase_uid, email, display_name, profile_picture_data)
+                OUTPUT INSERTED.id
+                SELECT ?, ?, ?, NULL
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM users WITH (UPDLOCK, HOLDLOCK) WHERE firebase_uid = ?
+                )
+            """, firebase_uid, email, display_name, firebase_uid)
+            created = row is not None
+            if row is None:
+                row = await conn.fetchone("SELECT id FROM users WHERE firebase_uid = ?", firebase_uid)
+            await conn.commit()
+        except pyodbc.IntegrityError:
+            # Lost the race against a unique index on firebase_uid
+            await conn.rollback()
+            created = False
+            row = await conn.fetchone("SELECT id FROM users WHERE firebase_uid = ?", firebase_uid)
+
+        if created:
+            self._stats["created"] += 1
+            logger.info(f"Auto-created user {firebase_uid} with ID {row.id}")
+
+        self.remember(firebase_uid, row.id)
+        return row.id
+
+
+user_resolver = UserResolver()
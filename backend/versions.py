@@ -0,0 +1,87 @@
+import os
+import time
+import uuid
+import hashlib
+from collections import defaultdict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+class VersionTracker:
+    """Change counters that ETags are derived from, so validators cost no queries.
+
+    Named versions cover shared data (e.g. enrollment totals), per-user
+    versions cover a student's own progress, optionally split into scopes
+    ("courses", "lessons", "quizzes") for responses that only depend on
+    part of it. Data edited straight in the
+    database isn't observed, so every tag also carries a time epoch of
+    ``epoch_seconds``; tags never outlive the caches that serve the data.
+    The boot id keeps tags from a previous process from ever matching.
+
+    Counters live in this process only, which assumes the API runs as a
+    single worker process. Behind several workers a write handled by one
+    doesn't bump the others, and they keep answering 304 for the old tag
+    until the epoch rolls over, i.e. for at most ``ETAG_EPOCH_SECONDS``.
+    """
+
+    def __init__(self, epoch_seconds: float = 60.0, clock: Callable[[], float] = time.time):
+        self.epoch_seconds = epoch_seconds
+        self._clock = clock
+        self.boot = uuid.uuid4().hex[:8]
+        self._versions: Dict[str, int] = defaultdict(int)
+        self._users: Dict[int, int] = defaultdict(int)
+        self._user_scopes: Dict[Tuple[int, str], int] = defaultdict(int)
+        self._not_modified = 0
+        self._issued = 0
+
+    def bump(self, name: str):
+        self._versions[name] += 1
+
+    def bump_user(self, user_id: int, *scopes: str):
+        """Bump the user's overall version and each of ``scopes``"""
+        self._users[user_id] += 1
+        for scope in scopes:
+            self._user_scopes[(user_id, scope)] += 1
+
+    def get(self, name: str) -> int:
+        return self._versions.get(name, 0)
+
+    def user(self, user_id: int, scope: Optional[str] = None) -> int:
+        if scope is not None:
+            return self._user_scopes.get((user_id, scope), 0)
+        return self._users.get(user_id, 0)
+
+    def epoch(self) -> int:
+        return int(self._clock() // self.epoch_seconds)
+
+    def digest(self, *parts: Any) -> str:
+        return hashlib.sha1(repr((self.epoch(),) + parts).encode()).hexdigest()[:20]
+
+    def etag(self, *parts: Any) -> str:
+        return f'W/"{self.boot}-{self.digest(*parts)}"'
+
+    def matches(self, etag: str, if_none_match: str) -> bool:
+        if not if_none_match:
+            return False
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        # Weak comparison: W/"x" and "x" name the same version
+        return "*" in candidates or etag in candidates or etag[2:] in candidates
+
+    def record(self, not_modified: bool):
+        if not_modified:
+            self._not_modified += 1
+        else:
+            self._issued += 1
+
+    def stats(self) -> Dict[str, Any]:
+        checks = self._issued + self._not_modified
+        return {
+            "boot": self.boot,
+            "versions": dict(self._versions),
+            "tracked_users": len(self._users),
+            "not_modified": self._not_modified,
+            "issued": self._issued,
+            "not_modified_rate": round(self._not_modified / checks, 4) if checks else 0.0,
+        }
+
+
+versions = VersionTracker(epoch_seconds=float(os.getenv("ETAG_EPOCH_SECONDS", "60")))
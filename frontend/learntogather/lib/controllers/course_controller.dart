@@ -12,8 +12,12 @@ class CourseController extends ChangeNotifier {
   List<CategoryModel> _categories = [];
   List<CourseModel> _courses = [];
   List<CourseModel> _enrolledCourses = [];
+  List<CourseModel> _featuredCourses = [];
+  List<CourseModel> _popularCourses = [];
   List<LessonModel> _currentCourseLessons = [];
   List<QuizModel> _currentCourseQuizzes = [];
+  int? _bundleCourseId;
+  String? _bundleVersion;
   
   // Search and filter state
   String _currentSearchQuery = '';
@@ -32,6 +36,7 @@ class CourseController extends ChangeNotifier {
   List<CategoryModel> get categories => _categories;
   List<CourseModel> get courses => _courses;
   List<CourseModel> get enrolledCourses => _enrolledCourses;
+  List<CourseModel> get popularCourses => _popularCourses;
   List<LessonModel> get currentCourseLessons => _currentCourseLessons;
   List<QuizModel> get currentCourseQuizzes => _currentCourseQuizzes;
   bool get isLoading => _isLoading;
@@ -401,6 +406,31 @@ class CourseController extends ChangeNotifier {
     ];
   }
   
+  // Home screen data in a single request; falls back to the separate endpoints
+  Future<void> loadHome() async {
+    if (_useOfflineMode) {
+      await Future.wait([loadCategories(), loadEnrolledCourses()]);
+      return;
+    }
+    
+    try {
+      _setLoading(true);
+      _setError(null);
+      
+      final home = await _apiService.getHome();
+      _categories = home.categories;
+      _featuredCourses = home.featured;
+      _popularCourses = home.popular;
+      _enrolledCourses = home.enrollments;
+      _setConnectionStatus(true);
+      _setLoading(false);
+    } catch (e) {
+      debugPrint('Home request failed, loading sections separately: $e');
+      _setLoading(false);
+      await Future.wait([loadCategories(), loadEnrolledCourses()]);
+    }
+  }
+  
   // Enhanced load enrolled courses
   Future<void> loadEnrolledCourses({int maxRetries = 2}) async {
     int retryCount = 0;
@@ -537,6 +567,46 @@ class CourseController extends ChangeNotifier {
     }
   }
   
+  // Course detail, lessons and quizzes in one request. Reloading the same course
+  // sends the previous version so unchanged sections are kept as they are.
+  Future<void> loadCourseBundle(int courseId) async {
+    if (_useOfflineMode) {
+      await Future.wait([loadCourseLessons(courseId), loadCourseQuizzes(courseId)]);
+      return;
+    }
+    
+    try {
+      _setLoading(true);
+      _setError(null);
+      
+      final since = _bundleCourseId == courseId ? _bundleVersion : null;
+      final bundle = await _apiService.getCourseBundle(courseId, since: since);
+      
+      if (bundle.course != null) {
+        final courseIndex = _courses.indexWhere((c) => c.id == courseId);
+        if (courseIndex != -1) {
+          _courses[courseIndex] = bundle.course!;
+        }
+      }
+      if (!bundle.unchanged.contains('lessons')) {
+        _currentCourseLessons = bundle.lessons ?? [];
+      }
+      if (!bundle.unchanged.contains('quizzes')) {
+        _currentCourseQuizzes = bundle.quizzes ?? [];
+      }
+      _bundleCourseId = courseId;
+      _bundleVersion = bundle.version;
+      _setConnectionStatus(true);
+      _setLoading(false);
+    } catch (e) {
+      debugPrint('Course bundle request failed, loading sections separately: $e');
+      _bundleCourseId = null;
+      _bundleVersion = null;
+      _setLoading(false);
+      await Future.wait([loadCourseLessons(courseId), loadCourseQuizzes(courseId)]);
+    }
+  }
+  
   // Enhanced load course lessons
   Future<void> loadCourseLessons(int courseId) async {
     try {
@@ -951,6 +1021,9 @@ class CourseController extends ChangeNotifier {
   }
   
   List<CourseModel> getFeaturedCourses() {
+    if (_featuredCourses.isNotEmpty) {
+      return _featuredCourses.take(6).toList();
+    }
     return _courses
         .where((course) => 
             course.rating != null && 
@@ -1024,8 +1097,12 @@ class CourseController extends ChangeNotifier {
     _categories.clear();
     _courses.clear();
     _enrolledCourses.clear();
+    _featuredCourses.clear();
+    _popularCourses.clear();
     _currentCourseLessons.clear();
     _currentCourseQuizzes.clear();
+    _bundleCourseId = null;
+    _bundleVersion = null;
     _currentSearchQuery = '';
     _currentCategoryFilter = null;
     _error = null;
@@ -1035,9 +1112,8 @@ class CourseController extends ChangeNotifier {
   // Refresh all data
   Future<void> refreshAllData() async {
     await Future.wait([
-      loadCategories(),
+      loadHome(),
       loadCourses(),
-      loadEnrolledCourses(),
     ]);
   }
 
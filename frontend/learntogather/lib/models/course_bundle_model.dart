@@ -0,0 +1,29 @@
+import 'course_model.dart';
+import 'lesson_model.dart';
+import 'quiz_model.dart';
+
+class CourseBundleModel {
+  final String version;
+  final CourseModel? course;
+  final List<LessonModel>? lessons;
+  final List<QuizModel>? quizzes;
+  final List<String> unchanged;
+
+  CourseBundleModel({
+    required this.version,
+    this.course,
+    this.lessons,
+    this.quizzes,
+    required this.unchanged,
+  });
+
+  factory CourseBundleModel.fromJson(Map<String, dynamic> json) {
+    return CourseBundleModel(
+      version: json['version'] ?? '',
+      course: json['course'] != null ? CourseModel.fromJson(json['course']) : null,
+      lessons: (json['lessons'] as List?)?.map((item) => LessonModel.fromJson(item)).toList(),
+      quizzes: (json['quizzes'] as List?)?.map((item) => QuizModel.fromJson(item)).toList(),
+      unchanged: List<String>.from(json['unchanged'] ?? []),
+    );
+  }
+}
@@ -0,0 +1,33 @@
+import 'category_model.dart';
+import 'course_model.dart';
+
+class HomeModel {
+  final List<CategoryModel> categories;
+  final List<CourseModel> featured;
+  final List<CourseModel> popular;
+  final List<CourseModel> enrollments;
+  final String? enrollmentsNextCursor;
+
+  HomeModel({
+    required this.categories,
+    required this.featured,
+    required this.popular,
+    required this.enrollments,
+    this.enrollmentsNextCursor,
+  });
+
+  factory HomeModel.fromJson(Map<String, dynamic> json) {
+    List<CourseModel> courses(String key) =>
+        (json[key] as List? ?? []).map((item) => CourseModel.fromJson(item)).toList();
+
+    return HomeModel(
+      categories: (json['categories'] as List? ?? [])
+          .map((item) => CategoryModel.fromJson(item))
+          .toList(),
+      featured: courses('featured'),
+      popular: courses('popular'),
+      enrollments: courses('enrollments'),
+      enrollmentsNextCursor: json['enrollments_next_cursor'],
+    );
+  }
+}
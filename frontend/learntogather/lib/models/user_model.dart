@@ -3,7 +3,7 @@ class UserModel {
   final String firebaseUid;
   final String email;
   final String? displayName;
-  final String? profilePicture; // Now stores base64 encoded image data
+  final String? profilePicture; // Avatar image URL served by the API
   final DateTime createdAt;
 
   UserModel({
@@ -21,7 +21,7 @@ class UserModel {
       firebaseUid: json['firebase_uid'],
       email: json['email'],
       displayName: json['display_name'],
-      profilePicture: json['profile_picture'], // Base64 data or null
+      profilePicture: json['profile_picture'], // Avatar URL or null
       createdAt: DateTime.parse(json['created_at']),
     );
   }
@@ -8,6 +8,8 @@ import '../models/category_model.dart';
 import '../models/lesson_model.dart';
 import '../models/quiz_model.dart';
 import '../models/question_model.dart';
+import '../models/home_model.dart';
+import '../models/course_bundle_model.dart';
 
 class ApiService {
   static const String baseUrl = 'http://127.0.0.1:8000'; // Change to your server URL
@@ -89,6 +91,35 @@ class ApiService {
     }
   }
 
+  // Page size used when walking paginated list endpoints (the server's maximum)
+  static const int _pageSize = 100;
+
+  // Helper method to fetch every page of a list endpoint by following X-Next-Cursor
+  Future<List<dynamic>> _getAllPages(String endpoint, Map<String, String> queryParams) async {
+    final items = <dynamic>[];
+    String? cursor;
+    do {
+      final pageParams = <String, String>{...queryParams, 'limit': _pageSize.toString()};
+      if (cursor != null) pageParams['cursor'] = cursor;
+
+      final response = await _makeRequest(
+        method: 'GET',
+        endpoint: endpoint,
+        queryParams: pageParams,
+      );
+
+      final data = _handleResponse(response);
+      if (data is! List) {
+        throw Exception('Invalid list response format');
+      }
+      items.addAll(data);
+
+      final next = response.headers['x-next-cursor'];
+      cursor = (next != null && next.isNotEmpty) ? next : null;
+    } while (cursor != null);
+    return items;
+  }
+
   // Helper method to handle API responses
   dynamic _handleResponse(http.Response response) {
     if (kDebugMode) {
@@ -215,16 +246,8 @@ class ApiService {
       if (minRating != null) queryParams['min_rating'] = minRating.toString();
       if (sortBy != null) queryParams['sort_by'] = sortBy;
       
-      final response = await _makeRequest(
-        method: 'GET',
-        endpoint: '/courses',
-        queryParams: queryParams,
-      );
-      
-      final data = _handleResponse(response);
-      if (data is! List) {
-        throw Exception('Invalid courses response format');
-      }
+      // The server returns one page at a time; collect them all
+      final data = await _getAllPages('/courses', queryParams);
       
       return data.map((json) => CourseModel.fromJson(json)).toList();
     } catch (e) {
@@ -264,15 +287,7 @@ class ApiService {
   
   Future<List<CourseModel>> getUserEnrollments() async {
     try {
-      final response = await _makeRequest(
-        method: 'GET',
-        endpoint: '/user/enrollments',
-      );
-      
-      final data = _handleResponse(response);
-      if (data is! List) {
-        throw Exception('Invalid enrollments response format');
-      }
+      final data = await _getAllPages('/user/enrollments', <String, String>{});
       
       return data.map((json) => CourseModel.fromJson(json)).toList();
     } catch (e) {
@@ -299,6 +314,26 @@ class ApiService {
     }
   }
   
+  // Course detail, lessons and quizzes in one request; sections unchanged since [since] are left out
+  Future<CourseBundleModel> getCourseBundle(int courseId, {String? since}) async {
+    try {
+      final response = await _makeRequest(
+        method: 'GET',
+        endpoint: '/courses/$courseId/bundle',
+        queryParams: since != null ? {'since': since} : null,
+      );
+      
+      final data = _handleResponse(response);
+      if (data is! Map<String, dynamic>) {
+        throw Exception('Invalid course bundle response format');
+      }
+      
+      return CourseBundleModel.fromJson(data);
+    } catch (e) {
+      throw Exception('Failed to get course bundle: ${e.toString()}');
+    }
+  }
+  
   Future<void> updateLessonProgress({
     required int lessonId,
     required int watchedDurationSeconds,
@@ -422,6 +457,30 @@ class ApiService {
     }
   }
   
+  // Categories, featured/popular courses and enrollments in one request
+  Future<HomeModel> getHome({int? featuredLimit, int? popularLimit}) async {
+    try {
+      final queryParams = <String, String>{};
+      if (featuredLimit != null) queryParams['featured_limit'] = featuredLimit.toString();
+      if (popularLimit != null) queryParams['popular_limit'] = popularLimit.toString();
+      
+      final response = await _makeRequest(
+        method: 'GET',
+        endpoint: '/home',
+        queryParams: queryParams,
+      );
+      
+      final data = _handleResponse(response);
+      if (data is! Map<String, dynamic>) {
+        throw Exception('Invalid home response format');
+      }
+      
+      return HomeModel.fromJson(data);
+    } catch (e) {
+      throw Exception('Failed to get home: ${e.toString()}');
+    }
+  }
+  
   // Get popular courses
   Future<List<CourseModel>> getPopularCourses() async {
     try {
@@ -35,10 +35,7 @@ class _CourseDetailScreenState extends State<CourseDetailScreen>
   Future<void> _loadCourseContent() async {
     if (widget.course.isEnrolled) {
       final courseController = Provider.of<CourseController>(context, listen: false);
-      await Future.wait([
-        courseController.loadCourseLessons(widget.course.id),
-        courseController.loadCourseQuizzes(widget.course.id),
-      ]);
+      await courseController.loadCourseBundle(widget.course.id);
     }
   }
 
@@ -35,9 +35,8 @@ class _HomeScreenState extends State<HomeScreen>
   Future<void> _loadInitialData() async {
     final courseController = Provider.of<CourseController>(context, listen: false);
     await Future.wait([
-      courseController.loadCategories(),
+      courseController.loadHome(),
       courseController.loadCourses(),
-      courseController.loadEnrolledCourses(),
     ]);
   }
 
@@ -213,9 +212,8 @@ class _HomeTabState extends State<_HomeTab> {
         return RefreshIndicator(
           onRefresh: () async {
             await Future.wait([
-              courseController.loadCategories(),
+              courseController.loadHome(),
               courseController.loadCourses(),
-              courseController.loadEnrolledCourses(),
             ]);
           },
           child: CustomScrollView(
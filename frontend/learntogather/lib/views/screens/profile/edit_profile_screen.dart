@@ -232,7 +232,7 @@ class _EditProfileScreenState extends State<EditProfileScreen> {
                   )
                 : (user?.profilePicture != null && user!.profilePicture!.isNotEmpty)
                     ? Image.network(
-                        user.profilePicture!.startsWith('data:')
+                        user.profilePicture!.startsWith('data:') || user.profilePicture!.startsWith('http')
                             ? user.profilePicture!
                             : 'data:image/jpeg;base64,${user.profilePicture}',
                         width: 120,